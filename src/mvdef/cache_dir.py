@@ -0,0 +1,26 @@
+"""Location of the on-disk state kept between invocations (journals, backups, etc.)."""
+
+import os
+from pathlib import Path
+
+__all__ = ["cache_dir"]
+
+
+def cache_dir(*parts: str) -> Path:
+    """
+    The per-user mvdef cache directory (created if missing), or a subdirectory of it.
+
+    Set ``MVDEF_CACHE_DIR`` to override the location, otherwise ``XDG_CACHE_HOME`` (or
+    ``~/.cache`` if unset) is used as the parent of an ``mvdef`` directory.
+
+    Args:
+      parts: Path components of a subdirectory to return instead of the cache root
+    """
+    if override := os.environ.get("MVDEF_CACHE_DIR"):
+        root = Path(override)
+    else:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        root = Path(xdg_cache) / "mvdef"
+    path = root.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
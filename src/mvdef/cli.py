@@ -1,21 +1,46 @@
-"""Command line interface components."""
+"""
+Command line interface components.
 
+Startup time matters here (shell completion and editor integrations call the CLIs
+often), so this module only imports the standard library modules it needs up front.
+`defopt` is imported once the command line is to be parsed, and the `transfer` classes
+once the command is known (which in turn defer importing the `core` modules).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
 from dataclasses import KW_ONLY, dataclass
-from typing import NamedTuple
+from importlib import import_module
+from typing import TYPE_CHECKING, NamedTuple
 
-import defopt
+from .error_handling.exceptions import WriteConflict
 
-from .transfer import CpDef, LsDef, MvDef
+if TYPE_CHECKING:
+    from functools import partial
+    from pathlib import Path
+
+    from .transfer import Batch, CpDef, Index, LsDef, Merge, MvDef, Split, Undo
 
 
 @dataclass
 class CLIResult:
     """The result of a CLI call."""
 
-    mover: MvDef | CpDef | None
+    mover: MvDef | CpDef | LsDef | Batch | Index | Merge | Split | Undo | None
     _: KW_ONLY
     diffs: tuple[str, str] | None = None  # MvDef | CpDef
     manif: str | None = None  # LsDef
+    touched: list[Path] | None = None  # When writing files (not on a dry run)
+
+
+EX_TEMPFAIL = 75  # Exit status for a temporary failure, i.e. the user can retry
+
+COMMANDS = {"mvdef": "MvDef", "cpdef": "CpDef", "lsdef": "LsDef"}
+
+# Run as `mvdef <subcommand>` (each has a `run()`)
+SUBCOMMANDS = ["batch", "index", "merge", "split", "undo"]
 
 
 class DefoptFlags(NamedTuple):
@@ -26,50 +51,129 @@ class DefoptFlags(NamedTuple):
     show_defaults: bool = False
 
 
+def load_cls(name: str) -> type:
+    """Import a class from `mvdef.transfer` (which only imports its own module)."""
+    return getattr(import_module(".transfer", __package__), name)
+
+
+def bind_defopt(Cls: type, argv: list[str] | None, **argparse_kwargs) -> partial:
+    """Parse the command line into a call to `Cls` (without making the call)."""
+    from inspect import signature
+
+    import defopt
+
+    defopt_kwargs = DefoptFlags()._asdict()
+    if argparse_kwargs:
+        defopt_kwargs["argparse_kwargs"] = argparse_kwargs
+    if argv is not None:
+        defopt_kwargs["argv"] = argv
+    call = defopt.bind(Cls, **defopt_kwargs)
+    try:
+        signature(Cls).bind(*call.args, **call.keywords)
+    except TypeError as exc:  # A tuple positional (e.g. lsdef's src) can be left empty
+        prog = argparse_kwargs.get("prog", os.path.basename(sys.argv[0]))
+        print(f"{prog}: error: {exc}", file=sys.stderr)
+        raise SystemExit(2) from None
+    return call
+
+
+def run_defopt(Cls: type, argv: list[str] | None, **argparse_kwargs):
+    return bind_defopt(Cls, argv, **argparse_kwargs)()
+
+
 def cli(*args, **kwargs) -> CLIResult | None:
     """A wrapper used for all CLIs."""
     MvCls = kwargs.pop("MvCls")
-    ls = MvCls is LsDef
+    if isinstance(MvCls, str):
+        MvCls = load_cls(MvCls)
+    ls = hasattr(MvCls, "manif")  # LsDef
     return_state = kwargs.pop("return_state", False)
     defopt_argv: list[str] | None = kwargs.pop("defopt_argv", None)
     force_defopt = defopt_argv is not None
     # Use defopt if no kw/args (i.e. using argv) or if testing the CLI (mimicking argv)
     invoke_defopt = not (args or kwargs) or force_defopt
     if invoke_defopt:
-        defopt_kwargs = DefoptFlags()._asdict()
-        if force_defopt:
-            defopt_kwargs["argv"] = defopt_argv
-        mover = defopt.run(MvCls, **defopt_kwargs)
+        mover = run_defopt(MvCls, argv=defopt_argv)
     else:
         mover = MvCls(*args, **kwargs)
     if unblocked := (mover.check_blocker is None):
-        if ls:
-            manif = mover.manif(print_out=True)
-        else:
-            if mover.dry_run:
+        try:
+            if ls:
+                manif = mover.manif(print_out=True)
+            elif mover.dry_run:
                 diffs = mover.diffs(print_out=True)
             else:
-                mover.move()
+                touched = mover.move()
+        except WriteConflict as exc:
+            if mover.escalate:
+                raise
+            mover.err(f"{exc} (no files were changed, so it is safe to retry)")
+            raise SystemExit(EX_TEMPFAIL) from exc
     if return_state:
         result = CLIResult(mover)
         if unblocked:
             if ls:
                 result.manif = manif
+                result.touched = mover.touched if mover.fixing else None
             elif mover.dry_run:
                 result.diffs = diffs
+            else:
+                result.touched = touched
     return result if return_state else None
 
 
+def cli_subcommand(name: str, *args, **kwargs) -> CLIResult | None:
+    """A wrapper used for the `mvdef` subcommands."""
+    SubCls = load_cls(name.capitalize())
+    return_state = kwargs.pop("return_state", False)
+    defopt_argv: list[str] | None = kwargs.pop("defopt_argv", None)
+    if not (args or kwargs) or defopt_argv is not None:
+        command = run_defopt(SubCls, argv=defopt_argv, prog=f"mvdef {name}")
+    else:
+        command = SubCls(*args, **kwargs)
+    try:
+        touched = command.run()
+    except WriteConflict as exc:
+        if command.escalate:
+            raise
+        command.err(f"{exc} (no files were changed, so it is safe to retry)")
+        raise SystemExit(EX_TEMPFAIL) from exc
+    return CLIResult(command, touched=touched) if return_state else None
+
+
+def hand_off(command: str) -> None:
+    """
+    Before parsing the command line: if the shell is completing it, print completions
+    and exit, else if `mvdefd` is running, run it there and exit with its status.
+    """
+    if "_ARGCOMPLETE" in os.environ:
+        from .completion import autocomplete
+
+        autocomplete(load_cls(COMMANDS[command]), prog=command)
+    from .daemon.client import forward
+
+    if (status := forward(command, sys.argv[1:])) is not None:
+        raise SystemExit(status)
+
+
 def cli_move(*args, **kwargs) -> CLIResult | None:
-    """Move symbols."""
-    return cli(MvCls=MvDef, *args, **kwargs)
+    """Move symbols (or run a subcommand, e.g. `mvdef split` or `mvdef undo`)."""
+    if not (args or kwargs):
+        if (subcommand := sys.argv[1:2]) and (name := subcommand[0]) in SUBCOMMANDS:
+            return cli_subcommand(name, defopt_argv=sys.argv[2:])
+        hand_off("mvdef")
+    return cli(MvCls="MvDef", *args, **kwargs)
 
 
 def cli_copy(*args, **kwargs) -> CLIResult | None:
     """Copy symbols."""
-    return cli(MvCls=CpDef, *args, **kwargs)
+    if not (args or kwargs):
+        hand_off("cpdef")
+    return cli(MvCls="CpDef", *args, **kwargs)
 
 
 def cli_list(*args, **kwargs) -> CLIResult | None:
     """List symbols."""
-    return cli(MvCls=LsDef, *args, **kwargs)
+    if not (args or kwargs):
+        hand_off("lsdef")
+    return cli(MvCls="LsDef", *args, **kwargs)
@@ -0,0 +1,125 @@
+"""
+Shell completion (via argcomplete) of the definition names in the `src` file.
+
+Completion runs on every TAB, so this doesn't parse the file (nor import defopt): the
+names come from a lexical scan (fast enough for modules of tens of thousands of lines)
+which is cached on disk per file until the file's mtime or size changes.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from argparse import ArgumentParser
+from dataclasses import MISSING, fields
+from hashlib import sha256
+from pathlib import Path
+
+from .cache_dir import cache_dir
+
+__all__ = ["autocomplete", "completion_parser", "definition_names", "scan_names"]
+
+# Top-level `def`/`class` statements (at the start of a line), skipping over strings
+# (so that a line inside a docstring is never taken for one) and comments.
+DEF_SCAN = re.compile(
+    r"""
+    ^(?:async[ \t]+)?(?P<kind>def|class)[ \t]+(?P<name>\w+)
+    | \"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"
+    | '''(?:[^'\\]|\\.|'(?!''))*'''
+    | "(?:[^"\\\n]|\\.)*"
+    | '(?:[^'\\\n]|\\.)*'
+    | \#[^\n]*
+    | [^"'\#\n]+
+    """,
+    re.MULTILINE | re.VERBOSE | re.DOTALL,
+)
+
+
+def scan_names(source: str) -> list[tuple[str, str]]:
+    """The kind (`"def"` or `"class"`) and name of each top-level definition."""
+    return [(m["kind"], m["name"]) for m in DEF_SCAN.finditer(source) if m["kind"]]
+
+
+def definition_names(path: Path) -> list[tuple[str, str]]:
+    """
+    The result of `scan_names` for the file at `path`, from the name cache if the file
+    is unchanged since it was scanned (by mtime and size). Empty if it can't be read.
+    """
+    path = Path(path).absolute()
+    try:
+        st = path.stat()
+    except OSError:
+        return []
+    key = sha256(str(path).encode()).hexdigest()[:32]
+    cached = cache_dir("names") / f"{key}.json"
+    try:
+        entry = json.loads(cached.read_text())
+    except (OSError, ValueError):
+        entry = None
+    if entry and (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+        return [tuple(name) for name in entry["names"]]
+    try:
+        names = scan_names(path.read_text())
+    except (OSError, UnicodeDecodeError):
+        return []
+    entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "names": names}
+    tmp = cached.with_suffix(".tmp")
+    tmp.write_text(json.dumps(entry))
+    tmp.replace(cached)
+    return names
+
+
+def complete_names(prefix: str, parsed_args, **kwargs) -> list[str]:
+    """Complete a name from the `src` files, filtered by `--cls-defs`/`--func-defs`."""
+    if (src := getattr(parsed_args, "src", None)) is None:
+        return []
+    srcs = [Path(p) for p in src] if isinstance(src, list) else [Path(src)]
+    cls_defs = getattr(parsed_args, "cls_defs", False)
+    func_defs = getattr(parsed_args, "func_defs", False)
+    if cls_defs is func_defs:
+        kinds = {"def", "class"}
+    else:
+        kinds = {"class" if cls_defs else "def"}
+    names = (n for path in srcs for n in definition_names(path))
+    return list(
+        dict.fromkeys(
+            name for kind, name in names if kind in kinds and name.startswith(prefix)
+        ),
+    )
+
+
+def completion_parser(Cls: type, prog: str) -> ArgumentParser:
+    """
+    A stand-in for the parser defopt makes from the `Cls` dataclass, with the same
+    arguments (required fields positional, lists and defaulted fields as options with
+    the first unused letter as a short flag) and names completed for list options.
+    """
+    parser = ArgumentParser(prog=prog)
+    short_flags = {"h"}
+    for f in fields(Cls):
+        if not f.init or f.name.startswith("_"):
+            continue
+        is_list = str(f.type).startswith("list")  # Annotation may be a string
+        if f.default is MISSING and f.default_factory is MISSING and not is_list:
+            is_tuple = str(f.type).startswith("tuple")  # Any number of positionals
+            parser.add_argument(f.name, nargs="*" if is_tuple else None)
+            continue
+        flags = [f"--{f.name.replace('_', '-')}"]
+        if (short := f.name[0]) not in short_flags:
+            short_flags.add(short)
+            flags.insert(0, f"-{short}")
+        if is_list:
+            action = parser.add_argument(*flags, dest=f.name, nargs="*")
+            action.completer = complete_names
+        elif f.type in (bool, "bool"):
+            parser.add_argument(*flags, dest=f.name, action="store_true")
+        else:
+            parser.add_argument(*flags, dest=f.name)
+    return parser
+
+
+def autocomplete(Cls: type, prog: str) -> None:
+    """Print completions for the command line in the environment, and exit."""
+    import argcomplete
+
+    argcomplete.autocomplete(completion_parser(Cls, prog=prog))
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
-from ast import AST, unparse
+from ast import AST, iter_fields, unparse
+from ast import parse as ast_parse
+from collections.abc import Iterator
 from dataclasses import dataclass, field
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import TypeVar
 
@@ -13,8 +17,18 @@ from ..error_handling.exceptions import AgendaFailure
 from ..log_utils import set_up_logging
 from ..whitespace import normalise_whitespace
 from .check import Checker
+from .importers import add_imports
+from .manifest.all_fix import fix_all
 from .manifest.all_fmt import format_all
+from .manifest.match import NameMatcher
 from .parse import reparse
+from .placement import (
+    Statement,
+    import_time_names,
+    placements,
+    postpones_annotations,
+)
+from .symbols import Symbol
 from .text_diff import get_unidiff_text
 
 logger = set_up_logging(name=__name__)
@@ -96,12 +110,23 @@ class NamedPatch(Patch):
     name: str
 
 
+@dataclass(kw_only=True)
 class Departure(NamedPatch):
-    """A definition or importation leaving."""
+    """
+    A definition or importation leaving. A nested definition (at an `indent`) is cut
+    with the blank lines separating it from its siblings, and replaced by a `filler`
+    if it leaves its block empty.
+    """
 
+    indent: int = 0
+    filler: str | None = None
 
+
+@dataclass(kw_only=True)
 class Arrival(NamedPatch):
-    """A definition or importation arriving."""
+    """A definition or importation arriving (dedented by its `indent`)."""
+
+    indent: int = 0
 
 
 @dataclass(kw_only=True)
@@ -111,6 +136,16 @@ class Documented(NamedPatch):
     depth: int
 
 
+def is_blank(line: str | None) -> bool:
+    return line is not None and not line.strip()
+
+
+def dedent_line(line: str, indent: int) -> str:
+    """Remove the first `indent` characters of a line, if they are all whitespace."""
+    prefix = line[:indent]
+    return line[indent:] if not prefix.strip() and "\n" not in prefix else line
+
+
 @dataclass
 class Editor:
     lines: str
@@ -126,12 +161,44 @@ class Cutter(Editor):
         for departure in self.edits:
             lineno, end_lineno = departure.rng
             # NB AST line numbers are 1-based, list index is 0-based
-            # Replace strings with None to indicate removal without altering index
-            lines[lineno - 1 : end_lineno] = [None for _ in range(end_lineno - lineno)]
+            if departure.indent:
+                self.snip_nested(lines, departure)
+            elif lineno == end_lineno and not self.set_apart(lines, lineno - 1):
+                # A line among others (e.g. a constant or import) just goes
+                del lines[lineno - 1]
+            else:
+                # Replace strings with None to indicate removal without altering index,
+                # so the blank lines around it are normalised to the `spacing`
+                lines[lineno - 1 : end_lineno] = [None] * (end_lineno - lineno + 1)
             logger.debug(f"Snipped {departure.rng}")
         normalised = normalise_whitespace(lines, spacing=self.spacing)
         return normalised
 
+    @staticmethod
+    def set_apart(lines: list[str | None], index: int) -> bool:
+        """Whether a line has blank lines (or a removed line) both before and after."""
+        before = lines[index - 1] if index > 0 else None
+        after = lines[index + 1] if index + 1 < len(lines) else None
+        return all(line is None or is_blank(line) for line in [before, after])
+
+    @staticmethod
+    def snip_nested(lines: list[str | None], departure: Departure) -> None:
+        """
+        Delete a nested definition along with the blank lines before it (or if it's
+        first in its block, after it) so its siblings keep their spacing, leaving the
+        `filler` in its place if it was alone in its block.
+        """
+        start, end = departure.rng[0] - 1, departure.rng[1]
+        if departure.filler is not None:
+            lines[start:end] = [departure.filler]
+            return
+        while start > 0 and is_blank(lines[start - 1]):
+            start -= 1
+        if start == departure.rng[0] - 1:
+            while end < len(lines) and is_blank(lines[end]):
+                end += 1
+        del lines[start:end]
+
 
 @dataclass
 class Paster(Editor):
@@ -140,16 +207,24 @@ class Paster(Editor):
 
     def __str__(self) -> str:
         hem = []
-        ref_lines = self.ref.code.splitlines(keepends=True)
+        ref_lines = self.ref.lines
         for arrival in self.edits:
             lineno, end_lineno = arrival.rng
             # NB AST line numbers are 1-based, list index is 0-based
-            addendum = "".join(ref_lines[lineno - 1 : end_lineno])
+            addendum = "".join(
+                dedent_line(line, arrival.indent)
+                for line in ref_lines[lineno - 1 : end_lineno]
+            )
             logger.debug(f"Pasted {addendum}")
             hem.append(addendum)
         result = ("\n" * self.spacing).join(hem)
         return result
 
+    def __iter__(self) -> Iterator[Paster]:
+        """A Paster for each of the arrivals, on its own."""
+        for arrival in self.edits:
+            yield Paster(self.lines, [arrival], ref=self.ref, spacing=self.spacing)
+
 
 @dataclass
 class ImportSpacing:
@@ -185,6 +260,7 @@ class Agenda:
         self.dest_ref = dest_ref
         self.targets = []
         self.targeted = OrderOfBusiness()
+        self.retained: list[str] = []  # Import lines to add to src (re-exporting)
 
     @property
     def empty(self) -> bool:
@@ -235,20 +311,20 @@ class Agenda:
 
     def manifest(self, dry_run: bool, as_list: bool) -> str:
         """
-        Manifest of definitions from applying the `targeted` agenda to the target file.
+        Manifest of definitions from applying the `targeted` agenda to the target file:
+        their names (`as_list`), an `__all__` assignment listing them (`dry_run`), or
+        otherwise the file's code with its `__all__` assignment fixed to list them.
         """
         def_depth = 1
         all_target_defs = self.ref.target_defs
         all_target_def_names = [d.name for d in all_target_defs if d.depth == def_depth]
-        wildcard_present = "*" in [d.name for d in self.targeted.doc]  # TODO tidy this
-        if wildcard_present:
-            assert len(self.targeted.doc) == 1, "Wildcard must be used alone"
-            manifest_names = all_target_def_names
-            wc_agendum = self.targeted.doc.pop()
-            self.outtake(["*"])
-            self.document(matchers=manifest_names, src=wc_agendum.file)
-        else:
-            raise NotImplementedError("Only wildcard implemented for now")
+        # Replace the documented patterns with the names they match
+        patterns = [d.name for d in self.targeted.doc]
+        manifest_names = NameMatcher(patterns).filter(all_target_def_names)
+        src = self.targeted.doc[0].file
+        self.targeted.doc.clear()
+        self.outtake(patterns)
+        self.document(matchers=manifest_names, src=src)
         docket = [
             Documented(name=node.name, rng=self.def_rng(node.name), depth=node.depth)
             for agendum in self.unique_docs
@@ -263,7 +339,7 @@ class Agenda:
         elif dry_run:
             manif = format_all(manifest_names)
         else:
-            raise NotImplementedError("File editing goes here")
+            manif = fix_all(self.ref.code, tree=self.ref.root, names=manifest_names)
         return manif
 
     def unidiff(self, target_file: Path, is_src: bool) -> str:
@@ -280,22 +356,50 @@ class Agenda:
         )
         return diff
 
-    def get_def_node(self, target_name: str) -> AST:
-        maybe_targets = [f for f in self.ref.target_defs if f.name == target_name]
+    def get_def_symbol(self, target_name: str) -> Symbol:
+        """
+        Look up a definition by its name or dotted path in the symbol tree (a bare
+        name shared with nested definitions meaning the top-level one, if any).
+        """
+        maybe_targets = self.ref.symbols.resolve(target_name)
+        if len(maybe_targets) > 1:
+            root = self.ref.symbols.root
+            top_level = [sym for sym in maybe_targets if sym.parent is root]
+            maybe_targets = top_level or maybe_targets
         if len(maybe_targets) > 1:
             raise NotImplementedError("Not handled name ambiguity yet")
         elif not maybe_targets:
             raise ValueError(f"Could not find a target def node named {target_name}")
         else:
-            node = maybe_targets.pop()
-            return node
+            return maybe_targets[0]
+
+    def get_def_node(self, target_name: str) -> AST:
+        return self.get_def_symbol(target_name).node
+
+    def departure(self, target_name: str, leaving: set[int]) -> Departure:
+        """
+        A definition leaving: if nested, at its indent, and with a `pass` to fill its
+        block if nothing else is left in it (none of the `leaving` node IDs).
+        """
+        node = self.get_def_node(target_name)
+        rng = self.def_rng(target_name)
+        if not (indent := node.col_offset):
+            return Departure(name=target_name, rng=rng)
+        siblings = next(
+            value
+            for _, value in iter_fields(self.ref.getParent(node))
+            if isinstance(value, list) and node in value
+        )
+        left = [stmt for stmt in siblings if id(stmt) not in leaving]
+        filler = None if left else f"{' ' * indent}pass\n"
+        return Departure(name=target_name, rng=rng, indent=indent, filler=filler)
 
     def def_rng(self, target_name: str) -> tuple[int, int]:
         """
         Get the line range of a definition with the target name.
         """
         node = self.get_def_node(target_name=target_name)
-        decos = node.decorator_list
+        decos = getattr(node, "decorator_list", [])
         # Use the lineno of the first decorator, or of the node if it's undecorated
         start_lineno = (decos[0] if decos else node).lineno
         line_range = (start_lineno, node.end_lineno)
@@ -347,36 +451,65 @@ class Agenda:
             if resting_imports:
                 raise NotImplementedError("Imports staying and going on same line")
         copped = [
-            Arrival(name=n.name, rng=self.def_rng(n.name)) for n in self.unique_cops
-        ]
-        lopped = [
-            Departure(name=n.name, rng=self.def_rng(n.name)) for n in self.unique_lops
+            Arrival(
+                name=n.name,
+                rng=self.def_rng(n.name),
+                indent=self.get_def_node(n.name).col_offset,
+            )
+            for n in self.unique_cops
         ]
+        leaving = {id(self.get_def_node(n.name)) for n in self.unique_lops}
+        lopped = [self.departure(n.name, leaving) for n in self.unique_lops]
         lopped.sort(key=lambda d: d.rng, reverse=True)
         sorted_lop_deps = lopped == sorted(lopped, key=lambda d: d.rng, reverse=True)
         assert sorted_lop_deps, f"Unsorted lop deps {lopped}"
-        # Prune unused imports_out if passed"
-        lopped_with_imports = lopped + [
-            Departure(name=imp.name, rng=imp.rng) for imp in imports_out
-        ]
-        sorted_lop_imps = lopped_with_imports == sorted(
-            lopped_with_imports,
+        # Prune unused imports_out if passed (cutting from the end of the file back)
+        lopped_with_imports = sorted(
+            lopped + [Departure(name=imp.name, rng=imp.rng) for imp in imports_out],
             key=lambda d: d.rng,
             reverse=True,
         )
-        assert sorted_lop_imps, "Unsorted lop deps after appending imports"
         cut = Cutter(input_text, lopped_with_imports, spacing=self.spacing)
         paste = Paster(input_text, copped, ref=self.ref, spacing=self.spacing)
-        ends = [str(cut).rstrip("\n"), str(paste).rstrip("\n")]
-        # Increment spacing by 1 to account for the stripped line ending
-        inter_def_sep = "\n" * (self.spacing + 1)
-        sewn = inter_def_sep.join(filter(None, ends)) + "\n"
+        sewn = self.place(str(cut), paste)
         if imports_in:
             done = self.sew_in_imports(imports=imports_in, text=sewn, recheck=recheck)
         else:
             done = sewn
         return done
 
+    def place(self, text: str, paste: Paster) -> str:
+        """
+        Insert the arriving definitions into the text: each before the first top-level
+        statement using it when the module is imported (if any, else at the end), but
+        after the statements binding the names it uses then, and after the arrivals it
+        uses (see `placements`).
+        """
+        pieces = {arrival.name: piece for arrival, piece in zip(paste.edits, paste)}
+        try:
+            statements = Statement.from_module(text)
+            postponed = postpones_annotations(ast_parse(text))
+        except SyntaxError:
+            statements, postponed = [], False
+        arrivals = {
+            name: import_time_names(self.get_def_node(name), postponed=postponed)
+            for name in pieces
+        }
+        lines = text.splitlines(keepends=True)
+        starts = [stmt.lineno - 1 for stmt in statements] + [len(lines)]
+        chunks, done = [], 0
+        for slot, placed in groupby(placements(arrivals, statements), itemgetter(1)):
+            at = starts[slot]
+            chunks.append("".join(lines[done:at]))
+            group = [pieces[name] for name, _ in placed]
+            chunks.append(("\n" * self.spacing).join(map(str, group)))
+            done = at
+        chunks.append("".join(lines[done:]))
+        # Increment spacing by 1 to account for the stripped line ending
+        inter_def_sep = "\n" * (self.spacing + 1)
+        ends = [chunk.rstrip("\n") for chunk in chunks]
+        return inter_def_sep.join(filter(None, ends)) + "\n"
+
     def sew_in_imports(
         self,
         imports: list[ArrivingImport],
@@ -407,7 +540,8 @@ class Agenda:
         # TODO: use recheck's list of imports rather than the `original_ref` to
         # determine if defs/imports are in the file, to be spaced out against
         ref = recheck  # self.original_ref
-        min_def_ln = min((d.lineno for d in ref.alldefs), default=0)
+        defs = [*ref.alldefs, *ref.assigndefs]
+        min_def_ln = min((d.lineno for d in defs), default=0)
         min_imp_ln = min((i.source.lineno for i in ref.imports), default=0)
         # If the file is missing either definitions or imports, the min. will be 0.
         # Using or means that in this case, the other value would be used instead.
@@ -491,17 +625,18 @@ class Agenda:
         if self.is_src:
             unused_imports = self.compare_imports(recheck)
             if unused_imports:
-                return self.resimulate(
+                done = self.resimulate(
                     input_text,
                     imports_in=[],
                     imports_out=unused_imports,
                 )
             else:
-                return pre_sim
+                done = pre_sim
+            return add_imports(done, self.retained)
         else:
             import_uses = self.map_import_usage()
             if import_uses:
-                dependent_imports = self.patch_dependents(uses=import_uses)
+                dependent_imports = self.patch_dependents(import_uses, recheck)
                 return self.resimulate(
                     input_text,
                     imports_in=dependent_imports,
@@ -511,19 +646,26 @@ class Agenda:
             else:
                 return pre_sim
 
-    def patch_dependents(self, uses: list[SourcedUse]) -> list[ArrivingImport]:
+    def patch_dependents(
+        self,
+        uses: list[SourcedUse],
+        recheck: Checker,
+    ) -> list[ArrivingImport]:
         """
         Patch any uses which depend on getting a new import. Turn the list of
         AST-sourced name binding uses into a list of patches to apply (prepend).
-        Ensure not to patch any that are already present in the dst file.
+        Ensure not to patch any that are already present in the dst text (as
+        rechecked, so including any brought in by a previous simulation on it).
         """
-        dst_import_names = {imp.name for imp in self.original_ref.imports}
-        arrivals = [
-            ArrivingImport(bound=used_import)
+        dst_import_names = {imp.name for imp in recheck.imports}
+        # Each import is brought once, however many of the moved definitions use it
+        used_imports = {
+            id(used_import): used_import
             for use in uses
             for used_import in use.imports
             if use.name not in dst_import_names
-        ]
+        }
+        arrivals = [ArrivingImport(bound=imp) for imp in used_imports.values()]
         return arrivals
 
     def map_import_usage(self) -> list[SourcedUse]:
@@ -565,7 +707,13 @@ class Agenda:
         This function is hardcoded to use `self.ref`, as we would never consider using
         `self.dst_ref` (which by definition does not contain the `target_defs` to move)
         or the `recheck` of src (which may have caused removal of used imports).
+
+        The result is memoised on `self.ref` for the names copped, so it is computed
+        once for all the destinations that the same definitions are copied to.
         """
+        cop_names = tuple(c.name for c in self.unique_cops)
+        if (cached := self.ref.sourced_uses.get(cop_names)) is not None:
+            return cached
         # TODO: also duplicate future annotations without asking?
         if self.ref.imports:
             src_imp_name_trees = [
@@ -584,12 +732,13 @@ class Agenda:
                     ]
                     for name, use_list in self.ref.import_uses.items()
                 }
-                cop_names = [c.name for c in self.unique_cops]
                 target_defs_in_src_to_cop = list(map(self.get_def_node, cop_names))
                 sourced_uses = [
                     SourcedUse(
                         name=imp_name,
-                        imports=[imp for imp in self.ref.imports],  # (BUG) not filtered
+                        imports=[
+                            imp for imp in self.ref.imports if imp.name == imp_name
+                        ],
                         target=mv_target_in_src,
                     )
                     for imp_name, tree_group in all_src_imp_name_trees.items()
@@ -615,6 +764,7 @@ class Agenda:
                 sourced_uses = []
         else:
             sourced_uses = []
+        self.ref.sourced_uses[cop_names] = sourced_uses
         return sourced_uses
 
     def compare_imports(self, recheck: Checker) -> list[DepartingImport]:
@@ -635,8 +785,8 @@ class Agenda:
         # ]
         if not lose_uu_names:
             return []
-        # Full name is either the asname, the dotted qualpath, or just a name
-        # and matches the message arg (expected/tested assumption)
+        # The message arg is the imported name: its full name (the dotted path,
+        # or just a name), followed by " as {name}" if aliased
         newly_unused_imports = [
             DepartingImport(
                 imp,
@@ -644,7 +794,7 @@ class Agenda:
                 end_lineno=imp.source.end_lineno,
             )
             for imp in original_imports
-            if imp.fullName in lose_uu_names
+            if imp.imported_name in lose_uu_names
         ]
         assert len(lose_uu_names) == len(newly_unused_imports)
         logger.debug("Found unused imports: {newly_unused_imports}")
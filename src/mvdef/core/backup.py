@@ -0,0 +1,180 @@
+"""Content-addressed store of the files changed by each operation (used to undo)."""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from ..cache_dir import cache_dir
+from ..error_handling.exceptions import WriteConflict
+from ..log_utils import set_up_logging
+from .digest import content_digest
+
+__all__ = ["BackupStore", "FileChange", "Operation"]
+
+logger = set_up_logging(name=__name__)
+
+
+@dataclass
+class FileChange:
+    """
+    The digests of a file's contents before and after an operation (`None` meaning that
+    the file did not exist).
+    """
+
+    path: str
+    before: str | None
+    after: str | None
+
+
+@dataclass
+class Operation:
+    """A committed transaction's changes, recorded so that it can be undone."""
+
+    id: str
+    time: float
+    changes: list[FileChange] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: Path) -> Operation:
+        record = json.loads(path.read_text())
+        changes = [FileChange(**change) for change in record.pop("changes")]
+        return cls(**record, changes=changes)
+
+    @property
+    def paths(self) -> list[Path]:
+        return [Path(change.path) for change in self.changes]
+
+
+class BackupStore:
+    """
+    Pre-images of changed files, stored once per distinct content (under its digest, so
+    repeated backups of the same text cost nothing), plus a record of each operation.
+
+    The store is pruned as operations are recorded: records older than `max_age`
+    seconds are dropped, then the oldest until the objects fit in `max_bytes`, then
+    any objects no longer referenced by a record. As pruning reads the whole history,
+    it only runs once `prune_interval` seconds have passed since it last did, or
+    `prune_bytes` of new objects have been stored since (as noted in `state`).
+    """
+
+    max_age: float = 30 * 24 * 60 * 60  # 30 days
+    max_bytes: int = 256 * 2**20  # 256 MiB
+    prune_interval: float = 24 * 60 * 60  # 1 day
+    prune_bytes: int = 16 * 2**20  # 16 MiB
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = cache_dir("backups") if root is None else root
+        self.objects = self.root / "objects"
+        self.ops = self.root / "ops"
+        self.ops.mkdir(parents=True, exist_ok=True)
+        self.state = self.root / "state.json"
+        self.added = 0  # Bytes of new objects stored (not yet noted in `state`)
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def save(self, text: str) -> str:
+        """Store `text` (if not already stored) and return its digest."""
+        digest = content_digest(text)
+        obj = self.object_path(digest)
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_suffix(".tmp")
+            tmp.write_text(text)
+            tmp.replace(obj)
+            self.added += len(text.encode())
+        return digest
+
+    def load(self, digest: str) -> str:
+        return self.object_path(digest).read_text()
+
+    def record(self, op: Operation) -> Path:
+        op_path = self.ops / f"{time.time_ns():020d}-{op.id}.json"
+        op_path.write_text(json.dumps(asdict(op)))
+        self.prune_if_due()
+        return op_path
+
+    def prune_if_due(self) -> None:
+        """Prune if it is `prune_interval` since the last prune, or `prune_bytes`."""
+        try:
+            state = json.loads(self.state.read_text())
+        except (OSError, ValueError):
+            state = {"pruned": 0.0, "added": 0}
+        state["added"] += self.added
+        self.added = 0
+        if (
+            time.time() - state["pruned"] >= self.prune_interval
+            or state["added"] >= self.prune_bytes
+        ):
+            self.prune()
+            state = {"pruned": time.time(), "added": 0}
+        tmp = self.state.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        tmp.replace(self.state)
+
+    def history(self) -> list[tuple[Path, Operation]]:
+        """Recorded operations, most recent first (record names sort by time)."""
+        op_paths = sorted(self.ops.glob("*.json"), reverse=True)
+        return [(op_path, Operation.load(op_path)) for op_path in op_paths]
+
+    def restore_plan(self, n: int) -> list[tuple[Path, Operation]]:
+        """
+        The last `n` operations, checking that undoing them in turn (most recent first)
+        won't discard any change made outside of them, i.e. that each file is still as
+        the later operation left it.
+        """
+        plan = self.history()[:n]
+        current: dict[str, str | None] = {}
+        for _, op in plan:
+            for change in op.changes:
+                if change.path not in current:
+                    path = Path(change.path)
+                    on_disk = path.read_text() if path.exists() else None
+                    current[change.path] = on_disk and content_digest(on_disk)
+                if current[change.path] != change.after:
+                    msg = f"{change.path} was changed since operation {op.id}"
+                    raise WriteConflict(msg)
+                current[change.path] = change.before
+        return plan
+
+    def forget(self, op_path: Path) -> None:
+        op_path.unlink(missing_ok=True)
+
+    def prune(self) -> None:
+        history = self.history()
+        cutoff = time.time() - self.max_age
+        kept = []
+        for op_path, op in history:
+            if op.time < cutoff:
+                self.forget(op_path)
+            else:
+                kept.append(op)
+        referenced = {
+            digest
+            for op in kept
+            for change in op.changes
+            for digest in (change.before, change.after)
+            if digest is not None
+        }
+        for obj in list(self.objects.glob("*/*")):
+            if obj.name not in referenced:
+                obj.unlink()
+        sizes = {obj.name: obj.stat().st_size for obj in self.objects.glob("*/*")}
+        total = sum(sizes.values())
+        # Drop the oldest operations until the objects fit (keeping the latest one)
+        for op_path, op in reversed(history[1 : len(kept)]):
+            if total <= self.max_bytes:
+                break
+            self.forget(op_path)
+            kept.remove(op)
+            still_used = {
+                d for o in kept for c in o.changes for d in (c.before, c.after)
+            }
+            for change in op.changes:
+                for digest in (change.before, change.after):
+                    if digest in sizes and digest not in still_used:
+                        self.object_path(digest).unlink(missing_ok=True)
+                        total -= sizes.pop(digest)
@@ -0,0 +1,330 @@
+"""Run a plan of many moves/copies against in-memory file texts."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+from ..error_handling.exceptions import PlanFailure
+from ..log_utils import set_up_logging
+from .backup import BackupStore
+from .check import Checker
+from .diff import Differ
+from .digest import content_digest
+from .importers import IMPORT_STYLES, retained_imports
+from .parse import parse
+from .text_diff import get_unidiff_text
+from .transaction import staged_path
+
+__all__ = [
+    "BatchOp",
+    "GroupResult",
+    "StagedChange",
+    "Workspace",
+    "depends_on",
+    "file_groups",
+    "load_plan",
+    "run_group",
+    "run_ops",
+    "schedule",
+]
+
+logger = set_up_logging(name=__name__)
+
+
+@dataclass
+class BatchOp:
+    """A move (or copy) of the definitions named `mv` from `src` to `dst`."""
+
+    src: Path
+    dst: Path
+    mv: list[str]
+    copy: bool = False
+    cls_defs: bool = False
+    func_defs: bool = False
+    retain: bool = False
+    import_style: str = "."
+
+    def __post_init__(self) -> None:
+        if self.cls_defs and self.func_defs:
+            self.cls_defs, self.func_defs = False, False  # As for `MvDefBase`
+
+    @property
+    def key(self) -> tuple:
+        """Ops with the same key can be merged into one (moving all their names)."""
+        flags = (self.copy, self.cls_defs, self.func_defs)
+        return (self.src, self.dst, *flags, self.retain, self.import_style)
+
+    @property
+    def files(self) -> list[Path]:
+        return [self.src, self.dst]
+
+    def __str__(self) -> str:
+        verb = "cp" if self.copy else "mv"
+        return f"{verb} {self.src} -> {self.dst}: {', '.join(self.mv)}"
+
+
+def load_plan(plan: Path) -> list[BatchOp]:
+    """
+    Read the ops from a TOML plan: an array of tables named `ops`, each with `src`,
+    `dst` and `mv` keys (plus optional `copy`, `cls_defs`, `func_defs` and `retain`
+    booleans, and an `import_style` for `retain`, as for `mvdef`). Relative paths are
+    relative to the plan's directory.
+    """
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError as exc:
+            raise PlanFailure("Reading plans needs Python 3.11+ (or tomli)") from exc
+    try:
+        records = tomllib.loads(plan.read_text()).get("ops", [])
+    except (OSError, tomllib.TOMLDecodeError) as exc:
+        raise PlanFailure(f"Could not read the plan {plan}: {exc}") from exc
+    base = plan.parent
+    ops = []
+    for i, record in enumerate(records):
+        if missing := {"src", "dst", "mv"} - record.keys():
+            raise PlanFailure(f"Plan op {i} is missing {sorted(missing)}")
+        if unknown := record.keys() - {f.name for f in fields(BatchOp)}:
+            raise PlanFailure(f"Plan op {i} has unknown keys {sorted(unknown)}")
+        if record.get("import_style", ".") not in IMPORT_STYLES:
+            raise PlanFailure(f"Plan op {i} has an unknown import_style")
+        paths = {k: (base / record[k]).resolve() for k in ["src", "dst"]}
+        if paths["src"] == paths["dst"]:
+            raise PlanFailure(f"Plan op {i} has the same src and dst")
+        mv = [record["mv"]] if isinstance(record["mv"], str) else list(record["mv"])
+        ops.append(BatchOp(**{**record, **paths, "mv": mv}))
+    return ops
+
+
+def schedule(ops: list[BatchOp]) -> list[BatchOp]:
+    """
+    Merge ops that can be done together, then order them so that each op runs after
+    any op bringing into its src a name it moves on (otherwise in plan order).
+
+    An op merges into an earlier one with the same src, dst and flags if no op in
+    between touches either file (so the result is the same as running them in turn).
+    """
+    merged: list[BatchOp] = []
+    last_touched: dict[Path, BatchOp] = {}
+    for op in ops:
+        prior = last_touched.get(op.src)
+        mergeable = prior is not None and prior.key == op.key
+        if mergeable and prior is last_touched.get(op.dst):
+            prior.mv.extend(name for name in op.mv if name not in prior.mv)
+            continue
+        op = BatchOp(**{**vars(op), "mv": list(op.mv)})
+        merged.append(op)
+        for path in op.files:
+            last_touched[path] = op
+    # Stable topological sort: an op depends on any op bringing into its src a name it
+    # moves on, and otherwise on the earlier ops touching the same files (unless the
+    # earlier op already depends on it, directly or through others)
+    deps = {id(op): set() for op in merged}
+    for op in merged:
+        for other in merged:
+            if other.dst == op.src and set(other.mv) & set(op.mv):
+                deps[id(op)].add(id(other))
+    for j, later in enumerate(merged):
+        for earlier in merged[:j]:
+            shared = set(earlier.files) & set(later.files)
+            if shared and not depends_on(deps, id(earlier), id(later)):
+                deps[id(later)].add(id(earlier))
+    ordered: list[BatchOp] = []
+    done: set[int] = set()
+    while len(ordered) < len(merged):
+        ready = [op for op in merged if id(op) not in done and deps[id(op)] <= done]
+        if not ready:
+            stuck = [str(op) for op in merged if id(op) not in done]
+            raise PlanFailure(f"Plan ops depend on each other in a cycle: {stuck}")
+        ordered.append(ready[0])
+        done.add(id(ready[0]))
+    return ordered
+
+
+def depends_on(deps: dict[int, set[int]], op: int, other: int) -> bool:
+    """Whether an op depends on another, directly or through others (depth-first)."""
+    stack, seen = [op], {op}
+    while stack:
+        for dep in deps[stack.pop()]:
+            if dep == other:
+                return True
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return False
+
+
+def file_groups(ops: list[BatchOp]) -> list[list[BatchOp]]:
+    """
+    Split (scheduled) ops into groups which share no files, so can run independently:
+    the connected components of the graph linking ops by the files they touch, found
+    by union-find. Ops keep their order within a group, and the largest group is first.
+    """
+    parent: dict[Path, Path] = {}
+
+    def find(path: Path) -> Path:
+        parent.setdefault(path, path)
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]  # Path halving
+            path = parent[path]
+        return path
+
+    for op in ops:
+        parent[find(op.src)] = find(op.dst)
+    groups: dict[Path, list[BatchOp]] = {}
+    for op in ops:
+        groups.setdefault(find(op.src), []).append(op)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+class Workspace:
+    """
+    The texts of the files a batch edits, read from disk once and then updated in
+    memory. Each version of a file is parsed at most once (per parse setting).
+    """
+
+    def __init__(self, escalate: bool = False, verbose: bool = False) -> None:
+        self.escalate = escalate
+        self.verbose = verbose
+        self.originals: dict[Path, str | None] = {}
+        self.texts: dict[Path, str] = {}
+        self.checks: dict[tuple[Path, bool, bool], Checker] = {}
+        self.parses = 0
+
+    def text(self, path: Path) -> str:
+        """The current text of `path` (empty if the file doesn't exist)."""
+        if path not in self.texts:
+            original = path.read_text() if path.exists() else None
+            self.originals[path] = original
+            self.texts[path] = original or ""
+        return self.texts[path]
+
+    def check(self, path: Path, cls_defs: bool, func_defs: bool) -> Checker:
+        key = (path, cls_defs, func_defs)
+        if key not in self.checks:
+            text = self.text(path)
+            check = parse(
+                text,
+                file=path,
+                verbose=self.verbose,
+                escalate=self.escalate,
+                cls_defs=cls_defs,
+                func_defs=func_defs,
+            )
+            if check is None:
+                raise PlanFailure(f"Failed to parse {path}")
+            self.parses += 1
+            self.checks[key] = check
+        return self.checks[key]
+
+    def update(self, path: Path, text: str) -> None:
+        self.text(path)  # Make sure the original is recorded
+        if text != self.texts[path]:
+            self.texts[path] = text
+            for key in [k for k in self.checks if k[0] == path]:
+                del self.checks[key]
+
+    @property
+    def changed(self) -> dict[Path, str]:
+        """The new texts of the files whose contents were changed."""
+        return {
+            path: text
+            for path, text in self.texts.items()
+            if text != (self.originals[path] or "")
+        }
+
+    def before(self, path: Path) -> str:
+        """What the file contained when read (empty if it didn't exist)."""
+        return self.originals[path] or ""
+
+    def unidiff(self, path: Path) -> str:
+        return get_unidiff_text(
+            a=self.before(path).splitlines(keepends=True),
+            b=self.texts[path].splitlines(keepends=True),
+            filename=path.name,
+        )
+
+
+def run_ops(ops: list[BatchOp], workspace: Workspace) -> None:
+    """Apply each op in turn to the texts in the `workspace`."""
+    for op in ops:
+        flags = {"cls_defs": op.cls_defs, "func_defs": op.func_defs}
+        src_check = workspace.check(op.src, **flags)
+        if absent := {name for name in op.mv if not src_check.symbols.resolve(name)}:
+            raise PlanFailure(f"Not in {op.src} (when running `{op}`): {absent}")
+        dst_check = workspace.check(op.dst, **flags)
+        kwargs = {
+            "mv": op.mv,
+            "source_ref": src_check,
+            "escalate": workspace.escalate,
+            "verbose": workspace.verbose,
+        }
+        src_diff = Differ(op.src, **kwargs)
+        dst_diff = Differ(op.src, **kwargs, dst=op.dst, dest_ref=dst_check)
+        if op.copy:
+            src_diff.populate_agenda()
+        else:
+            if op.retain:
+                routes, style = {op.dst: op.mv}, op.import_style
+                src_diff.agenda.retained = retained_imports(op.src, routes, style)
+            # (The dst diff pastes from `src_check`, so is unaffected by this update)
+            workspace.update(op.src, src_diff.simulate())
+        workspace.update(op.dst, dst_diff.simulate())
+        logger.info(f"Ran {op}")
+
+
+@dataclass
+class StagedChange:
+    """
+    A file changed by a group of ops: the digest its contents must still have when
+    committed (`expected`), and those stored in the backup store (`before`/`after`),
+    or on a dry run the diff.
+    """
+
+    target: Path
+    expected: str
+    before: str | None = None
+    after: str | None = None
+    diff: str | None = None
+
+
+@dataclass
+class GroupResult:
+    ops: int
+    parses: int
+    changes: list[StagedChange]
+
+
+def run_group(
+    ops: list[BatchOp],
+    *,
+    transaction_id: str | None,
+    backups: BackupStore | None = None,
+    escalate: bool = False,
+    verbose: bool = False,
+) -> GroupResult:
+    """
+    Run a group of ops (in a worker process). Rather than sending the new texts back,
+    each changed file is written to its staged path in the transaction (which the
+    parent process reserved, and adopts on return) so the result stays small. Without
+    a `transaction_id` (on a dry run), the changes' diffs are returned instead.
+    """
+    workspace = Workspace(escalate=escalate, verbose=verbose)
+    run_ops(ops, workspace)
+    changes = []
+    for path, text in workspace.changed.items():
+        before = workspace.before(path)
+        change = StagedChange(target=path, expected=content_digest(before))
+        if transaction_id is None:
+            change.diff = workspace.unidiff(path)
+        else:
+            staged_path(path.absolute(), transaction_id).write_text(text)
+            if backups is not None:
+                existed = workspace.originals[path] is not None
+                change.before = backups.save(before) if existed else None
+                change.after = content_digest(text)
+        changes.append(change)
+    return GroupResult(ops=len(ops), parses=workspace.parses, changes=changes)
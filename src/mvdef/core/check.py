@@ -5,7 +5,9 @@ from __future__ import annotations
 import ast
 import os
 from ast import AST
-from functools import cache
+from collections import Counter
+from functools import cache, cached_property
+from typing import TYPE_CHECKING
 
 import pyflakes
 from pyflakes import checker
@@ -23,7 +25,27 @@ from pyflakes.messages import UnusedImport
 
 from ..error_handling.failure import FailableMixIn
 
-__all__ = ["Checker"]
+if TYPE_CHECKING:
+    from .symbols import SymbolTree
+
+__all__ = ["Checker", "symbol_name"]
+
+TYPE_ALIAS = getattr(ast, "TypeAlias", ())  # The `type X = ...` statement (3.12+)
+
+
+def is_dunder(name: str) -> bool:
+    return name.startswith("__") and name.endswith("__")
+
+
+def symbol_name(node: AST) -> str:
+    """The name a definition binds, or the name a (movable) assignment assigns."""
+    if isinstance(node, ast.Assign):
+        return node.targets[0].id
+    elif isinstance(node, ast.AnnAssign):
+        return node.target.id
+    elif isinstance(node, TYPE_ALIAS):
+        return node.name.id
+    return node.name
 
 
 class Checker(FailableMixIn, checker.Checker):
@@ -36,6 +58,7 @@ class Checker(FailableMixIn, checker.Checker):
     funcdefs: list[AST]
     classdefs: list[AST]
     alldefs: list[AST]
+    assigndefs: list[AST]
     imports: list[tuple[AST, Importation | type[Importation]]]
     import_uses: dict[str, list[tuple[AST, Importation | type[Importation]]]]
 
@@ -48,8 +71,10 @@ class Checker(FailableMixIn, checker.Checker):
         self.funcdefs = []
         self.classdefs = []
         self.alldefs = []
+        self.assigndefs = []
         self.imports = []
         self.import_uses = {}
+        self.sourced_uses = {}  # Memo of `Agenda.map_import_usage` by names moved
         super().__init__(*args, **kwargs)
 
     @property
@@ -64,6 +89,36 @@ class Checker(FailableMixIn, checker.Checker):
         else:
             return self.classdefs if self.target_cls else self.funcdefs
 
+    @property
+    def movable_defs(self) -> list[AST]:
+        """
+        The target definitions, and (unless only targeting classes or functions) the
+        top-level assignments which are the only binding of their name in the module
+        (besides those to special names like `__all__`).
+        """
+        if not self.target_all:
+            return self.target_defs
+        def_names = {node.name for node in self.alldefs if node.depth == 1}
+        counts = Counter(map(symbol_name, self.assigndefs))
+        return self.alldefs + [
+            node
+            for node in self.assigndefs
+            if counts[name := symbol_name(node)] == 1
+            if name not in def_names and not is_dunder(name)
+        ]
+
+    @cached_property
+    def symbols(self) -> SymbolTree:
+        """The tree of the definitions to look them up by (dotted) name, built once."""
+        from .symbols import SymbolTree
+
+        return SymbolTree(self)
+
+    @cached_property
+    def lines(self) -> list[str]:
+        """The lines of the code (with line endings), indexed once per parse."""
+        return self.code.splitlines(keepends=True)
+
     def handleNode(self, node: AST | None, parent: AST) -> None:
         """Subclass override"""
         super().handleNode(node=node, parent=parent)
@@ -82,6 +137,30 @@ class Checker(FailableMixIn, checker.Checker):
         self.funcdefs.append(node)
         self.alldefs.append(node)
 
+    ASYNCFUNCTIONDEF = FUNCTIONDEF  # (pyflakes aliases its own method, not ours)
+
+    def ASSIGN(self, node: AST) -> None:
+        """Subclass override"""
+        super().ASSIGN(node=node)
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            self.add_assignment(node)
+
+    def ANNASSIGN(self, node: AST) -> None:
+        """Subclass override"""
+        super().ANNASSIGN(node=node)
+        if node.value is not None and isinstance(node.target, ast.Name):
+            self.add_assignment(node)
+
+    def TYPEALIAS(self, node: AST) -> None:
+        """Subclass override"""
+        super().TYPEALIAS(node=node)
+        self.add_assignment(node)
+
+    def add_assignment(self, node: AST) -> None:
+        """Record an assignment to a single name at the top level of the module."""
+        if self.getParent(node) is self.root:
+            self.assigndefs.append(node)
+
     def addBinding(self, node: AST, value) -> None:
         super().addBinding(node=node, value=value)
         if isinstance(value, checker.Importation):
@@ -0,0 +1,201 @@
+"""
+Detect the import cycles that a change to some files would create among the modules
+of a project, by searching its import graph (built from the symbol index) from just
+the import edges the change adds.
+"""
+
+from __future__ import annotations
+
+import ast
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pyflakes.checker import ImportationFrom
+
+from .importers import importer_package, module_name, package_parts
+from .parse import parse
+
+if TYPE_CHECKING:
+    from pyflakes.checker import Importation
+
+    from .check import Checker
+    from .index import SymbolIndex
+
+__all__ = [
+    "ImportGraph",
+    "absolute_name",
+    "import_targets",
+    "imported_module",
+    "new_cycles",
+    "runtime_imports",
+]
+
+DEFERRING = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+
+def is_type_checking(test: ast.expr) -> bool:
+    """Whether an `if` tests `TYPE_CHECKING` (so its body is not run at runtime)."""
+    name = getattr(test, "id", None) or getattr(test, "attr", None)
+    return name == "TYPE_CHECKING"
+
+
+def runtime_imports(check: Checker) -> list[Importation]:
+    """
+    The imports which run when the module is imported: those not in a function (whose
+    body runs only when called) nor under `if TYPE_CHECKING:`.
+    """
+    runtime = []
+    for imp in check.imports:
+        node = imp.source
+        for parent in check.get_ancestors(node) or []:
+            if isinstance(parent, DEFERRING) or (
+                isinstance(parent, ast.If)
+                and is_type_checking(parent.test)
+                and node in parent.body
+            ):
+                break
+            node = parent
+        else:
+            runtime.append(imp)
+    return runtime
+
+
+def imported_module(imp: Importation) -> str:
+    """The module an import is from (for `import a.b`, the module `a.b` itself)."""
+    return imp.module if isinstance(imp, ImportationFrom) else imp.fullName
+
+
+def absolute_name(name: str, package: list[str]) -> str | None:
+    """
+    The absolute name of a (possibly relative) dotted name, as imported from a module
+    in the `package` (None if it goes above the top package).
+    """
+    level = len(name) - len(name.lstrip("."))
+    if not level:
+        return name
+    if level - 1 > len(package):
+        return None
+    base = package[: len(package) - (level - 1)]
+    return ".".join(base + ([name[level:]] if name[level:] else []))
+
+
+def import_targets(module: str, full_name: str, package: list[str]) -> list[str]:
+    """
+    The absolute names of the modules an import may run, most specific first: for
+    `from m import n`, the submodule `m.n` (if `n` is one) else `m`. The `module` and
+    `full_name` are as stored in the symbol index (see `index_file`).
+    """
+    names = [full_name] if module == full_name else [full_name, module]
+    return [n for n in (absolute_name(name, package) for name in names) if n]
+
+
+@dataclass
+class ImportGraph:
+    """The modules each module imports at runtime, by absolute name."""
+
+    edges: dict[str, set[str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_index(cls, index: SymbolIndex, scope: list[Path]) -> ImportGraph:
+        """The graph of the modules indexed under the `scope`."""
+        paths = [Path(path) for path in index.paths(scope)]
+        modules = {module_name(path) for path in paths}
+        graph = cls({name: set() for name in modules})
+        for path, module, full_name in index.runtime_imports(scope):
+            path = Path(path)
+            targets = import_targets(module, full_name, importer_package(path))
+            if target := next((t for t in targets if t in modules), None):
+                graph.edges[module_name(path)].add(target)
+        return graph
+
+    def path(self, start: str, goal: str) -> list[str] | None:
+        """The shortest chain of imports from `start` to `goal` (breadth-first)."""
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == goal:
+                chain = []
+                while node is not None:
+                    chain.append(node)
+                    node = previous[node]
+                return chain[::-1]
+            for target in self.edges.get(node, ()):
+                if target not in previous:
+                    previous[target] = node
+                    queue.append(target)
+        return None
+
+
+def file_edges(text: str, path: Path, known: set[str]) -> set[str]:
+    """
+    The project modules which a file's code imports at runtime: those that are among
+    the `known` modules, or have a file under the directory its top package is in.
+    """
+    check = parse(text, file=path)
+    if check is None:
+        return set()
+    import_root = path.absolute().parents[len(package_parts(path))]
+    package = importer_package(path)
+    edges = set()
+    for imp in runtime_imports(check):
+        for target in import_targets(imported_module(imp), imp.fullName, package):
+            if target in known or module_exists(target, import_root):
+                edges.add(target)
+                break
+    return edges
+
+
+def module_exists(name: str, import_root: Path) -> bool:
+    base = import_root.joinpath(*name.split("."))
+    return base.with_suffix(".py").exists() or (base / "__init__.py").exists()
+
+
+def top_level(name: str, import_root: Path) -> Path:
+    """The directory of a module's top-level package (or the file of a lone module)."""
+    base = import_root / name.split(".")[0]
+    return base if base.is_dir() else base.with_suffix(".py")
+
+
+def new_cycles(
+    changed: dict[Path, str],
+    *,
+    jobs: int = 1,
+) -> list[list[str]]:
+    """
+    The import cycles that writing the `changed` text of each file would create (as
+    the chain of modules, ending where it began). Only if the change adds an import
+    of a module in the project is the import graph looked at, and then only that of
+    the top-level packages of the files changed and the modules they newly import:
+    the symbol index is brought up to date for those, and each import added is
+    checked for a chain of imports leading back to the importer.
+    """
+    from .index import SymbolIndex
+    from .listing import expand_paths
+
+    known = {module_name(path) for path in changed}
+    after, added, tops = {}, [], {}
+    for path, text in changed.items():
+        module = module_name(path)
+        import_root = path.absolute().parents[len(package_parts(path))]
+        before = path.read_text() if path.exists() else ""
+        old = file_edges(before, path, known)
+        after[module] = file_edges(text, path, known) - {module}
+        new = sorted(after[module] - old)
+        added.extend((module, target) for target in new)
+        tops.update(dict.fromkeys(top_level(n, import_root) for n in [module, *new]))
+    if not added:
+        return []
+    scope = [top for top in tops if top.exists()]
+    with SymbolIndex() as index:
+        index.update(scope, expand_paths(tuple(scope)), jobs=jobs)
+        graph = ImportGraph.from_index(index, scope)
+    graph.edges.update(after)
+    cycles, seen = [], set()
+    for module, target in added:
+        if (chain := graph.path(target, module)) and frozenset(chain) not in seen:
+            seen.add(frozenset(chain))
+            cycles.append([module, *chain])
+    return cycles
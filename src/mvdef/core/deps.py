@@ -0,0 +1,122 @@
+"""
+Find the helpers (the other top-level definitions and constants in a module) that the
+definitions being moved depend on, to move them along too.
+"""
+
+from __future__ import annotations
+
+import ast
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .check import symbol_name
+from .manifest.all_fix import find_all
+
+if TYPE_CHECKING:
+    from .check import Checker
+
+__all__ = ["Closure", "dependency_closure", "name_uses", "reference_graph"]
+
+MODULE = ""  # Stands for the module-level code (outside any top-level definition)
+
+
+def top_level_defs(check: Checker) -> list[ast.AST]:
+    """
+    The top-level definitions of the module (in order) of the kinds targeted, and the
+    assignments that can be moved with them (see `Checker.movable_defs`).
+    """
+    return sorted(
+        (node for node in check.movable_defs if node.depth == 1),
+        key=lambda node: node.lineno,
+    )
+
+
+def exported_names(check: Checker) -> set[str]:
+    """The names listed in the module's `__all__` (if it is a literal)."""
+    if (node := find_all(check.root)) is None:
+        return set()
+    try:
+        return set(ast.literal_eval(node.value))
+    except (ValueError, TypeError):
+        return set()
+
+
+def reference_graph(check: Checker) -> dict[str, set[str]]:
+    """
+    The top-level definitions that each top-level definition uses (by name). The uses
+    from the rest of the module are keyed by `MODULE`.
+    """
+    return name_uses(check, set(map(symbol_name, top_level_defs(check))))
+
+
+def name_uses(check: Checker, names: set[str]) -> dict[str, set[str]]:
+    """
+    Which of the `names` each top-level definition uses (`MODULE` for the rest of the
+    module), found by locating the uses that the Checker bound to each name within
+    the definitions' line spans.
+    """
+    nodes = top_level_defs(check)
+    starts = [
+        (node.decorator_list[0] if getattr(node, "decorator_list", []) else node).lineno
+        for node in nodes
+    ]
+    graph = {name: set() for name in [MODULE, *map(symbol_name, nodes)]}
+    for name, use_list in check.import_uses.items():
+        if name not in names:
+            continue
+        for _, use in use_list:
+            i = bisect_right(starts, use.lineno) - 1
+            within = i >= 0 and use.lineno <= nodes[i].end_lineno
+            user = symbol_name(nodes[i]) if within else MODULE
+            if user != name:
+                graph[user].add(name)
+    return graph
+
+
+@dataclass
+class Closure:
+    """
+    The definitions to move (the targets then their helpers, in the module's order)
+    and the helpers they use which must stay, as the rest of the module uses them.
+    """
+
+    names: list[str]
+    left: list[str]
+
+
+def dependency_closure(
+    check: Checker,
+    targets: list[str],
+    *,
+    keep_used: bool = True,
+) -> Closure:
+    """
+    The transitive closure of the top-level definitions that the `targets` use. If
+    `keep_used`, minus the helpers still used by the code that stays in the module
+    (including its `__all__`), and in turn the helpers only those use.
+    """
+    graph = reference_graph(check)
+    closure, stack = set(targets), list(targets)
+    while stack:
+        for dep in graph.get(stack.pop(), ()):
+            if dep not in closure:
+                closure.add(dep)
+                stack.append(dep)
+    if keep_used:
+        graph[MODULE] |= exported_names(check)
+        while staying := {
+            dep
+            for user, deps in graph.items()
+            if user not in closure
+            for dep in deps
+            if dep in closure and dep not in targets
+        }:
+            closure -= staying
+    order = list(map(symbol_name, top_level_defs(check)))
+    used = set().union(*(graph[name] for name in closure if name in graph))
+    nested = [name for name in targets if name not in order]
+    return Closure(
+        names=[name for name in order if name in closure] + nested,
+        left=[name for name in order if name in used - closure],
+    )
@@ -2,10 +2,10 @@
 
 from dataclasses import KW_ONLY, dataclass
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 
 from .agenda import Agenda
 from .check import Checker
+from .transaction import Transaction
 
 __all__ = ["Differ"]
 
@@ -57,19 +57,32 @@ class Differ:
         """The source of the source or dest ref, depending on if `is_src`."""
         return self.source_ref.code if self.is_src else self.dest_ref.code
 
-    def execute(self) -> None:
+    def simulate(self, input_text: str | None = None) -> str:
         """
+        The new text of the target file (if `agenda` is empty, populates it first), or
+        of `input_text` in its place (to apply it on top of another change).
+        """
+        if self.agenda.empty:
+            self.populate_agenda()
+        text = self.old_code if input_text is None else input_text
+        return self.agenda.simulate(input_text=text)
+
+    def execute(self, transaction: Transaction | None = None) -> None:
+        """
+        Stage the result on a `Transaction`, which renames a temporary file over the
+        target when committed. If no `transaction` is passed, one is made and committed
+        for this file alone. The result is not staged if it is unchanged.
+
         See autoflake8, which uses rename (replace) with NamedTemporaryFile:
         https://github.com/fsouza/autoflake8/blob/main/autoflake8/fix.py#L668
 
         Also autoflake, which doesn't:
         https://github.com/PyCQA/autoflake/blob/main/autoflake.py#L970
         """
-        if self.agenda.empty:
-            self.populate_agenda()
         before = self.old_code
-        after = self.agenda.simulate(input_text=before)
-        with NamedTemporaryFile(delete=False, dir=self.target_file.parent) as output:
-            tmp_path = Path(output.name)
-            tmp_path.write_text(after)
-        tmp_path.rename(self.target_file)
+        after = self.simulate()
+        if transaction is None:
+            with Transaction() as transaction:
+                transaction.stage(self.target_file, after, before=before)
+        else:
+            transaction.stage(self.target_file, after, before=before)
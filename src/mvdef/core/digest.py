@@ -0,0 +1,10 @@
+"""Content hashes, used to tell whether a file changed since it was read."""
+
+from hashlib import sha256
+
+__all__ = ["content_digest"]
+
+
+def content_digest(text: str) -> str:
+    """The SHA-256 hex digest of a file's text (as UTF-8)."""
+    return sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
@@ -0,0 +1,322 @@
+"""
+Find the modules that import the definitions being moved (via the symbol index), and
+rewrite their import statements to import them from where they are moved to.
+"""
+
+from __future__ import annotations
+
+import ast
+from functools import cache
+from itertools import accumulate
+from pathlib import Path
+
+__all__ = [
+    "IMPORT_STYLES",
+    "add_imports",
+    "find_importers",
+    "forget_packages",
+    "import_from",
+    "import_line",
+    "module_name",
+    "project_root",
+    "relative_module",
+    "retained_imports",
+    "rewrite_importer",
+    "rewrite_imports",
+]
+
+PROJECT_MARKERS = ["pyproject.toml", "setup.py", "setup.cfg", ".git"]
+MAX_LINE = 88
+IMPORT_STYLES = {
+    ".": "package-relative",  # from .transfer import MvDef
+    "a": "absolute",  # from transfer import MvDef
+    "p": "package-absolute",  # from mvdef.transfer import MvDef
+}
+DEFS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+@cache
+def directory_packages(directory: Path) -> tuple[str, ...]:
+    """
+    The names of the packages an (absolute) directory is in, outermost first, ending
+    with its own if it has an `__init__.py`. Memoised per directory, so resolving all
+    the files in a tree walks up each directory once (see `forget_packages`).
+    """
+    if directory.parent == directory or not (directory / "__init__.py").exists():
+        return ()
+    return (*directory_packages(directory.parent), directory.name)
+
+
+@cache
+def directory_root(directory: Path) -> Path | None:
+    """
+    The nearest (absolute) directory from this one up with a project file (e.g.
+    pyproject.toml) or a .git directory, if any. Memoised per directory.
+    """
+    if any((directory / marker).exists() for marker in PROJECT_MARKERS):
+        return directory
+    return None if directory.parent == directory else directory_root(directory.parent)
+
+
+def forget_packages() -> None:
+    """Clear the memos of the package layout (e.g. after a package is created)."""
+    directory_packages.cache_clear()
+    directory_root.cache_clear()
+
+
+def package_parts(path: Path) -> list[str]:
+    """The names of the packages containing a file (outermost first)."""
+    return list(directory_packages(path.absolute().parent))
+
+
+def module_name(path: Path) -> str:
+    """
+    The dotted name a file is imported by, found by walking up the packages (the
+    directories with an `__init__.py`) that contain it.
+    """
+    parts = package_parts(path)
+    if path.stem != "__init__":
+        parts.append(path.stem)
+    return ".".join(parts)
+
+
+def project_root(path: Path) -> Path:
+    """
+    The root of the project a file is in: the nearest directory above it with a
+    project file (e.g. pyproject.toml) or a .git directory, else the directory its
+    top-level package is in.
+    """
+    path = path.absolute()
+    if (root := directory_root(path.parent)) is not None:
+        return root
+    return path.parents[len(package_parts(path))]
+
+
+def resolve_module(node: ast.ImportFrom, package: list[str]) -> str | None:
+    """
+    The absolute name of the module imported from, given the `package` that the
+    importing file is in (None if a relative import goes above the top package).
+    """
+    if not node.level:
+        return node.module
+    if node.level - 1 > len(package):
+        return None
+    base = package[: len(package) - (node.level - 1)]
+    return ".".join(base + ([node.module] if node.module else []))
+
+
+def relative_module(module: str, package: list[str]) -> tuple[str | None, int]:
+    """
+    The module name and level to import a module relative to the `package` that the
+    importing file is in (or the absolute name, at level 0, if it is outside it).
+    """
+    parts = module.split(".")
+    common = 0
+    for ours, theirs in zip(package, parts):
+        if ours != theirs:
+            break
+        common += 1
+    if not common:
+        return module, 0
+    return ".".join(parts[common:]) or None, len(package) - common + 1
+
+
+def import_from(path: Path, importer: Path, style: str = ".") -> tuple[str | None, int]:
+    """
+    The module name and level for the file `importer` to import the file at `path`,
+    in one of the `IMPORT_STYLES`. Where no package is found (for a relative import,
+    that of the importer), the package styles fall back to the absolute import, as if
+    run from the importer's directory (so by its dotted path below that, if it is).
+    """
+    if style not in IMPORT_STYLES:
+        raise ValueError(f"Unknown import style {style!r} (not in {[*IMPORT_STYLES]})")
+    if style == "." and (package := package_parts(importer)):
+        return relative_module(module_name(path), package)
+    if style == "p" and package_parts(path):
+        return module_name(path), 0
+    path, here = path.absolute(), importer.absolute().parent
+    if not path.is_relative_to(here):
+        return module_name(path), 0
+    parts = list(path.relative_to(here).with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts) or module_name(path), 0
+
+
+def import_line(module: str | None, level: int, names: list[str]) -> str:
+    """A `from ... import` statement (wrapped in brackets if too long for a line)."""
+    source = "." * level + (module or "")
+    line = f"from {source} import {', '.join(names)}"
+    if len(line) <= MAX_LINE:
+        return line
+    return "\n".join([f"from {source} import (", *(f"    {n}," for n in names), ")"])
+
+
+def retained_imports(
+    src: Path,
+    routes: dict[Path, list[str]],
+    style: str = ".",
+) -> list[str]:
+    """
+    The import statements for `src` to keep importing the top-level names moved out
+    of it from each destination they are `routes`d to (so re-exporting them), in one
+    of the `IMPORT_STYLES`.
+    """
+    lines = []
+    for dst, names in routes.items():
+        if top_level := [name for name in names if "." not in name]:
+            lines.append(import_line(*import_from(dst, src, style), top_level))
+    return lines
+
+
+def add_imports(text: str, lines: list[str]) -> str:
+    """
+    Add import statements to the code: after the imports it starts with (below its
+    docstring, if any), or else at the top (two blank lines above a definition).
+    """
+    if not lines:
+        return text
+    body = ast.parse(text).body
+    head = 0
+    for node in body:
+        docstring = not head and isinstance(node, ast.Expr)
+        if not (docstring or isinstance(node, (ast.Import, ast.ImportFrom))):
+            break
+        head += 1
+    code = text.splitlines(keepends=True)
+    block = "".join(f"{line}\n" for line in lines)
+    if head and isinstance(body[head - 1], (ast.Import, ast.ImportFrom)):
+        at = body[head - 1].end_lineno
+        return "".join(code[:at]) + block + "".join(code[at:])
+    at = body[0].end_lineno if head else int(text.startswith("#!"))
+    if head:
+        block = "\n" + block
+    rest = "".join(code[at:]).lstrip("\n")
+    if rest:
+        following = body[head] if head < len(body) else None
+        block += "\n\n" if isinstance(following, DEFS) else "\n"
+    return "".join(code[:at]) + block + rest
+
+
+def rewrite_imports(
+    text: str,
+    *,
+    package: list[str],
+    src_module: str,
+    dst_module: str,
+    names: list[str],
+    own_module: str | None = None,
+) -> str:
+    """
+    Rewrite the `from ... import` statements in the code which import any of the
+    `names` from the `src_module`, to import those names from the `dst_module`
+    instead (splitting off a second statement if it imports other names too). Relative
+    imports stay relative where possible. Comments around the statements are kept.
+    If the code is that of the `dst_module` (its `own_module`), the names it would
+    import from itself are dropped instead (unless imported under another name).
+    """
+    tree = ast.parse(text)
+    code = text.encode()
+    line_starts = [0, *accumulate(len(line) for line in code.splitlines(keepends=True))]
+    edits = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom):
+            continue
+        if resolve_module(node, package) != src_module:
+            continue
+        moving = [alias for alias in node.names if alias.name in names]
+        if not moving:
+            continue
+        staying = [alias for alias in node.names if alias.name not in names]
+        if dst_module == own_module:
+            moving = [a for a in moving if a.asname not in (None, a.name)]
+        if node.level:
+            module, level = relative_module(dst_module, package)
+        else:
+            module, level = dst_module, 0
+        statements = [ast.ImportFrom(module=module, names=moving, level=level)]
+        if staying:
+            statements.insert(0, ast.ImportFrom(node.module, staying, node.level))
+        start = line_starts[node.lineno - 1] + node.col_offset
+        end = line_starts[node.end_lineno - 1] + node.end_col_offset
+        prefix = code[line_starts[node.lineno - 1] : start]
+        statements = [stmt for stmt in statements if stmt.names]
+        if not statements:
+            line_end = line_starts[node.end_lineno]
+            if prefix.strip() or code[end:line_end].strip():
+                edits.append((start, end, b"pass"))  # Sharing its line with others
+            else:
+                edits.append((line_starts[node.lineno - 1], line_end, b""))
+            continue
+        # A statement after others on its line (e.g. after a `;`) can't start a new one
+        sep = b"\n" + prefix if prefix.isspace() or not prefix else b"; "
+        replacement = sep.join(ast.unparse(stmt).encode() for stmt in statements)
+        edits.append((start, end, replacement))
+    for start, end, replacement in sorted(edits, reverse=True):
+        code = code[:start] + replacement + code[end:]
+    return code.decode()
+
+
+def rewrite_importer(
+    path: Path,
+    *,
+    moves: dict[str, dict[str, list[str]]],
+) -> dict:
+    """
+    Rewrite the imports of a file (in a worker process) as for `rewrite_imports`, for
+    the names moved from each source module to each module in its `moves` entry,
+    giving the `file`, its `before` and `after` text (or an `error` if it couldn't be
+    read or parsed).
+    """
+    record = {"file": str(path)}
+    package = importer_package(path)
+    try:
+        before = after = path.read_text()
+        for src_module, routes in moves.items():
+            for dst_module, names in routes.items():
+                after = rewrite_imports(
+                    after,
+                    package=package,
+                    src_module=src_module,
+                    dst_module=dst_module,
+                    names=names,
+                )
+    except SyntaxError as exc:
+        return {**record, "error": f"SyntaxError: {exc.msg} (line {exc.lineno})"}
+    except Exception as exc:
+        return {**record, "error": f"{type(exc).__name__}: {exc}"}
+    return {**record, "before": before, "after": after}
+
+
+def importer_package(path: Path) -> list[str]:
+    """The package a file is in (for a package's `__init__.py`, the package itself)."""
+    if path.stem == "__init__":
+        return module_name(path).split(".")
+    return package_parts(path)
+
+
+def find_importers(
+    moved: dict[str, list[str]],
+    *,
+    root: Path,
+    exclude: list[Path],
+    jobs: int = 1,
+) -> list[Path]:
+    """
+    The files under the project `root` which may import any of the names `moved` from
+    each module (bringing the symbol index of the project up to date once to look them
+    all up), besides those to `exclude`. Relative imports are resolved when rewritten.
+    """
+    from .index import SymbolIndex
+    from .listing import expand_paths
+
+    scope = [root.absolute()]
+    with SymbolIndex() as index:
+        index.update([root], expand_paths((root,)), jobs=jobs)
+        found = [
+            path
+            for module, names in moved.items()
+            for path in index.importers_of(module, names, scope=scope)
+        ]
+    excluded = {path.absolute() for path in exclude}
+    return [path for path in dict.fromkeys(found) if path not in excluded]
@@ -0,0 +1,394 @@
+"""
+A SQLite index of the definitions, imports and import uses in every indexed file,
+updated incrementally (only re-analysing the files that changed since last indexed).
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import sqlite3
+from collections.abc import Iterator
+from contextlib import redirect_stderr
+from dataclasses import dataclass
+from os.path import exists
+from pathlib import Path
+
+from ..cache_dir import cache_dir
+from .cycles import imported_module, runtime_imports
+from .digest import content_digest
+from .parse import parse
+from .records import definition_records
+
+__all__ = ["IndexUpdate", "SymbolIndex", "index_file"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS defs (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    imports TEXT NOT NULL,
+    referenced INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    module TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    runtime INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uses (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS defs_file ON defs(file_id, seq);
+CREATE INDEX IF NOT EXISTS defs_name ON defs(name);
+CREATE INDEX IF NOT EXISTS imports_file ON imports(file_id);
+CREATE INDEX IF NOT EXISTS imports_module ON imports(module);
+CREATE INDEX IF NOT EXISTS imports_full_name ON imports(full_name);
+CREATE INDEX IF NOT EXISTS uses_file ON uses(file_id);
+CREATE INDEX IF NOT EXISTS uses_name ON uses(name);
+"""
+
+SCHEMA_VERSION = 2  # Bumped when the schema changes (rebuilding the index)
+TABLES = ["uses", "imports", "defs", "files"]
+
+DEF_FIELDS = ["name", "kind", "line", "end_line", "depth", "start", "end"]
+IMPORT_FIELDS = ["name", "module", "full_name", "line", "runtime"]
+
+
+def index_file(path: Path) -> dict:
+    """
+    Analyse a file for the index (in a worker process): the records of its `defs`
+    (see `definition_records`), its `imports` (each with the `name` it binds, the
+    `module` imported from, the `full_name` imported, and whether it is run at
+    `runtime` when the module is imported) and the `uses` of imported names, or an
+    `error` if it couldn't be parsed.
+    """
+    st = path.stat()  # Before reading, so a later change will make the record stale
+    record = {"file": str(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    record["digest"] = ""  # Unless it can be read
+    try:
+        text = path.read_text()
+        record["digest"] = content_digest(text)
+        with redirect_stderr(io.StringIO()):
+            check = parse(text, file=path, escalate=True)
+    except SyntaxError as exc:
+        return {**record, "error": f"SyntaxError: {exc.msg} (line {exc.lineno})"}
+    except Exception as exc:
+        return {**record, "error": f"{type(exc).__name__}: {exc}"}
+    imported = {imp.name for imp in check.imports}
+    runtime = set(map(id, runtime_imports(check)))
+    record["defs"] = definition_records(check)
+    record["imports"] = [
+        {
+            "name": imp.name,
+            "module": imported_module(imp),
+            "full_name": imp.fullName,
+            "line": imp.source.lineno,
+            "runtime": id(imp) in runtime,
+        }
+        for imp in check.imports
+    ]
+    record["uses"] = [
+        {"name": name, "line": node.lineno, "col": node.col_offset}
+        for name, use_list in check.import_uses.items()
+        if name in imported
+        for _, node in use_list
+    ]
+    return record
+
+
+@dataclass
+class IndexUpdate:
+    """What an update did: files checked, re-analysed (as changed), and removed."""
+
+    checked: int = 0
+    analysed: int = 0
+    removed: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Indexed {self.checked} file(s): {self.analysed} re-analysed, "
+            f"{self.removed} removed"
+        )
+
+
+class SymbolIndex:
+    """
+    The index database (by default shared by all projects, in the cache directory),
+    with rows keyed by each file's absolute path. A file's rows are fresh while its
+    mtime and size are as when it was indexed.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = cache_dir() / "index.sqlite3" if path is None else path
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self.db:  # Built by another version of mvdef: rebuild from scratch
+                for table in TABLES:
+                    self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def existing(cls, path: Path | None = None) -> SymbolIndex | None:
+        """Open the index if it has been built (to query it, but not to build it)."""
+        path = cache_dir() / "index.sqlite3" if path is None else path
+        return cls(path) if path.exists() else None
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> SymbolIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def stale(self, paths: list[Path]) -> tuple[list[Path], dict[Path, int]]:
+        """
+        The (absolute) paths of files whose contents changed since they were indexed
+        (or were never indexed), found by comparing their stat then (if it changed)
+        their digest. Files whose digest is unchanged have just their stat updated.
+        Also returns the IDs of the fresh files, by path.
+        """
+        query = "SELECT id, mtime_ns, size, digest FROM files WHERE path = ?"
+        stale, fresh = [], {}
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # Removed since listed (so pruned)
+            if (entry := self.db.execute(query, (str(path),)).fetchone()) is None:
+                stale.append(path)
+                continue
+            file_id, mtime_ns, size, digest = entry
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size):
+                fresh[path] = file_id
+            elif digest_or_none(path) == digest:
+                self.db.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                    (st.st_mtime_ns, st.st_size, file_id),
+                )
+                fresh[path] = file_id
+            else:
+                stale.append(path)
+        return stale, fresh
+
+    def store(self, record: dict) -> None:
+        """Replace the rows of a file with those of its record (from `index_file`)."""
+        path, error = record["file"], record.get("error")
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        cursor = self.db.execute(
+            "INSERT INTO files (path, mtime_ns, size, digest, error) "
+            "VALUES (?,?,?,?,?)",
+            (path, record["mtime_ns"], record["size"], record["digest"], error),
+        )
+        file_id = cursor.lastrowid
+        self.db.executemany(
+            "INSERT INTO defs VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+            [
+                (file_id, seq, *(d[k] for k in DEF_FIELDS))
+                + (json.dumps(d["imports"]), d["referenced"])
+                for seq, d in enumerate(record.get("defs", []))
+            ],
+        )
+        self.db.executemany(
+            "INSERT INTO imports VALUES (?,?,?,?,?,?)",
+            [
+                (file_id, *(i[k] for k in IMPORT_FIELDS))
+                for i in record.get("imports", [])
+            ],
+        )
+        self.db.executemany(
+            "INSERT INTO uses VALUES (?,?,?,?)",
+            [(file_id, u["name"], u["line"], u["col"]) for u in record.get("uses", [])],
+        )
+
+    def prune(self, roots: list[Path], keep: set[Path]) -> int:
+        """Remove the files indexed under any of the `roots` but not to `keep`."""
+        removed = 0
+        for root in roots:
+            rows = self.db.execute(
+                "SELECT path FROM files WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                (str(root), escape_like(str(root).rstrip("/")) + "/%"),
+            )
+            gone = [
+                (p,) for (p,) in rows.fetchall() if Path(p) not in keep or not exists(p)
+            ]
+            self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+            removed += len(gone)
+        return removed
+
+    def update(
+        self,
+        roots: list[Path],
+        paths: list[Path],
+        *,
+        jobs: int = 1,
+    ) -> IndexUpdate:
+        """
+        Re-analyse the `paths` that changed since they were indexed (in a pool of
+        `jobs` processes), and remove the files under the `roots` that no longer
+        exist, committing it all as one transaction.
+        """
+        from .listing import list_files
+
+        paths = [path.absolute() for path in paths]
+        result = IndexUpdate(checked=len(paths))
+        with self.db:
+            stale, _ = self.stale(paths)
+            for record in list_files(stale, jobs=jobs, lister=index_file):
+                self.store(record)
+                result.analysed += 1
+            roots = [root.absolute() for root in roots]
+            result.removed = self.prune(roots, keep=set(paths))
+        return result
+
+    def records(self, paths: list[Path]) -> dict[Path, dict]:
+        """
+        The records of the files indexed and unchanged since (as `list_file` would
+        give, by absolute path), looked up without parsing any file.
+        """
+        with self.db:
+            _, fresh = self.stale([path.absolute() for path in paths])
+        found = {}
+        for path, file_id in fresh.items():
+            error = self.db.execute(
+                "SELECT error FROM files WHERE id = ?",
+                (file_id,),
+            ).fetchone()[0]
+            if error is not None:
+                found[path] = {"error": error}
+                continue
+            rows = self.db.execute(
+                f"SELECT {', '.join(DEF_FIELDS)}, imports, referenced FROM defs "
+                "WHERE file_id = ? ORDER BY seq",
+                (file_id,),
+            )
+            found[path] = {
+                "defs": [
+                    {
+                        **dict(zip(DEF_FIELDS, row)),
+                        "imports": json.loads(row[-2]),
+                        "referenced": bool(row[-1]),
+                    }
+                    for row in rows
+                ],
+            }
+        return found
+
+    def importers(
+        self,
+        module: str,
+        scope: list[Path] | None = None,
+    ) -> Iterator[tuple[str, int, str]]:
+        """
+        The imports of `module` (or of a submodule of it, or a name from it) as the
+        path, line and full name of each, in the files under the `scope` if given.
+        """
+        prefix = escape_like(module) + ".%"
+        rows = self.db.execute(
+            "SELECT f.path, i.line, i.full_name FROM imports i "
+            "JOIN files f ON f.id = i.file_id "
+            "WHERE i.module = ? OR i.full_name = ? OR i.full_name LIKE ? ESCAPE '\\' "
+            "ORDER BY f.path, i.line",
+            (module, module, prefix),
+        )
+        yield from (row for row in rows if within(row[0], scope))
+
+    def importers_of(
+        self,
+        module: str,
+        names: list[str],
+        scope: list[Path] | None = None,
+    ) -> list[Path]:
+        """
+        The files which import any of the `names` from `module`, or from a relative
+        import (which can only be resolved knowing the package the file is in), in
+        the files under the `scope` if given.
+        """
+        rows = self.db.execute(
+            "SELECT DISTINCT f.path, i.full_name FROM imports i "
+            "JOIN files f ON f.id = i.file_id "
+            "WHERE i.module = ? OR i.module LIKE '.%' ORDER BY f.path",
+            (module,),
+        )
+        found = {
+            path
+            for path, full_name in rows
+            if full_name.rpartition(".")[2] in names and within(path, scope)
+        }
+        return sorted(map(Path, found))
+
+    def paths(self, scope: list[Path] | None = None) -> list[str]:
+        """The paths of the files indexed (under the `scope` if given)."""
+        rows = self.db.execute("SELECT path FROM files ORDER BY path")
+        return [path for (path,) in rows if within(path, scope)]
+
+    def runtime_imports(
+        self,
+        scope: list[Path] | None = None,
+    ) -> Iterator[tuple[str, str, str]]:
+        """
+        The imports run when each file is imported, as its path with the module and
+        full name imported, in the files under the `scope` if given.
+        """
+        rows = self.db.execute(
+            "SELECT f.path, i.module, i.full_name FROM imports i "
+            "JOIN files f ON f.id = i.file_id WHERE i.runtime = 1 ORDER BY f.path",
+        )
+        yield from (row for row in rows if within(row[0], scope))
+
+    def definitions(
+        self,
+        name: str,
+        scope: list[Path] | None = None,
+    ) -> Iterator[tuple[str, int, str]]:
+        """
+        The definitions of `name` as the path, line and kind of each, in the files
+        under the `scope` if given.
+        """
+        rows = self.db.execute(
+            "SELECT f.path, d.line, d.kind FROM defs d "
+            "JOIN files f ON f.id = d.file_id WHERE d.name = ? ORDER BY f.path, d.line",
+            (name,),
+        )
+        yield from (row for row in rows if within(row[0], scope))
+
+
+def within(path: str, scope: list[Path] | None) -> bool:
+    """Whether the path is (or is under) any path in the scope (if there is one)."""
+    return scope is None or any(Path(path).is_relative_to(root) for root in scope)
+
+
+def digest_or_none(path: Path) -> str | None:
+    try:
+        return content_digest(path.read_text())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def escape_like(text: str) -> str:
+    """Escape the wildcards of a SQL LIKE pattern (using backslash as the escape)."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
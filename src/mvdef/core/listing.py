@@ -0,0 +1,213 @@
+"""List the definitions in many files at once, across a pool of worker processes."""
+
+from __future__ import annotations
+
+import io
+import os
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .parse import parse
+from .records import definition_records
+
+if TYPE_CHECKING:
+    from .manifest.match import NameMatcher
+
+__all__ = [
+    "base_dir",
+    "def_records",
+    "expand_paths",
+    "indexed_records",
+    "is_pattern",
+    "list_chunk",
+    "list_file",
+    "list_files",
+    "source_files",
+]
+
+GLOB_CHARS = frozenset("*?[")
+SKIP_DIRS = frozenset(
+    ["__pycache__", "build", "dist", "env", "node_modules", "site-packages", "venv"],
+)
+
+
+def is_pattern(spec: Path) -> bool:
+    return not GLOB_CHARS.isdisjoint(str(spec))
+
+
+def base_dir(spec: Path) -> Path:
+    """The directory a glob pattern searches in (or the path itself, if not a glob)."""
+    if not is_pattern(spec):
+        return spec
+    parts = []
+    for part in spec.parts:
+        if is_pattern(Path(part)):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+
+def source_files(directory: Path) -> Iterator[Path]:
+    """
+    The `.py` files anywhere under a `directory`, skipping hidden directories (such
+    as `.git`, `.tox` or `.venv`), virtual environments, and build or cache output.
+    """
+    for parent, dirs, files in os.walk(directory):
+        here = Path(parent)
+        dirs[:] = [
+            name
+            for name in dirs
+            if not name.startswith(".")
+            and name not in SKIP_DIRS
+            and not (here / name / "pyvenv.cfg").exists()
+        ]
+        yield from (here / name for name in files if name.endswith(".py"))
+
+
+def expand_paths(specs: tuple[Path, ...]) -> list[Path]:
+    """
+    The files named by `specs`: each either a file, a directory (for the `.py` files
+    under it, see `source_files`) or a glob pattern (which may use `**`). Directories
+    and globs expand in sorted order, and files named more than once are listed once.
+    """
+    paths: dict[Path, None] = {}
+    for spec in specs:
+        if is_pattern(spec):
+            anchor = Path(spec.anchor or ".")
+            pattern = str(spec.relative_to(anchor)) if spec.anchor else str(spec)
+            found = (p for p in anchor.glob(pattern) if p.is_file())
+        elif spec.is_dir():
+            found = (p for p in source_files(spec) if p.is_file())
+        else:
+            found = [spec]
+        paths.update(dict.fromkeys(sorted(found)))
+    return list(paths)
+
+
+def list_file(
+    path: Path,
+    *,
+    match: NameMatcher | None = None,
+    cls_defs: bool = False,
+    func_defs: bool = False,
+) -> dict:
+    """
+    A record of a file's definitions as a dict that can be written as JSON: its `file`
+    and `defs` (see `definition_records`, for those whose names `match` if given),
+    or an `error` instead of `defs` if the file couldn't be read or parsed.
+    """
+    record = {"file": str(path)}
+    flags = {"cls_defs": cls_defs, "func_defs": func_defs}
+    try:
+        with redirect_stderr(io.StringIO()):  # The error goes in the record instead
+            check = parse(path.read_text(), file=path, escalate=True, **flags)
+    except SyntaxError as exc:
+        return {**record, "error": f"SyntaxError: {exc.msg} (line {exc.lineno})"}
+    except Exception as exc:
+        return {**record, "error": f"{type(exc).__name__}: {exc}"}
+    record["defs"] = definition_records(check, match=match)
+    return record
+
+
+def indexed_records(
+    paths: list[Path],
+    *,
+    match: NameMatcher | None = None,
+    cls_defs: bool = False,
+    func_defs: bool = False,
+) -> dict[Path, dict]:
+    """
+    The records (as `list_file` would give) of the files that are in the symbol index
+    and unchanged since indexed, by path, or none if the index hasn't been built.
+    """
+    from .index import SymbolIndex
+
+    if (index := SymbolIndex.existing()) is None:
+        return {}
+    kinds = {"class"} if cls_defs else {"function", "async"} if func_defs else None
+    with index:
+        found = index.records(paths)
+    records = {}
+    for path in paths:
+        if (entry := found.get(path.absolute())) is None:
+            continue
+        if "error" in entry:
+            records[path] = {"file": str(path), **entry}
+            continue
+        defs = [
+            d
+            for d in entry["defs"]
+            if (kinds is None or d["kind"] in kinds)
+            and (match is None or match(d["name"]))
+        ]
+        records[path] = {"file": str(path), "defs": defs}
+    return records
+
+
+def list_chunk(paths: list[Path], lister: Callable = list_file, **kwargs) -> list[dict]:
+    """List a chunk of files (in a worker process, to amortise the round trip)."""
+    return [lister(path, **kwargs) for path in paths]
+
+
+def def_records(record: dict) -> Iterator[dict]:
+    """Split a file's record into one per definition (each naming the file)."""
+    if "error" in record:
+        yield record
+        return
+    for definition in record["defs"]:
+        yield {"file": record["file"], **definition}
+
+
+def list_files(
+    paths: list[Path],
+    *,
+    jobs: int = 1,
+    ordered: bool = False,
+    chunk_size: int | None = None,
+    lister: Callable = list_file,
+    **kwargs,
+) -> Iterator[dict]:
+    """
+    Yield the record of each file (see `list_file`, or from another `lister` given
+    the same `kwargs`) as it is listed, in the order
+    given if `ordered`, else as each chunk of files completes. With `jobs` other than
+    1 the chunks are listed in a pool of that many processes (0 for one per CPU),
+    keeping only a few chunks per worker in flight so memory use stays bounded. The
+    `chunk_size` defaults to spreading the files over that window, up to 64 a chunk.
+    """
+    if jobs == 1 or len(paths) < 2:
+        for path in paths:
+            yield lister(path, **kwargs)
+        return
+    workers = jobs or os.cpu_count() or 1
+    window = 4 * workers
+    if chunk_size is None:
+        chunk_size = max(1, min(64, len(paths) // window))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque()
+        try:
+            for start in range(0, len(paths), chunk_size):
+                chunk = paths[start : start + chunk_size]
+                pending.append(pool.submit(list_chunk, chunk, lister, **kwargs))
+                if len(pending) >= window:
+                    yield from drain(pending, ordered=ordered)
+            while pending:
+                yield from drain(pending, ordered=ordered)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def drain(pending: deque[Future], ordered: bool) -> Iterator[dict]:
+    """Yield the records of the next finished chunk (the oldest, if `ordered`)."""
+    if ordered:
+        yield from pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield from future.result()
@@ -0,0 +1,83 @@
+"""Advisory locks on files, to serialise writes from concurrent mvdef processes."""
+
+from __future__ import annotations
+
+import time
+from hashlib import sha256
+from pathlib import Path
+
+from ..cache_dir import cache_dir
+from ..error_handling.exceptions import LockTimeout
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (not available on Windows)
+    fcntl = None
+
+__all__ = ["FileLocks", "lock_file", "unlock_file"]
+
+
+def lock_file(file, blocking: bool) -> bool:
+    """Take an exclusive advisory lock on an open file (no-op where unsupported)."""
+    if fcntl is None:
+        return True
+    flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+    try:
+        fcntl.flock(file.fileno(), flags)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def unlock_file(file) -> None:
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class FileLocks:
+    """
+    Exclusive locks on a set of files, taken in sorted order (so that two processes
+    locking overlapping sets can't deadlock) and held for the duration of a `with`
+    block. The lock files live in the cache directory rather than alongside each file,
+    as the files themselves get replaced by renaming (which would drop a lock on them).
+    """
+
+    poll_interval: float = 0.05
+
+    def __init__(self, paths: list[Path], timeout: float = 10.0) -> None:
+        self.paths = sorted({Path(p).absolute() for p in paths})
+        self.timeout = timeout
+        self.held = []
+
+    @staticmethod
+    def lock_path(path: Path) -> Path:
+        key = sha256(str(path).encode()).hexdigest()
+        return cache_dir("locks") / f"{key}.lock"
+
+    def acquire(self, path: Path) -> None:
+        lock = open(self.lock_path(path), "a")
+        deadline = time.monotonic() + self.timeout
+        while not lock_file(lock, blocking=False):
+            if time.monotonic() > deadline:
+                lock.close()
+                raise LockTimeout(f"Timed out waiting for a lock on {path}")
+            time.sleep(self.poll_interval)
+        self.held.append(lock)
+
+    def release(self) -> None:
+        while self.held:
+            lock = self.held.pop()
+            unlock_file(lock)
+            lock.close()
+
+    def __enter__(self) -> FileLocks:
+        try:
+            for path in self.paths:
+                self.acquire(path)
+        except BaseException:
+            self.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
@@ -0,0 +1,60 @@
+"""Rewrite the `__all__` assignment of a module (or add it if missing)."""
+
+import ast
+
+from .all_fmt import format_all
+
+__all__ = ["fix_all"]
+
+
+def find_all(tree: ast.Module) -> ast.stmt | None:
+    """The first top-level assignment to `__all__` (if any)."""
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        else:
+            continue
+        if any(isinstance(t, ast.Name) and t.id == "__all__" for t in targets):
+            return node
+    return None
+
+
+def header_end(tree: ast.Module) -> int:
+    """The line number that the module's docstring and leading imports end on."""
+    end_lineno = 0
+    for i, node in enumerate(tree.body):
+        is_docstring = (
+            i == 0
+            and isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        )
+        if not (is_docstring or isinstance(node, (ast.Import, ast.ImportFrom))):
+            break
+        end_lineno = node.end_lineno
+    return end_lineno
+
+
+def fix_all(code: str, tree: ast.Module, names: list[str]) -> str:
+    """
+    Replace the `__all__` assignment in `code` (parsed as `tree`) with one listing
+    `names`, or insert it after the docstring and imports heading the module.
+    """
+    lines = code.splitlines(keepends=True)
+    assignment = format_all(names) + "\n"
+    if (node := find_all(tree)) is not None:
+        lines[node.lineno - 1 : node.end_lineno] = [assignment]
+        return "".join(lines)
+    at = header_end(tree)
+    head, tail = lines[:at], lines[at:]
+    if head:
+        head[-1] = head[-1].rstrip("\n") + "\n"
+        head.append("\n")
+    if tail and tail[0].strip():
+        # Space it like an import block: 2 lines before a definition, else 1
+        first = next((n for n in tree.body if n.end_lineno > at), None)
+        defs = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        tail[:0] = ["\n"] * (2 if isinstance(first, defs) else 1)
+    return "".join([*head, assignment, *tail])
@@ -24,7 +24,7 @@ class Manifest:
     def populate_agenda(self) -> None:
         """
         Puts `matchers` (default `['*']`) on `Agenda.targeted.doc`
-        without regex expansion.
+        without regex expansion (done when the manifest is filled).
         """
         self.agenda.document(self.matchers, src=self.src)
 
@@ -0,0 +1,78 @@
+"""Match definition names against the regexes given to `lsdef --match`."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+__all__ = ["WILDCARD", "NameMatcher", "literal_prefix", "scoped"]
+
+WILDCARD = "*"  # Matches any name (not a valid regex, so must be used alone)
+REGEX_META = frozenset(".^$*+?{}[]()|\\")
+GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    The literal characters that any name matched by the regex `pattern` must start
+    with (empty if unknown, e.g. if it starts with a group or has an alternation).
+    """
+    if "|" in pattern:
+        return ""
+    prefix = []
+    for char in pattern:
+        if char in REGEX_META:
+            if char in "*?{" and prefix:
+                prefix.pop()  # The quantified character may not appear at all
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+def scoped(pattern: str) -> str:
+    """
+    A regex as a group to join in an alternation, applying any global inline flags it
+    starts with (such as `(?i)`) to the group alone, as they must start the regex.
+    """
+    if flags := GLOBAL_FLAGS.match(pattern):
+        return f"(?{flags[1]}:{pattern[flags.end() :]})"
+    return f"(?:{pattern})"
+
+
+@dataclass
+class NameMatcher:
+    """
+    Matches names in full against any of the regex `patterns` in a single pass: the
+    patterns which are plain names are looked up in a set, and the rest compiled into
+    one alternation. If each of those has a literal prefix, names without any of the
+    prefixes are ruled out by `str.startswith` before running the regex.
+    """
+
+    patterns: list[str]
+    literals: frozenset[str] = field(init=False)
+    regex: re.Pattern | None = field(init=False)
+    prefixes: tuple[str, ...] | None = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.everything = WILDCARD in self.patterns
+        self.literals = frozenset(p for p in self.patterns if re.escape(p) == p)
+        regexes = [p for p in self.patterns if p not in self.literals | {WILDCARD}]
+        alternation = "|".join(map(scoped, regexes))
+        self.regex = re.compile(alternation) if regexes else None
+        prefixes = tuple(map(literal_prefix, regexes))
+        self.prefixes = prefixes if all(prefixes) else None
+
+    def __call__(self, name: str) -> bool:
+        if self.everything or name in self.literals:
+            return True
+        if self.regex is None:
+            return False
+        if self.prefixes is not None and not name.startswith(self.prefixes):
+            return False
+        return self.regex.fullmatch(name) is not None
+
+    def filter(self, names: list[str]) -> list[str]:
+        """The names matched (in order)."""
+        if self.everything:
+            return list(names)
+        return [name for name in names if self(name)]
@@ -1,12 +1,21 @@
+from __future__ import annotations
+
 import ast
+import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from pyflakes import reporter
 
 from ..error_handling.exceptions import SrcNotFound
 from .check import Checker
 
-__all__ = ["parse", "parse_file", "reparse"]
+if TYPE_CHECKING:
+    from .parse_cache import ParseCache
+
+__all__ = ["STDIN", "parse", "parse_file", "reparse"]
+
+STDIN = Path("-")  # In place of a file path: read from stdin (and write to stdout)
 
 
 def parse(
@@ -49,11 +58,20 @@ def parse_file(
     *,
     verbose=False,
     ensure_exists=True,
+    cache: ParseCache | None = None,
     **kwargs,
 ) -> Checker | None:
+    """
+    Parse a file, or reuse its previous parse from the `cache` if it's unchanged. If
+    `file` is `STDIN` (i.e. "-"), parse the text read from stdin instead.
+    """
+    if file == STDIN:
+        return parse(sys.stdin.read(), file="<stdin>", verbose=verbose, **kwargs)
     if ensure_exists:
         if not file.exists() and file.is_file():
             raise SrcNotFound(f"{file} is not an existing file")
+    if cache is not None:
+        return cache.get(file, parser=parse, verbose=verbose, **kwargs)
     return parse(file.read_text(), file=file, verbose=verbose, **kwargs)
 
 
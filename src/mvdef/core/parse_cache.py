@@ -0,0 +1,69 @@
+"""Reuse the parse of a file until it changes (for long-running processes)."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+
+from .check import Checker
+from .digest import content_digest
+
+__all__ = ["ParseCache"]
+
+
+@dataclass
+class CacheEntry:
+    mtime_ns: int
+    size: int
+    digest: str
+    check: Checker
+
+
+class ParseCache:
+    """
+    Parsed files (`Checker` objects), keyed by path and parse settings. An entry is
+    reused while the file's mtime and size are unchanged, or if they changed but its
+    contents hash the same (e.g. after `touch`), and is otherwise parsed again.
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[tuple, CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def get(self, file: Path, parser, **settings) -> Checker | None:
+        """
+        The parse of `file` with `settings`, from cache if fresh, else by calling
+        `parser(text, file=file, **settings)` (and caching the result if it parsed).
+        """
+        key = (os.path.abspath(file), *sorted(settings.items()))
+        st = os.stat(file)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and (entry.mtime_ns, entry.size) == (st.st_mtime_ns, st.st_size):
+            self.hits += 1
+            return entry.check
+        text = Path(file).read_text()
+        digest = content_digest(text)
+        if entry and entry.digest == digest:
+            entry.mtime_ns, entry.size = st.st_mtime_ns, st.st_size
+            self.hits += 1
+            return entry.check
+        self.misses += 1
+        check = parser(text, file=file, **settings)
+        if check is not None:
+            with self._lock:
+                self.entries[key] = CacheEntry(
+                    st.st_mtime_ns,
+                    st.st_size,
+                    digest,
+                    check,
+                )
+        return check
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
@@ -0,0 +1,152 @@
+"""
+Place the definitions arriving in a file where the names they use when the module is
+imported (class bases, decorators, default values, and so on) are already bound, and
+before any code in the file which uses them when it is imported.
+"""
+
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass
+
+__all__ = ["Statement", "arrival_order", "import_time_names", "placements"]
+
+DEFERRING = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def postpones_annotations(tree: ast.Module) -> bool:
+    """Whether the module has `from __future__ import annotations`."""
+    return any(
+        isinstance(node, ast.ImportFrom)
+        and node.module == "__future__"
+        and any(alias.name == "annotations" for alias in node.names)
+        for node in tree.body
+    )
+
+
+def import_time_names(node: ast.AST, *, postponed: bool = False) -> set[str]:
+    """
+    The names a statement uses when it is run: all of them, except those in the body
+    of a function or lambda (which runs only when called), or in an annotation if the
+    evaluation of annotations is `postponed`.
+    """
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, DEFERRING):
+            args = node.args
+            stack.extend(node.decorator_list)
+            stack.extend(args.defaults)
+            stack.extend(filter(None, args.kw_defaults))
+            if not postponed:
+                every_arg = [*args.posonlyargs, *args.args, *args.kwonlyargs]
+                every_arg.extend(filter(None, [args.vararg, args.kwarg]))
+                stack.extend(arg.annotation for arg in every_arg if arg.annotation)
+                stack.extend(filter(None, [node.returns]))
+        elif isinstance(node, ast.Lambda):
+            stack.extend(node.args.defaults)
+            stack.extend(filter(None, node.args.kw_defaults))
+        elif isinstance(node, ast.AnnAssign) and postponed:
+            stack.extend(filter(None, [node.target, node.value]))
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+        else:
+            stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def bound_names(node: ast.AST) -> set[str]:
+    """The names a top-level statement binds in the module's namespace."""
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (*DEFERRING, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).partition(".")[0])
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Store):
+                names.add(node.id)
+        elif not isinstance(node, ast.Lambda):
+            stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+@dataclass
+class Statement:
+    """
+    A top-level statement of a file, with the line it starts at (its first decorator,
+    or the comments just above it), the names it binds, and those it uses when run.
+    """
+
+    lineno: int
+    binds: set[str]
+    needs: set[str]
+
+    @classmethod
+    def from_module(cls, text: str) -> list[Statement]:
+        tree = ast.parse(text)
+        postponed = postpones_annotations(tree)
+        lines = text.splitlines()
+        statements = []
+        for node in tree.body:
+            decos = getattr(node, "decorator_list", [])
+            lineno = (decos[0] if decos else node).lineno
+            while lineno > 1 and lines[lineno - 2].lstrip().startswith("#"):
+                lineno -= 1
+            needs = import_time_names(node, postponed=postponed)
+            statements.append(cls(lineno=lineno, binds=bound_names(node), needs=needs))
+        return statements
+
+
+def leaf(path: str) -> str:
+    """The name a definition at a dotted path binds once moved to the top level."""
+    return path.rpartition(".")[2]
+
+
+def arrival_order(arrivals: dict[str, set[str]]) -> list[str]:
+    """
+    Order the arriving definitions (given the names each uses when run) so that each
+    comes after those it uses, otherwise keeping their order (and in a cycle, the
+    first of those left goes next).
+    """
+    order, left = [], list(arrivals)
+    while left:
+        ready = (
+            n
+            for n in left
+            if not (arrivals[n] - {leaf(n)}).intersection(map(leaf, left))
+        )
+        name = next(ready, left[0])
+        order.append(name)
+        left.remove(name)
+    return order
+
+
+def placements(
+    arrivals: dict[str, set[str]],
+    statements: list[Statement],
+) -> list[tuple[str, int]]:
+    """
+    Where to insert each arriving definition (given the names each uses when run):
+    the index of the statement it goes before (the number of statements to append
+    it), in the order to insert them. Each goes before the first statement using it
+    (or using an arrival that uses it), but after those binding the names it uses.
+    """
+    order = arrival_order(arrivals)
+    end = len(statements)
+    slots = {}
+    for name in reversed(order):
+        users = [i for i, stmt in enumerate(statements) if leaf(name) in stmt.needs]
+        users.extend(slots[user] for user in slots if leaf(name) in arrivals[user])
+        slots[name] = min(users, default=end)
+    placed = {}
+    for name in order:
+        uses = arrivals[name]
+        after = [i + 1 for i, stmt in enumerate(statements) if stmt.binds & uses]
+        after.extend(placed[dep] for dep in placed if leaf(dep) in uses)
+        placed[name] = max([slots[name], *after])
+    return sorted(placed.items(), key=lambda item: item[1])
@@ -0,0 +1,71 @@
+"""Describe each definition in a parsed file as a record that can be written as JSON."""
+
+from __future__ import annotations
+
+import ast
+from bisect import bisect_right
+from itertools import accumulate
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .check import Checker
+    from .manifest.match import NameMatcher
+
+__all__ = ["definition_records"]
+
+KINDS = {
+    ast.ClassDef: "class",
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "async",
+}
+
+
+def definition_records(check: Checker, match: NameMatcher | None = None) -> list[dict]:
+    """
+    A record of each definition in the parsed file (in order, including nested ones,
+    and only those whose names `match` if given):
+
+    - `name`, and `kind` ("class", "function" or "async")
+    - `line` and `end_line`: its line range, including any decorators
+    - `depth`: 1 at the top level of the module, 2 for methods, etc.
+    - `start` and `end`: the byte offsets of its source code in the file
+    - `imports`: the imported names used in it
+    - `referenced`: whether its name is used in the module outside of it
+    """
+    line_starts = [0, *accumulate(len(line.encode()) for line in check.lines)]
+    imported = {imp.name for imp in check.imports}
+    uses = {  # The position of each use of each (imported or defined) name, in order
+        name: sorted((node.lineno, node.col_offset) for _, node in use_list)
+        for name, use_list in check.import_uses.items()
+    }
+    records = []
+    for node in sorted(check.target_defs, key=lambda n: (n.lineno, n.col_offset)):
+        if match is not None and not match(node.name):
+            continue
+        first = node.decorator_list[0] if node.decorator_list else node
+        span = ((first.lineno, node.col_offset), (node.end_lineno, node.end_col_offset))
+        own_uses = uses.get(node.name, [])
+        records.append(
+            {
+                "name": node.name,
+                "kind": KINDS[type(node)],
+                "line": first.lineno,
+                "end_line": node.end_lineno,
+                "depth": node.depth,
+                "start": line_starts[first.lineno - 1] + node.col_offset,
+                "end": line_starts[node.end_lineno - 1] + node.end_col_offset,
+                "imports": [
+                    name
+                    for name, positions in uses.items()
+                    if name in imported and count_within(positions, span)
+                ],
+                "referenced": count_within(own_uses, span) < len(own_uses),
+            },
+        )
+    return records
+
+
+def count_within(positions: list[tuple[int, int]], span: tuple) -> int:
+    """How many of the (sorted) positions lie within the span of a definition."""
+    start, end = span
+    return bisect_right(positions, end) - bisect_right(positions, start)
@@ -0,0 +1,309 @@
+"""
+Plan how to split a module into several: group its top-level definitions so that few
+references (and imports of third-party modules) cross between the new modules, and so
+that the new modules don't import each other in a cycle.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+import sys
+from dataclasses import dataclass, field
+from math import ceil
+from typing import TYPE_CHECKING
+
+from .check import symbol_name
+from .deps import MODULE, name_uses, reference_graph, top_level_defs
+
+if TYPE_CHECKING:
+    from .check import Checker
+
+__all__ = ["STAY", "SplitPlan", "plan_split"]
+
+STAY = ""  # The group of the code staying in the module being split
+BALANCE = 1.5  # How many times the average size (in lines) a new module can grow to
+
+
+@dataclass
+class SplitPlan:
+    """
+    The top-level definitions going to each new module (keyed by the suffix of its
+    name) or staying (keyed by `STAY`), in the module's order, and the names that each
+    of these must import from the others. `cut` counts the references between them,
+    and `spread` the extra modules that each third-party import is repeated in.
+    Groups merged to avoid an import cycle are noted in `merged`.
+    """
+
+    groups: dict[str, list[str]]
+    imports: dict[str, dict[str, list[str]]] = field(default_factory=dict)
+    cut: int = 0
+    spread: int = 0
+    merged: list[list[str]] = field(default_factory=list)
+
+
+def is_third_party(imp) -> bool:
+    """Whether a pyflakes import binding is of a module outside the standard library."""
+    top = imp.fullName.split(".")[0]
+    return bool(top) and top not in sys.stdlib_module_names
+
+
+def strong_components(graph: dict[str, set[str]], order: list[str]) -> list[list[str]]:
+    """
+    The strongly connected components of the reference graph among the definitions in
+    `order` (those using each other in a loop must go to the same module), each in
+    the module's order, ordered by their first definition.
+    """
+    index, low, stack, on_stack, components = {}, {}, [], set(), []
+    for root in order:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(graph[root])))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, deps = work[-1]
+            for dep in deps:
+                if dep not in index:
+                    index[dep] = low[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(sorted(graph[dep]))))
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = set()
+                    while (member := stack.pop()) != node:
+                        component.add(member)
+                    component.add(node)
+                    on_stack.difference_update(component)
+                    components.append([name for name in order if name in component])
+    return sorted(components, key=lambda component: order.index(component[0]))
+
+
+def first_word(name: str) -> str:
+    """The first word of a snake_case, CamelCase or CONSTANT_CASE name, lowercased."""
+    match = re.match(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", name.lstrip("_"))
+    return (match.group() if match else name.lstrip("_") or name).lower()
+
+
+def snake_case(name: str) -> str:
+    return re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+
+
+def find_cycle(edges: dict[str, set[str]]) -> list[str] | None:
+    """A cycle among the groups (following the imports between them), if any."""
+    state = {}  # 1 while being visited, 2 once done
+    for root in edges:
+        if root in state:
+            continue
+        path = [root]
+        work = [iter(sorted(edges[root]))]
+        state[root] = 1
+        while work:
+            nxt = next(work[-1], None)
+            if nxt is None:
+                state[path.pop()] = 2
+                work.pop()
+            elif state.get(nxt) == 1:
+                return path[path.index(nxt) :]
+            elif nxt not in state:
+                state[nxt] = 1
+                path.append(nxt)
+                work.append(iter(sorted(edges.get(nxt, ()))))
+    return None
+
+
+class Grouping:
+    """
+    The groups of the atoms (the strongly connected components of the reference
+    graph), with the imports between the groups that the references imply.
+    """
+
+    def __init__(self, atoms: list[list[str]], graph: dict[str, set[str]]) -> None:
+        self.atoms = atoms
+        self.atom_of = {name: i for i, atom in enumerate(atoms) for name in atom}
+        self.uses = [
+            {self.atom_of[dep] for name in atom for dep in graph[name]} - {i}
+            for i, atom in enumerate(atoms)
+        ]
+        self.module_uses = {self.atom_of[dep] for dep in graph[MODULE]}
+        self.group: list[str] = [STAY] * len(atoms)
+
+    def edges(self, group: list[str] | None = None) -> dict[str, set[str]]:
+        """The groups each group imports from (`STAY` importing what `MODULE` uses)."""
+        group = self.group if group is None else group
+        edges = {key: set() for key in [STAY, *group]}
+        for i, deps in enumerate(self.uses):
+            edges[group[i]].update(group[dep] for dep in deps)
+        edges[STAY].update(group[dep] for dep in self.module_uses)
+        for key, deps in edges.items():
+            deps.discard(key)
+        return edges
+
+    def acyclic_with(self, changes: dict[int, str]) -> bool:
+        """Whether regrouping some atoms (by index) keeps the imports acyclic."""
+        group = [changes.get(i, key) for i, key in enumerate(self.group)]
+        return find_cycle(self.edges(group)) is None
+
+    def users(self, i: int) -> set[str]:
+        """The groups of the atoms using an atom (and `STAY`, if the module does)."""
+        users = {self.group[j] for j, deps in enumerate(self.uses) if i in deps}
+        return users | ({STAY} if i in self.module_uses else set())
+
+    def attach_helpers(self, movable) -> None:
+        """
+        Regroup each `movable` atom that is only used by the atoms of one other group
+        into that group, until none is left to regroup.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for i in reversed(range(len(self.atoms))):
+                users = self.users(i) - {self.group[i]}
+                if len(users) == 1 and movable(i) and STAY not in self.users(i):
+                    (key,) = users
+                    if self.acyclic_with({i: key}):
+                        self.group[i] = key
+                        changed = True
+
+    def break_cycles(self) -> list[list[str]]:
+        """
+        Merge the groups importing each other in a cycle (into `STAY` if in it, else
+        the first in the cycle), returning the groups merged.
+        """
+        merged = []
+        while cycle := find_cycle(self.edges()):
+            into = STAY if STAY in cycle else min(cycle, key=self.group.index)
+            self.group = [into if key in cycle else key for key in self.group]
+            merged.append(cycle)
+        return merged
+
+
+def agglomerate(
+    grouping: Grouping,
+    sizes: list[int],
+    weights: dict[tuple[int, int], int],
+    into: int,
+) -> None:
+    """
+    Cluster the atoms into (at most) `into` groups: starting from one group each,
+    repeatedly merge the two groups with the most `weights` between their atoms (the
+    references and shared third-party imports), as long as the result stays under the
+    size limit and the groups' imports stay acyclic. Once no such merge is left, merge
+    the smallest two groups next to each other in the order of their imports (which
+    can't form a cycle).
+    """
+    cap = max([*sizes, ceil(BALANCE * sum(sizes) / into)])
+    members = {str(i): [i] for i in range(len(sizes))}
+    grouping.group = list(members)
+    size = dict(zip(members, sizes))
+    links: dict[str, dict[str, int]] = {key: {} for key in members}
+    for (i, j), weight in weights.items():
+        links[str(i)][str(j)] = links[str(j)][str(i)] = weight
+    while len(members) > into:
+        ranked = sorted(
+            ((a, b) for a in links for b in links[a] if int(a) < int(b)),
+            key=lambda pair: (-links[pair[0]][pair[1]], int(pair[0]), int(pair[1])),
+        )
+        for a, b in ranked:
+            fits = size[a] + size[b] <= cap
+            if fits and grouping.acyclic_with({i: a for i in members[b]}):
+                break
+        else:
+            order = topological(grouping.edges(), list(members))
+            pairs = zip(order, order[1:])
+            a, b = min(pairs, key=lambda pair: size[pair[0]] + size[pair[1]])
+            a, b = sorted([a, b], key=int)
+        for i in members.pop(b):
+            grouping.group[i] = a
+            members[a].append(i)
+        size[a] += size.pop(b)
+        for other, weight in links.pop(b).items():
+            del links[other][b]
+            if other != a:
+                links[a][other] = links[other][a] = links[a].get(other, 0) + weight
+
+
+def topological(edges: dict[str, set[str]], keys: list[str]) -> list[str]:
+    """The groups ordered so that each comes after those it imports from."""
+    order, done = [], set()
+    for key in keys:
+        stack = [(key, iter(sorted(edges.get(key, ()))))]
+        if key in done:
+            continue
+        done.add(key)
+        while stack:
+            node, deps = stack[-1]
+            dep = next((d for d in deps if d not in done and d in keys), None)
+            if dep is None:
+                order.append(node)
+                stack.pop()
+            else:
+                done.add(dep)
+                stack.append((dep, iter(sorted(edges.get(dep, ())))))
+    return order
+
+
+def plan_split(check: Checker, *, into: int = 0, by: str | None = None) -> SplitPlan:
+    """
+    Group the top-level definitions of a parsed module into new modules: `into` a
+    number of them (by clustering), or `by` their names' first word ("prefix") or
+    around each class ("class", leaving the rest in the module unless only one class
+    uses them). Helpers private to a group go with it, and groups which would import
+    each other in a cycle are merged.
+    """
+    nodes = top_level_defs(check)
+    order = list(map(symbol_name, nodes))
+    graph = reference_graph(check)
+    third_party = {imp.name for imp in check.imports if is_third_party(imp)}
+    imported = name_uses(check, third_party)
+    grouping = Grouping(strong_components(graph, order), graph)
+    atoms = grouping.atoms
+    if by == "class":
+        classes = {symbol_name(n) for n in nodes if isinstance(n, ast.ClassDef)}
+        for i, atom in enumerate(atoms):
+            if named := [name for name in atom if name in classes]:
+                grouping.group[i] = snake_case(named[0])
+        grouping.attach_helpers(lambda i: grouping.group[i] == STAY)
+    elif by == "prefix":
+        grouping.group = [first_word(atom[0]) for atom in atoms]
+        grouping.attach_helpers(lambda i: all(n.startswith("_") for n in atoms[i]))
+    else:
+        spans = {symbol_name(n): n.end_lineno - n.lineno + 1 for n in nodes}
+        weights = {}
+        for i, deps in enumerate(grouping.uses):
+            for pair in ((min(i, j), max(i, j)) for j in deps):
+                weights[pair] = weights.get(pair, 0) + 1
+        for imp in third_party:
+            users = sorted({grouping.atom_of[n] for n in order if imp in imported[n]})
+            for k, i in enumerate(users):
+                for j in users[k + 1 :]:
+                    weights[i, j] = weights.get((i, j), 0) + 1
+        sizes = [sum(spans[name] for name in atom) for atom in atoms]
+        agglomerate(grouping, sizes, weights, into=into)
+        firsts = list(dict.fromkeys(grouping.group))
+        number = {key: str(n) for n, key in enumerate(firsts, 1)}
+        grouping.group = [number[key] for key in grouping.group]
+    merged = grouping.break_cycles()
+    group_of = {name: grouping.group[i] for name, i in grouping.atom_of.items()}
+    plan = SplitPlan(groups={}, merged=merged)
+    for name in order:
+        plan.groups.setdefault(group_of[name], []).append(name)
+    for user in [MODULE, *order]:
+        key = group_of.get(user, STAY)
+        for dep in sorted(graph[user], key=order.index):
+            if (source := group_of[dep]) != key:
+                names = plan.imports.setdefault(key, {}).setdefault(source, [])
+                names.append(dep)
+                plan.cut += 1
+    for imp in third_party:
+        using = {group_of.get(n, STAY) for n in imported if imp in imported[n]}
+        plan.spread += max(len(using) - 1, 0)
+    return plan
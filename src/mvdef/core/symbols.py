@@ -0,0 +1,90 @@
+"""
+A tree of the definitions in a module (classes, functions, and the movable top-level
+assignments), nested as in the code, to look them up by dotted paths like `A.B.f`.
+"""
+
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .check import symbol_name
+
+if TYPE_CHECKING:
+    from .check import Checker
+
+__all__ = ["Symbol", "SymbolTree"]
+
+DEF_NODES = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+@dataclass
+class Symbol:
+    """
+    A definition (or for the root of the tree, the module), with the definitions in
+    its body (or nested in blocks in its body) by name, in order.
+    """
+
+    name: str
+    node: ast.AST
+    parent: Symbol | None = None
+    children: dict[str, list[Symbol]] = field(default_factory=dict)
+
+    @property
+    def path(self) -> str:
+        """The dotted path to the definition from the top level of the module."""
+        if self.parent is None or self.parent.parent is None:
+            return self.name
+        return f"{self.parent.path}.{self.name}"
+
+    @property
+    def body(self) -> list[ast.stmt]:
+        """The statements directly in the definition's body."""
+        return getattr(self.node, "body", [])
+
+
+class SymbolTree:
+    """
+    The definitions of a parsed module, built once (in a pass over its definitions)
+    so that a dotted path is resolved by one lookup per level, and a bare name by one
+    lookup (at any depth). Only the definitions of the kinds targeted are found.
+    """
+
+    def __init__(self, check: Checker) -> None:
+        self.root = Symbol(name="", node=check.root)
+        movable = check.movable_defs
+        self.targeted = {id(node) for node in movable}
+        nodes = sorted(
+            {id(node): node for node in [*check.alldefs, *movable]}.values(),
+            key=lambda node: (node.lineno, node.col_offset),
+        )
+        self.symbols: dict[int, Symbol] = {}
+        self.by_name: dict[str, list[Symbol]] = {}
+        for node in nodes:
+            parent = self.root
+            for ancestor in check.get_ancestors(node) or []:
+                if isinstance(ancestor, DEF_NODES) and id(ancestor) in self.symbols:
+                    parent = self.symbols[id(ancestor)]
+                    break
+            name = symbol_name(node)
+            symbol = Symbol(name=name, node=node, parent=parent)
+            parent.children.setdefault(name, []).append(symbol)
+            self.symbols[id(node)] = symbol
+            if id(node) in self.targeted:
+                self.by_name.setdefault(name, []).append(symbol)
+
+    def resolve(self, path: str) -> list[Symbol]:
+        """
+        The definitions at a dotted path (a bare name matching at any depth), which
+        is ambiguous if more than one is found.
+        """
+        if "." not in path:
+            return self.by_name.get(path, [])
+        level = [self.root]
+        for part in path.split("."):
+            level = [child for sym in level for child in sym.children.get(part, [])]
+        return [sym for sym in level if id(sym.node) in self.targeted]
+
+    def __getitem__(self, node: ast.AST) -> Symbol:
+        return self.symbols[id(node)]
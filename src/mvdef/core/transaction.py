@@ -0,0 +1,429 @@
+"""Stage file writes and commit them together, via a write-ahead journal."""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import uuid4
+
+from ..cache_dir import cache_dir
+from ..error_handling.exceptions import TransactionFailure, WriteConflict
+from ..log_utils import set_up_logging
+from .backup import BackupStore, FileChange, Operation
+from .digest import content_digest
+from .lock import FileLocks, lock_file
+
+__all__ = ["StagedWrite", "Transaction", "recover", "staged_path"]
+
+logger = set_up_logging(name=__name__)
+
+
+@dataclass
+class StagedWrite:
+    """
+    The new contents of `target`, held at the sibling path `staged` until the
+    transaction commits (when it gets renamed over `target`), as long as `target` still
+    has the `expected` content digest (if given) at that point. If `staged` is `None`,
+    the target is to be deleted.
+
+    The digests of the target's contents before and after (`None` if absent) are kept
+    if the transaction is backing up the files it changes.
+    """
+
+    target: Path
+    staged: Path | None
+    expected: str | None = None
+    before: str | None = None
+    after: str | None = None
+
+    def conflicted(self) -> bool:
+        """Whether `target` no longer has the expected contents (missing is "")."""
+        if self.expected is None:
+            return False
+        try:
+            current = self.target.read_text()
+        except FileNotFoundError:
+            current = ""
+        return content_digest(current) != self.expected
+
+    def record(self) -> dict[str, str | None]:
+        staged = None if self.staged is None else str(self.staged)
+        return {"op": "stage", "target": str(self.target), "staged": staged}
+
+    def change(self) -> FileChange:
+        return FileChange(path=str(self.target), before=self.before, after=self.after)
+
+
+class Transaction:
+    """
+    A group of file writes which are committed together or not at all.
+
+    Each staged write is first recorded in a journal (one JSON record per line), then
+    written to a temporary sibling of its target. On commit the staged files are all
+    fsync'd, a commit record is appended and fsync'd to the journal (the commit point),
+    and only then is each staged file renamed over its target. The directories renamed
+    into are fsync'd once each at the end, then the journal is deleted.
+
+    If the process dies before the commit point, `recover()` rolls the transaction back
+    (deleting the staged files), and if it dies after, it rolls it forward (finishing
+    the renames). Used as a context manager, it commits on exit (or rolls back if an
+    exception was raised).
+
+    To be safe alongside other processes writing the same files, the commit holds an
+    advisory lock on every target, and first checks that none of them has changed since
+    it was read (a compare-and-swap against the digest of its `before` text). If any
+    has, the whole transaction is rolled back and a `WriteConflict` is raised.
+
+    If given a `BackupStore` as `backups`, the prior contents of each file are stored
+    in it as they are staged, and once committed the transaction is recorded there as
+    an `Operation` (which can be undone).
+    """
+
+    journal_dir: Path
+    journal_path: Path
+    writes: list[StagedWrite]
+    reserved: list[Path]
+
+    def __init__(
+        self,
+        journal_dir: Path | None = None,
+        lock_timeout: float = 10.0,
+        backups: BackupStore | None = None,
+    ) -> None:
+        self.id = uuid4().hex
+        self.lock_timeout = lock_timeout
+        self.backups = backups
+        self.journal_dir = cache_dir("journal") if journal_dir is None else journal_dir
+        self.journal_path = self.journal_dir / f"{self.id}.journal"
+        self.writes = []
+        self.reserved = []
+        self._journal = None
+        self.committed = False
+
+    def __enter__(self) -> Transaction:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def log(self, record: dict[str, str]) -> None:
+        """Append a record to the journal (opening and locking it on first use)."""
+        if self._journal is None:
+            self._journal = open_journal(self.journal_path)
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+
+    @property
+    def touched(self) -> list[Path]:
+        """The files rewritten by this transaction (only complete once committed)."""
+        return [write.target for write in self.writes]
+
+    def stage(
+        self,
+        target: Path,
+        text: str,
+        *,
+        before: str | None = None,
+    ) -> StagedWrite | None:
+        """
+        Write `text` to a temporary sibling of `target` (restaging the same target
+        overwrites the previous staged text), with the same permissions and owner as
+        `target` if it exists. If `before` (the text `target` is known to contain) is
+        passed and is unchanged, nothing is staged and `None` is returned, so that the
+        file (and its mtime) is left alone. Otherwise `before` is what the file must
+        still contain when the transaction commits.
+        """
+        (write,) = self.stage_all([(target, text, before)]) or [None]
+        return write
+
+    def stage_all(
+        self,
+        changes: list[tuple[Path, str, str | None]],
+        *,
+        jobs: int = 1,
+    ) -> list[StagedWrite]:
+        """
+        Stage the new `text` of each of several targets as for `stage()`, given as
+        `(target, text, before)`, returning the writes staged. They are journalled in
+        turn, then written to their staged paths in a pool of `jobs` threads (0 for
+        one per CPU), as the time goes on I/O (and each target is a different file).
+        """
+        staging = {}  # By target, so restaging one in the same call overwrites it
+        for target, text, before in changes:
+            target = Path(target).absolute()
+            if text == before and not any(w.target == target for w in self.writes):
+                logger.debug(f"Skipped {target} (unchanged)")
+                continue
+            staged = staged_path(target, self.id)
+            write = self.prepare(target, staged=staged, before=before)
+            if self.backups is not None:
+                write.after = content_digest(text)
+            staging[target] = (write, text)
+        if jobs == 1 or len(staging) < 2:
+            for write, text in staging.values():
+                write_staged(write, text)
+        else:
+            with ThreadPoolExecutor(max_workers=jobs or None) as pool:
+                list(pool.map(write_staged, *zip(*staging.values())))
+        return [write for write, _ in staging.values()]
+
+    def reserve(self, targets: list[Path]) -> None:
+        """
+        Journal the staged paths of `targets` before other processes write to them
+        (see `adopt()`), so they can't be orphaned. Nothing is staged until adopted.
+        """
+        for target in targets:
+            target = Path(target).absolute()
+            staged = staged_path(target, self.id)
+            self.log({"op": "stage", "target": str(target), "staged": str(staged)})
+            self.reserved.append(staged)
+
+    def adopt(
+        self,
+        target: Path,
+        *,
+        expected: str | None,
+        before: str | None = None,
+        after: str | None = None,
+    ) -> StagedWrite:
+        """
+        Stage the new contents of `target` which another process wrote to its staged
+        path (reserved first), given the digests it computed: `expected` for the
+        compare-and-swap, and `before`/`after` as stored in the backup store (if used).
+        """
+        target = Path(target).absolute()
+        write = StagedWrite(
+            target,
+            staged_path(target, self.id),
+            expected,
+            before,
+            after,
+        )
+        self.log(write.record())
+        copy_metadata(src=target, dst=write.staged)
+        self.writes.append(write)
+        return write
+
+    def delete(self, target: Path, *, before: str | None = None) -> StagedWrite:
+        """Stage the deletion of `target` (`before` is as for `stage()`)."""
+        target = Path(target).absolute()
+        write = self.prepare(target, staged=None, before=before)
+        write.after = None
+        logger.debug(f"Staged deletion of {target}")
+        return write
+
+    def prepare(
+        self,
+        target: Path,
+        *,
+        staged: Path | None,
+        before: str | None,
+    ) -> StagedWrite:
+        """
+        Get the `StagedWrite` for `target` (new, or one already staged in this
+        transaction), journalling it before anything is written to the staged path so
+        that it can't be orphaned. The pre-image is backed up on first staging.
+        """
+        write = next((w for w in self.writes if w.target == target), None)
+        if write is None:
+            write = StagedWrite(target=target, staged=staged)
+            if before is not None:
+                write.expected = content_digest(before)
+            if self.backups is not None:
+                write.before = self.back_up(target, before=before)
+            self.log(write.record())
+            self.writes.append(write)
+        elif write.staged != staged:
+            # Switching between writing and deleting: re-journal (the last record wins)
+            if write.staged is not None:
+                write.staged.unlink(missing_ok=True)
+            write.staged = staged
+            self.log(write.record())
+        return write
+
+    def back_up(self, target: Path, before: str | None) -> str | None:
+        """Store the contents of `target` (if it exists) and return their digest."""
+        if not target.exists():
+            return None
+        if before is None:
+            before = target.read_text()
+        return self.backups.save(before)
+
+    def commit(self) -> None:
+        if self.writes:
+            try:
+                with FileLocks(self.touched, timeout=self.lock_timeout):
+                    self.check_unchanged()
+                    self.apply()
+            except WriteConflict:
+                self.rollback()
+                raise
+        self.committed = True
+        self.close()
+
+    def check_unchanged(self) -> None:
+        """Compare-and-swap: ensure no target changed since read (when locked)."""
+        if conflicts := [w.target for w in self.writes if w.conflicted()]:
+            msg = f"Changed by another process since parsing: {conflicts}"
+            raise WriteConflict(msg)
+
+    def apply(self) -> None:
+        """Pass the commit point, then rename the staged files over their targets."""
+        for write in self.writes:
+            if write.staged is not None:
+                fsync_path(write.staged)
+        self.log({"op": "commit"})
+        os.fsync(self._journal.fileno())
+        try:
+            roll_forward(self.writes)
+        except OSError as exc:
+            # Keep the journal: `recover()` will finish the renames
+            self.close(unlink=False)
+            msg = f"Commit interrupted (journal kept at {self.journal_path})"
+            raise TransactionFailure(msg) from exc
+        if self.backups is not None:
+            changes = [write.change() for write in self.writes]
+            self.backups.record(
+                Operation(id=self.id, time=time.time(), changes=changes),
+            )
+
+    def rollback(self) -> None:
+        roll_back(self.writes)
+        for staged in self.reserved:
+            staged.unlink(missing_ok=True)
+        self.close()
+
+    def close(self, unlink: bool = True) -> None:
+        if self._journal is not None:
+            if unlink:
+                self.journal_path.unlink(missing_ok=True)
+            self._journal.close()
+            self._journal = None
+
+
+def staged_path(target: Path, transaction_id: str) -> Path:
+    """The hidden sibling of `target` that a transaction stages its new contents at."""
+    return target.with_name(f".{target.name}.{transaction_id[:12]}.mvdef")
+
+
+def write_staged(write: StagedWrite, text: str) -> None:
+    """Write the new text of a staged write to its staged path."""
+    write.staged.write_text(text)
+    copy_metadata(src=write.target, dst=write.staged)
+    logger.debug(f"Staged {write.target} at {write.staged.name}")
+
+
+def copy_metadata(src: Path, dst: Path) -> None:
+    """
+    Give `dst` the permission bits of `src` and (if allowed) its owner and group, so
+    that renaming `dst` over `src` preserves them. No-op if `src` doesn't exist.
+    """
+    try:
+        st = src.stat()
+    except FileNotFoundError:
+        return
+    os.chmod(dst, stat.S_IMODE(st.st_mode))
+    try:
+        os.chown(dst, st.st_uid, st.st_gid)
+    except (AttributeError, PermissionError):
+        pass  # Unsupported (Windows) or not permitted (so remains the writing user's)
+
+
+def open_journal(path: Path):
+    """
+    Create and lock a journal file. The lock is held until the file is closed (or the
+    process exits), which is how `recover()` tells live transactions from dead ones.
+    """
+    while True:
+        journal = open(path, "a", encoding="utf-8")
+        lock_file(journal, blocking=True)
+        if os.fstat(journal.fileno()).st_nlink:
+            return journal
+        # Recovered (i.e. unlinked) as empty between opening and locking: start again
+        journal.close()
+
+
+def fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path: Path) -> None:
+    """Persist renames into a directory (directories can't be opened on Windows)."""
+    try:
+        fsync_path(path)
+    except OSError:
+        pass
+
+
+def roll_forward(writes: list[StagedWrite]) -> None:
+    """
+    Rename each staged file over its target (or delete the target if it has no staged
+    file), then fsync each directory once.
+    """
+    for write in writes:
+        if write.staged is None:
+            write.target.unlink(missing_ok=True)
+            logger.debug(f"Deleted {write.target}")
+        elif write.staged.exists():
+            os.replace(write.staged, write.target)
+            logger.debug(f"Committed {write.target}")
+    for directory in {write.target.parent for write in writes}:
+        fsync_dir(directory)
+
+
+def roll_back(writes: list[StagedWrite]) -> None:
+    for write in writes:
+        if write.staged is not None:
+            write.staged.unlink(missing_ok=True)
+
+
+def read_records(journal) -> list[dict[str, str]]:
+    """Parse the journal's records, ignoring a final line left partly written."""
+    records = []
+    for line in journal:
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    return records
+
+
+def recover(journal_dir: Path | None = None) -> dict[Path, bool]:
+    """
+    Finish or undo any transaction left behind by a process that died mid-commit,
+    returning the journals found mapped to whether they were rolled forward (`True`)
+    or back (`False`). Journals still locked by a live transaction are skipped.
+    """
+    journal_dir = cache_dir("journal") if journal_dir is None else journal_dir
+    recovered = {}
+    for journal_path in sorted(journal_dir.glob("*.journal")):
+        with open(journal_path, encoding="utf-8") as journal:
+            if not lock_file(journal, blocking=False):
+                continue
+            records = read_records(journal)
+            # Later records for the same target supersede earlier ones
+            staging = {r["target"]: r["staged"] for r in records if r["op"] == "stage"}
+            writes = [
+                StagedWrite(target=Path(target), staged=staged and Path(staged))
+                for target, staged in staging.items()
+            ]
+            if committed := any(r["op"] == "commit" for r in records):
+                roll_forward(writes)
+            else:
+                roll_back(writes)
+            journal_path.unlink()
+        logger.info(f"Rolled {'forward' if committed else 'back'} {journal_path.name}")
+        recovered[journal_path] = committed
+    return recovered
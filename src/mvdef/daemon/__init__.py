@@ -0,0 +1,5 @@
+"""
+A long-running `mvdefd` process serving `mvdef`/`cpdef`/`lsdef` commands over a local
+Unix socket, so that repeated commands (e.g. from an editor) skip the cost of starting
+Python, importing mvdef, and re-parsing files that haven't changed.
+"""
@@ -0,0 +1,67 @@
+"""
+Forward a CLI invocation to a running `mvdefd` (kept to the standard library modules
+needed to talk JSON-RPC over a socket, as it runs before anything else in the CLIs).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+from ..cache_dir import cache_dir
+
+__all__ = ["forward", "request", "socket_path"]
+
+
+def socket_path() -> Path:
+    """The daemon's socket: ``$MVDEF_SOCKET`` if set, else in the cache directory."""
+    if override := os.environ.get("MVDEF_SOCKET"):
+        return Path(override)
+    return cache_dir() / "mvdefd.sock"
+
+
+def request(method: str, params: dict | None = None, path: Path | None = None) -> dict:
+    """
+    Send one JSON-RPC request (a line of JSON) and return the response. Raises `OSError`
+    if the daemon isn't listening.
+    """
+    path = socket_path() if path is None else path
+    message = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            response = reader.readline()
+    if not response:
+        raise ConnectionError("mvdefd closed the connection without responding")
+    return json.loads(response)
+
+
+def forward(command: str, argv: list[str]) -> int | None:
+    """
+    Run a CLI command on the daemon if one is running, relaying its output and
+    returning its exit status (or `None` if there's no daemon, to run it locally).
+    Set ``MVDEF_NO_DAEMON`` to always run locally.
+    """
+    if os.environ.get("MVDEF_NO_DAEMON"):
+        return None
+    path = socket_path()
+    if not path.exists():
+        return None
+    params = {"argv": argv, "cwd": os.getcwd()}
+    if "-" in argv:
+        params["stdin"] = sys.stdin.read()  # Filter mode: src or dst is on stdin
+    try:
+        response = request(command, params, path=path)
+    except OSError:
+        return None  # Stale socket (the daemon exited without removing it)
+    if "error" in response:
+        print(f"mvdefd: {response['error']['message']}", file=sys.stderr)
+        return 1
+    result = response["result"]
+    sys.stdout.write(result["stdout"])
+    sys.stderr.write(result["stderr"])
+    return result["status"]
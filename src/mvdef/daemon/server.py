@@ -0,0 +1,229 @@
+"""The `mvdefd` daemon: a JSON-RPC server on a Unix socket, built on asyncio."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from inspect import signature
+from pathlib import Path
+
+from ..cli import COMMANDS, bind_defopt, cli, load_cls, run_defopt
+from ..core.importers import forget_packages
+from ..core.parse_cache import ParseCache
+from ..log_utils import set_up_logging
+from ..transfer.base import MvDefBase
+from .client import request, socket_path
+
+__all__ = ["Mvdefd", "main"]
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+
+
+class ThreadLocalStream(io.TextIOBase):
+    """
+    Stands in for `sys.stdin`, `sys.stdout` or `sys.stderr`, so that what each command
+    reads or prints can be supplied or captured by the thread running it (other threads
+    use `default`).
+    """
+
+    def __init__(self, default) -> None:
+        self.default = default
+        self.local = threading.local()
+
+    @property
+    def target(self):
+        return getattr(self.local, "buffer", None) or self.default
+
+    def read(self, size: int | None = -1) -> str:
+        return self.target.read(size)
+
+    def readline(self, size: int | None = -1) -> str:
+        return self.target.readline(size)
+
+    def write(self, s: str) -> int:
+        return self.target.write(s)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+    @contextmanager
+    def capture(self, initial: str = ""):
+        self.local.buffer = buffer = io.StringIO(initial)
+        try:
+            yield buffer
+        finally:
+            self.local.buffer = None
+
+
+def resolve_paths(value, cwd: Path):
+    """Make relative paths (also those in lists) relative to the client's `cwd`."""
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve_paths(v, cwd) for v in value)
+    if isinstance(value, Path) and not value.is_absolute() and str(value) != "-":
+        return cwd / value
+    return value
+
+
+def resolve_route(item: str, cwd: Path) -> str:
+    """Make the path of a `name:path` route in `mv` relative to the client's `cwd`."""
+    name, sep, path = item.partition(":")
+    if not sep or path == "-" or Path(path).is_absolute():
+        return item
+    return f"{name}:{cwd / path}"
+
+
+def reply(msg_id, result=None, error: tuple[int, str] | None = None) -> dict:
+    response = {"jsonrpc": "2.0", "id": msg_id}
+    if error is None:
+        response["result"] = result
+    else:
+        code, message = error
+        response["error"] = {"code": code, "message": message}
+    return response
+
+
+@dataclass
+class Mvdefd:
+    """
+    Serve mvdef/cpdef/lsdef commands from a long-running process, keeping the parses
+    of files warm until they change. The CLIs forward to it while it is running.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • socket     socket path (default: in the cache dir)    Path|None   None
+    • workers    maximum number of commands run at once     int         4
+    • verbose    whether to log anything                    bool        False
+    """
+
+    socket: Path | None = None
+    workers: int = 4
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+        self.path = socket_path() if self.socket is None else self.socket
+        self.cache = ParseCache()
+        self.stdin = ThreadLocalStream(sys.stdin)
+        self.stdout = ThreadLocalStream(sys.stdout)
+        self.stderr = ThreadLocalStream(sys.stderr)
+
+    def run_command(self, command: str, argv: list[str], cwd: str, stdin: str) -> dict:
+        """Run a CLI command (in a worker thread), capturing its input and output."""
+        with self.stdin.capture(stdin), self.stdout.capture() as out:
+            with self.stderr.capture() as err:
+                status = self.invoke(command, argv, cwd=Path(cwd))
+        self.logger.info(f"{command} {' '.join(argv)} -> {status}")
+        return {"stdout": out.getvalue(), "stderr": err.getvalue(), "status": status}
+
+    def invoke(self, command: str, argv: list[str], cwd: Path) -> int:
+        MvCls = load_cls(COMMANDS[command])
+        forget_packages()  # Files may have been added since the last command
+        try:
+            call = bind_defopt(MvCls, argv=argv, prog=command)
+            args = [resolve_paths(arg, cwd) for arg in call.args]
+            kwargs = {k: resolve_paths(v, cwd) for k, v in call.keywords.items()}
+            bound = signature(MvCls).bind(*args, **kwargs)
+            if routes := bound.arguments.get("mv"):
+                bound.arguments["mv"] = [resolve_route(item, cwd) for item in routes]
+            cli(*bound.args, MvCls=MvCls, **bound.kwargs)
+        except SystemExit as exc:
+            if exc.code is None or isinstance(exc.code, int):
+                return exc.code or 0
+            print(exc.code, file=sys.stderr)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    async def respond(self, line: bytes) -> dict:
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            return reply(None, error=(PARSE_ERROR, "Parse error"))
+        msg_id, method = message.get("id"), message.get("method")
+        params = message.get("params") or {}
+        if method == "ping":
+            stats = {"hits": self.cache.hits, "misses": self.cache.misses}
+            return reply(msg_id, {"pid": os.getpid(), **stats})
+        elif method == "shutdown":
+            self.stopping.set()
+            return reply(msg_id)
+        elif method not in COMMANDS:
+            return reply(msg_id, error=(METHOD_NOT_FOUND, f"Unknown method {method!r}"))
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor,
+            self.run_command,
+            method,
+            params.get("argv", []),
+            params.get("cwd", os.getcwd()),
+            params.get("stdin", ""),
+        )
+        return reply(msg_id, result)
+
+    async def handle(self, reader, writer) -> None:
+        """Respond to each request (a line of JSON) sent on a connection in turn."""
+        try:
+            while not self.stopping.is_set() and (line := await reader.readline()):
+                response = await self.respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # Client went away, or the daemon is shutting down
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+        server = await asyncio.start_unix_server(self.handle, path=str(self.path))
+        self.logger.info(f"mvdefd listening on {self.path}")
+        async with server:
+            await self.stopping.wait()
+
+    def run(self) -> None:
+        """
+        Serve until sent SIGINT/SIGTERM or a "shutdown" request. Commands run in a pool
+        of threads, capturing their output, with parses shared via `MvDefBase`.
+        """
+        if self.path.exists():
+            try:
+                request("ping", path=self.path)
+            except OSError:
+                self.path.unlink()  # Stale socket
+            else:
+                raise SystemExit(f"mvdefd is already running on {self.path}")
+        MvDefBase.parse_cache = self.cache
+        sys.stdin, sys.stdout, sys.stderr = self.stdin, self.stdout, self.stderr
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown()
+            sys.stdin = self.stdin.default
+            sys.stdout, sys.stderr = self.stdout.default, self.stderr.default
+            MvDefBase.parse_cache = None
+            self.path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    """Entry point for `mvdefd`."""
+    run_defopt(Mvdefd, argv=None, prog="mvdefd").run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,13 @@
-__all__ = ["AgendaFailure", "CheckFailure", "MvDefException", "SrcNotFound"]
+__all__ = [
+    "AgendaFailure",
+    "CheckFailure",
+    "LockTimeout",
+    "MvDefException",
+    "PlanFailure",
+    "SrcNotFound",
+    "TransactionFailure",
+    "WriteConflict",
+]
 
 
 class MvDefException(Exception):
@@ -15,5 +24,26 @@ class AgendaFailure(MvDefException):
     """MvDef: agenda failed"""
 
 
+class PlanFailure(MvDefException):
+    """MvDef: a batch plan could not be read or run."""
+
+
 class SrcNotFound(MvDefException, FileNotFoundError):
     """MvDef: source file doesn't exist."""
+
+
+class TransactionFailure(MvDefException):
+    """MvDef: transaction failed to commit."""
+
+
+class WriteConflict(TransactionFailure):
+    """
+    MvDef: a file was changed by another process since it was parsed (so the parse it
+    was edited from is stale). Rerunning the command will re-parse it, so is safe.
+    """
+
+    retryable = True
+
+
+class LockTimeout(WriteConflict):
+    """MvDef: timed out waiting for another process to finish writing a file."""
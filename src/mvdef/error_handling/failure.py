@@ -1,4 +1,4 @@
-from sys import stderr
+import sys
 
 from .exceptions import CheckFailure
 
@@ -7,7 +7,7 @@ __all__ = ["FailableMixIn"]
 
 class FailableMixIn:
     def err(self, msg) -> None:
-        print(msg, file=stderr)
+        print(msg, file=sys.stderr)
 
     def fail(self, msg, exc_info=None) -> CheckFailure | None:
         exc = CheckFailure(msg)
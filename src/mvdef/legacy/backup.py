@@ -27,10 +27,10 @@ def backup(filepath, dry_run=False, suffix=".backup", hidden=True):
     else:
         assert filepath.exists() and filepath.is_file() and filepath.suffix == ".py"
     bname = f"{hid_prefix}{filepath.name}{suffix}"
-    if fd / bname in fd.iterdir():
+    if (fd / bname).exists():
         for i in range(12):
             bname_i = fd / f"{bname}{i}"
-            if bname_i not in fd.iterdir():
+            if not bname_i.exists():
                 break
             i += 1
             if i > 10:
@@ -1,5 +1,32 @@
-from .copy import CpDef
-from .list import LsDef
-from .move import MvDef
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-__all__ = ["CpDef", "LsDef", "MvDef"]
+if TYPE_CHECKING:
+    from .batch import Batch
+    from .copy import CpDef
+    from .index import Index
+    from .list import LsDef
+    from .merge import Merge
+    from .move import MvDef
+    from .split import Split
+    from .undo import Undo
+
+__all__ = ["Batch", "CpDef", "Index", "LsDef", "Merge", "MvDef", "Split", "Undo"]
+
+_submodules = {
+    "Batch": "batch",
+    "CpDef": "copy",
+    "Index": "index",
+    "LsDef": "list",
+    "Merge": "merge",
+    "MvDef": "move",
+    "Split": "split",
+    "Undo": "undo",
+}
+
+
+def __getattr__(name: str):
+    """Import each class on first access, so a CLI only imports the one it runs."""
+    if name in _submodules:
+        return getattr(import_module(f".{_submodules[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,20 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..core.check import Checker
 from ..error_handling.exceptions import CheckFailure
 from ..error_handling.failure import FailableMixIn
 from ..log_utils import set_up_logging
 
-__all__ = ["MvDefBase"]
+if TYPE_CHECKING:
+    from ..core.check import Checker
+    from ..core.parse_cache import ParseCache
+
+__all__ = ["MvDefBase", "forget_made_packages", "shared_parses"]
 
 
 @dataclass  # TODO: delete this (don't think it's needed)
@@ -17,11 +26,16 @@ class MvDefBase(FailableMixIn):
     attributes (by virtue of being un-type annotated, due to how dataclasses work).
     They are single-underscore prefixed to avoid name clash with the properties of the
     same [but unprefixed] names.
+
+    Likewise :attr:`parse_cache` is a class attribute: a long-running process (such as
+    the `mvdefd` daemon) can set it to a `ParseCache` to reuse the parses of files
+    which have not changed since the last command.
     """
 
     # Do not type annotate (see docstring)
     check_kw = ["cls_defs", "func_defs"]
     diff_kw = ["escalate", "verbose"]
+    parse_cache = None
 
     def __post_init__(self):
         self.logger = set_up_logging(__name__, verbose=self.verbose)
@@ -74,3 +88,33 @@ class MvDefBase(FailableMixIn):
         raise errors rather than returning them in 'escalate' mode, to help debugging).
         """
         raise NotImplementedError("Implemented on subclass")
+
+
+@contextmanager
+def shared_parses() -> Iterator[ParseCache]:
+    """
+    Share the parses of files between the `MvDef` runs within (unless a long-running
+    process already shares them), so that a command running several parses each file
+    only once.
+    """
+    from ..core.parse_cache import ParseCache
+
+    if MvDefBase.parse_cache is not None:
+        yield MvDefBase.parse_cache
+        return
+    MvDefBase.parse_cache = ParseCache()
+    try:
+        yield MvDefBase.parse_cache
+    finally:
+        MvDefBase.parse_cache = None
+
+
+def forget_made_packages(touched: list[Path]) -> None:
+    """
+    Clear the memos of the package layout if a command wrote (or deleted) any
+    `__init__.py`, as a package may have been made (or unmade).
+    """
+    from ..core.importers import forget_packages
+
+    if any(path.name == "__init__.py" for path in touched):
+        forget_packages()
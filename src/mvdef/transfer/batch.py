@@ -0,0 +1,127 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..core.backup import BackupStore
+from ..core.batch import (
+    BatchOp,
+    GroupResult,
+    file_groups,
+    load_plan,
+    run_group,
+    schedule,
+)
+from ..core.transaction import Transaction, recover
+from ..error_handling.exceptions import PlanFailure
+from ..error_handling.failure import FailableMixIn
+from ..log_utils import set_up_logging
+from .base import forget_made_packages
+
+__all__ = ["Batch"]
+
+
+@dataclass
+class Batch(FailableMixIn):
+    """
+    Run a plan of moves/copies (a TOML file with an [[ops]] table for each, having
+    src, dst and mv keys, and optionally copy, cls_defs, func_defs and retain flags
+    and an import_style, as for mvdef), parsing each file once and writing each
+    changed file once, all in a single transaction.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • plan       TOML file listing the moves/copies to run  Path        -
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • progress   whether to print progress to STDERR        bool        False
+    • dry_run    whether to only preview the change diffs   bool        False
+    • escalate   whether to raise an error upon failure     bool        False
+    • verbose    whether to log anything                    bool        False
+    """
+
+    plan: Path
+    jobs: int = 1
+    progress: bool = False
+    dry_run: bool = False
+    escalate: bool = False
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+
+    def run(self) -> list[Path]:
+        """
+        Merge and order the plan's ops (see `schedule`), split them into groups that
+        share no files, and run the groups (in parallel if `jobs` isn't 1) on the
+        files' texts in memory. The changed files are then committed together, or
+        their diffs printed if `dry_run`. Returns the files rewritten.
+        """
+        try:
+            ops = schedule(load_plan(self.plan))
+            if self.dry_run:
+                results = self.run_groups(ops, transaction_id=None)
+                for result in results:
+                    for change in result.changes:
+                        print(change.diff)
+                return []
+            recover()
+            with Transaction(backups=BackupStore()) as txn:
+                txn.reserve(list(dict.fromkeys(p for op in ops for p in op.files)))
+                results = self.run_groups(ops, txn.id, backups=txn.backups)
+                for result in results:
+                    for change in result.changes:
+                        txn.adopt(
+                            change.target,
+                            expected=change.expected,
+                            before=change.before,
+                            after=change.after,
+                        )
+        except PlanFailure as exc:
+            self.fail(f"Cannot run the plan: {exc}", exc_info=exc)
+            return []
+        forget_made_packages(txn.touched)
+        self.logger.info(f"Touched {len(txn.touched)} file(s): {txn.touched}")
+        return txn.touched
+
+    def run_groups(
+        self,
+        ops: list[BatchOp],
+        transaction_id: str | None,
+        backups: BackupStore | None = None,
+    ) -> list[GroupResult]:
+        """
+        Run each group of ops (in a pool of `jobs` processes, unless 1), reporting
+        progress as each finishes. Returns the results in group order. If a group
+        fails, the groups not yet started are cancelled and the rest waited for.
+        """
+        groups = file_groups(ops)
+        kwargs = {
+            "transaction_id": transaction_id,
+            "backups": backups,
+            "escalate": self.escalate,
+            "verbose": self.verbose,
+        }
+        if self.jobs == 1 or len(groups) < 2:
+            results = []
+            for group in groups:
+                results.append(run_group(group, **kwargs))
+                self.report(len(results), len(groups), results[-1])
+            return results
+        pool = ProcessPoolExecutor(max_workers=self.jobs or None)
+        try:
+            futures = [pool.submit(run_group, group, **kwargs) for group in groups]
+            for done, future in enumerate(as_completed(futures), 1):
+                self.report(done, len(groups), future.result())
+        finally:
+            # Don't leave workers writing staged files after a failure rolls back
+            pool.shutdown(wait=True, cancel_futures=True)
+        return [future.result() for future in futures]
+
+    def report(self, done: int, total: int, result: GroupResult) -> None:
+        msg = (
+            f"[{done}/{total}] Ran {result.ops} op(s) with {result.parses} parse(s), "
+            f"changing {len(result.changes)} file(s)"
+        )
+        self.logger.info(msg)
+        if self.progress:
+            print(msg, file=sys.stderr, flush=True)
@@ -1,5 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 
+from ..error_handling.exceptions import CheckFailure
 from .move import MvDef
 
 __all__ = ["CpDef"]
@@ -10,30 +12,55 @@ class CpDef(MvDef):
     """
     Copy function definitions from one file to another, and any necessary
     associated import statements along with them.
+    Either file can be - to read it from stdin and write its result to stdout.
+    Given several destinations, the definitions are copied to each of them.
 
     Option     Description                                Type        Default
     —————————— —————————————————————————————————————————— ——————————— ———————
     • src        source file to copy definitions from       Path        -
-    • dst        destination file (may not exist)           Path        -
-    • mv         names to copy from the source file         list[str]   -
+    • dst        destination files (may not exist)          Path ...    -
+    • mv         names to copy (or name:path to route one)  list[str]   -
     • dry_run    whether to only preview the change diffs   bool        False
+    • with_deps  whether to also copy the helpers they use  bool        False
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • allow_cycles whether to allow new import cycles       bool        False
     • escalate   whether to raise an error upon failure     bool        False
     • cls_defs   whether to use only class definitions      bool        False
     • func_defs  whether to use only function definitions   bool        False
     • verbose    whether to log anything                    bool        False
     """
 
+    dst: tuple[Path, ...]
+    # Only moves update importers or retain imports, so these aren't options of a copy
+    update_importers: bool = field(default=False, init=False)
+    retain: bool = field(default=False, init=False)
+    import_style: str = field(default=".", init=False)
     _copy_mode: bool = True
 
+    def check(self) -> CheckFailure | None:
+        """
+        Route the names not given a destination of their own to each `dst` (the first
+        becoming `dst`), then check as for a move (where a name can go to several).
+        """
+        if isinstance(self.dst, tuple):
+            if not self.dst:
+                return self.fail("No dst file given")
+            self.dst, *fan_out = self.dst
+            unrouted = [name for name in self.mv if ":" not in name]
+            self.mv = [*self.mv, *(f"{n}:{dst}" for dst in fan_out for n in unrouted)]
+        return super().check()
+
     def diffs(self, print_out: bool = False) -> str:
         """
         Calls `Agenda.populate_agenda()` explicitly for the src file, and implicitly for
-        the dst file by `Agenda.unidiff()`, and returns a single diff string for dst.
+        each destination by `Agenda.unidiff()`, and returns the diff string for dst.
         """
         # Necessary to populate the Agenda to set up its Checker (becomes `source_ref`)
         if self.src_diff.agenda.empty:
             self.src_diff.populate_agenda()
-        dst_unidiff = self.dst_diff.unidiff()
+        dst_unidiffs = {dst: diff.unidiff() for dst, diff in self.dst_diffs.items()}
+        self.check_cycles()
         if print_out:
-            print(dst_unidiff)
-        return dst_unidiff
+            for dst_unidiff in dst_unidiffs.values():
+                print(dst_unidiff)
+        return dst_unidiffs.get(self.dst, "")
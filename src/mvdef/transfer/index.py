@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..error_handling.failure import FailableMixIn
+from ..log_utils import set_up_logging
+
+# Note: the `core` modules are imported where used (see `move.py`)
+
+__all__ = ["Index"]
+
+
+@dataclass
+class Index(FailableMixIn):
+    """
+    Build or update the symbol index of the given files, directories (for their .py
+    files) or globs, re-analysing only the files changed since last indexed. Then
+    print the imports of a module (--importers) or the definitions of a name
+    (--defines) among them, if asked. lsdef lists files from the index while fresh.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • src        files, directories or globs to index       Path ...    -
+    • importers  module to list the imports of              str|None    None
+    • defines    name to list the definitions of            str|None    None
+    • cached     whether to query without updating          bool        False
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • escalate   whether to raise an error upon failure     bool        False
+    • verbose    whether to log anything                    bool        False
+    """
+
+    src: tuple[Path, ...]
+    importers: str | None = None
+    defines: str | None = None
+    cached: bool = False
+    jobs: int = 1
+    escalate: bool = False
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+
+    def run(self) -> list[Path]:
+        """
+        Update the index (unless `cached`) then run the queries asked. Returns no
+        paths, as no source files are written.
+        """
+        from ..core.index import SymbolIndex
+        from ..core.listing import base_dir, expand_paths, is_pattern
+
+        with SymbolIndex() as index:
+            if not self.cached:
+                paths = expand_paths(self.src)
+                # Files removed from a directory are pruned (but not from a glob's)
+                roots = [spec for spec in self.src if not is_pattern(spec)]
+                update = index.update(roots, paths, jobs=self.jobs)
+                self.logger.info(str(update))
+                if self.importers is None and self.defines is None:
+                    print(update)
+            scope = [base_dir(spec).absolute() for spec in self.src] or None
+            if self.importers is not None:
+                for path, line, full_name in index.importers(self.importers, scope):
+                    print(f"{path}:{line}:{full_name}")
+            if self.defines is not None:
+                for path, line, kind in index.definitions(self.defines, scope):
+                    print(f"{path}:{line}:{kind}")
+        return []
@@ -1,33 +1,46 @@
 from dataclasses import dataclass, field
 from pathlib import Path
 
-from ..core.manifest.manifest import Manifest
-from ..core.parse import parse_file
 from ..error_handling.exceptions import CheckFailure
 from .base import MvDefBase
 
+# Note: the `core` modules are imported where used (see `move.py`)
+
 
 @dataclass
 class LsDef(MvDefBase):
     """
-    List function definitions in a given file.
+    List function definitions in the given files, or (without --dry-run or --list)
+    fix a file's __all__ to list them. The file can be - to read it from stdin and
+    write the fixed file to stdout. Directories (for their .py files) and glob
+    patterns can also be given, and many files listed with --list or --jsonl.
 
     Option     Description                                Type        Default
     —————————— —————————————————————————————————————————— ——————————— ———————
-    • src        source file to list definitions from       Path        -
-    • match      name regex to list from the source file    list[str]   ['*']
-    • dry_run    whether to print the __all__ diff          bool        False
-    • list       whether to print the list of names         bool        False
-    • escalate   whether to raise an error upon failure     bool        False
-    • cls_defs   whether to use only class definitions      bool        False
-    • func_defs  whether to use only function definitions   bool        False
-    • verbose    whether to log anything                    bool        False
+    • src        source files, directories or globs         Path ...    -
+    • match      name regex to list from the source file    list[str]   ['*']
+    • dry_run    whether to print the __all__ diff          bool        False
+    • list       whether to print the list of names         bool        False
+    • jsonl      whether to print a JSON object per file    bool        False
+    • per_def    whether to print one per definition        bool        False
+    • sort       whether to list files in sorted order      bool        False
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • escalate   whether to raise an error upon failure     bool        False
+    • cls_defs   whether to use only class definitions      bool        False
+    • func_defs  whether to use only function definitions   bool        False
+    • verbose    whether to log anything                    bool        False
     """
 
-    src: Path
+    src: tuple[Path, ...]
     match: list[str] = field(default_factory=lambda: ["*"])
+    # (Declared before the `list` field, which shadows the type in the class body)
+    touched: list[Path] = field(default_factory=list, init=False, repr=False)
     dry_run: bool = False
     list: bool = False
+    jsonl: bool = False
+    per_def: bool = False
+    sort: bool = False
+    jobs: int = 1
     escalate: bool = False
     cls_defs: bool = False
     func_defs: bool = False
@@ -35,20 +48,63 @@ class LsDef(MvDefBase):
     # Future idea: flag to show import usage map alongside each definition
 
     def __post_init__(self):
+        from ..core.listing import expand_paths, is_pattern
+        from ..core.manifest.manifest import Manifest
+
+        if isinstance(self.src, (str, Path)):
+            self.src = (Path(self.src),)  # When called with a single file
+        self.src = tuple(self.src)
+        self.files = expand_paths(self.src)
+        if self.sort:
+            self.files.sort()
+        self.many = (
+            self.jsonl
+            or len(self.src) > 1
+            or any(is_pattern(spec) or spec.is_dir() for spec in self.src)
+        )
+        self.path = None if self.many or not self.src else self.src[0]
         super().__post_init__()
+        if self.many or self.check_blocker is not None:
+            return
         kwargs = {
             k: getattr(self, k) for k in ["dry_run", "list", "escalate", "verbose"]
         }
         kwargs["source_ref"] = self.src_check
-        self.src_manifest = Manifest(self.src, matchers=self.match, **kwargs)
+        self.src_manifest = Manifest(self.path, matchers=self.match, **kwargs)
 
     def check(self) -> CheckFailure | None:
+        import re
+
+        from ..core.manifest.match import NameMatcher
+        from ..core.parse import STDIN, parse_file
+
+        if not self.match:
+            return self.fail("Pass at least one --match pattern (or * for any name)")
+        if "*" in self.match and len(self.match) > 1:
+            return self.fail("The * match (for any name) must be used alone")
+        try:
+            self.matcher = NameMatcher(self.match)
+        except re.error as exc:
+            return self.fail(f"Invalid --match regex: {exc}", exc_info=exc)
+        if self.many:
+            if STDIN in self.files:
+                return self.fail("Only a single file can be read from stdin")
+            if not (self.list or self.jsonl):
+                return self.fail("Listing many files needs --list or --jsonl")
+            return None
+        if self.path is None:
+            return self.fail("No src file given")
         kwargs = {
             k: getattr(self, k)
             for k in ["escalate", "verbose", "cls_defs", "func_defs"]
         }
         try:
-            self.src_check = parse_file(self.src, ensure_exists=True, **kwargs)
+            self.src_check = parse_file(
+                self.path,
+                ensure_exists=True,
+                cache=self.parse_cache,
+                **kwargs,
+            )
         except Exception as exc:
             self.src_check = None
             return self.fail("Failed to parse the src file", exc_info=exc)
@@ -57,14 +113,86 @@ class LsDef(MvDefBase):
                 return self.fail("Failed to parse the src file")
         return None
 
+    @property
+    def fixing(self) -> bool:
+        """Whether to fix `__all__` (rather than print the names or the assignment)."""
+        return not (self.dry_run or self.list or self.jsonl)
+
     def manif(self, print_out: bool = False) -> str:
         """
         Calls `Agenda.populate_agenda()` explicitly if not yet created,
-        and returns a single diff string.
+        and returns a single diff string. If fixing `__all__`, the fixed code is
+        written to the src file (or to stdout if it was read from stdin).
         """
+        from ..core.parse import STDIN
+
+        if self.many:
+            return self.list_many(print_out=print_out)
         if self.src_manifest.agenda.empty:
             self.src_manifest.populate_agenda()
         src_manif = self.src_manifest.fill()
-        if print_out:
-            print(src_manif)
+        if self.fixing and self.path != STDIN:
+            self.fix(src_manif)
+        elif print_out:
+            print(src_manif, end="" if self.fixing else "\n")
         return src_manif
+
+    def list_many(self, print_out: bool = False) -> str:
+        """
+        List the definitions in each of the files (in a pool of `jobs` processes),
+        printing each file's (or with `per_def` each definition's) line as it is
+        listed: a JSON object if `jsonl` (see `definition_records` for the fields),
+        else "file:line:name" for each top-level definition. Files that can't be
+        parsed are reported (and listed as an `error` in JSON). The records of files
+        unchanged since they were indexed (by `mvdef index`) are read from the index.
+        """
+        import json
+        from itertools import chain
+
+        from ..core.listing import def_records, indexed_records, list_files
+
+        flags = {"cls_defs": self.cls_defs, "func_defs": self.func_defs}
+        indexed = indexed_records(self.files, match=self.matcher, **flags)
+        parsed = list_files(
+            [path for path in self.files if path not in indexed],
+            jobs=self.jobs,
+            ordered=self.sort,
+            match=self.matcher,
+            **flags,
+        )
+        if self.sort:
+            records = (indexed.get(path) or next(parsed) for path in self.files)
+        else:
+            records = chain(indexed.values(), parsed)
+        lines = []
+        for record in records:
+            if "error" in record:
+                self.fail(f"Failed to list {record['file']}: {record['error']}")
+            if self.jsonl:
+                split = def_records(record) if self.per_def else [record]
+                new = [json.dumps(r) for r in split]
+            else:
+                new = [
+                    f"{d['file']}:{d['line']}:{d['name']}"
+                    for d in def_records(record)
+                    if "error" not in d and d["depth"] == 1
+                ]
+            if print_out and new:
+                print("\n".join(new), flush=True)
+            lines.extend(new)
+        self.log(f"Listed {len(self.files)} file(s)")
+        return "\n".join(lines)
+
+    def fix(self, code: str) -> None:
+        """
+        Write the code with its `__all__` fixed to the src file (unless unchanged),
+        backed up as for `MvDef.move()` so that `mvdef undo` can restore it.
+        """
+        from ..core.backup import BackupStore
+        from ..core.transaction import Transaction, recover
+
+        recover()
+        with Transaction(backups=BackupStore()) as txn:
+            txn.stage(self.path, code, before=self.src_check.code)
+        self.touched = txn.touched
+        self.log(f"Touched {len(self.touched)} file(s): {self.touched}")
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..error_handling.failure import FailableMixIn
+from ..log_utils import set_up_logging
+
+if TYPE_CHECKING:
+    from ..core.check import Checker
+    from ..core.parse_cache import ParseCache
+
+# Note: the `core` modules are imported where used (see `move.py`)
+
+__all__ = ["Merge"]
+
+
+@dataclass
+class Merge(FailableMixIn):
+    """
+    Move every top-level definition of several modules into one, along with the
+    imports they use (each brought once), having first checked that no two of them
+    define the same name. The code left in each source imports what it uses from the
+    destination, and the sources left empty can be deleted.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • src        modules to merge                           Path ...    -
+    • into       module to merge them into (may not exist)  Path|None   None
+    • remove_empty whether to delete the emptied sources    bool        False
+    • dry_run    whether to only preview the change diffs   bool        False
+    • update_importers whether to fix other files' imports  bool        False
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • allow_cycles whether to allow new import cycles       bool        False
+    • escalate   whether to raise an error upon failure     bool        False
+    • verbose    whether to log anything                    bool        False
+    """
+
+    src: tuple[Path, ...]
+    into: Path | None = None
+    remove_empty: bool = False
+    dry_run: bool = False
+    update_importers: bool = False
+    jobs: int = 1
+    allow_cycles: bool = False
+    escalate: bool = False
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+
+    def run(self) -> list[Path]:
+        """
+        Parse each source and the destination (once), refuse any conflicting names,
+        then move each source's definitions in turn onto the destination's text in
+        memory, and print the diffs if `dry_run`, else write them all in one
+        transaction (as one operation for `mvdef undo`). Returns the files written.
+        """
+        from ..core.parse import STDIN
+        from .base import shared_parses
+
+        sources = list(dict.fromkeys(self.src))
+        if self.into is None or not sources:
+            self.fail("Pass the modules to merge, and the one to merge them --into")
+            return []
+        if STDIN in (*sources, self.into):
+            self.fail("Only modules in files can be merged")
+            return []
+        if self.into in sources:
+            self.fail(f"Can't merge {self.into} into itself")
+            return []
+        with shared_parses() as cache:
+            return self.merge(sources, cache=cache)
+
+    def merge(self, sources: list[Path], cache: ParseCache) -> list[Path]:
+        """Run the merge, parsing each file (once) via the `cache`."""
+        from ..core.backup import BackupStore
+        from ..core.check import symbol_name
+        from ..core.cycles import new_cycles
+        from ..core.deps import MODULE, reference_graph, top_level_defs
+        from ..core.importers import (
+            add_imports,
+            import_line,
+            importer_package,
+            module_name,
+            package_parts,
+            relative_module,
+            rewrite_imports,
+        )
+        from ..core.parse import parse_file
+        from ..core.text_diff import get_unidiff_text
+        from ..core.transaction import Transaction, recover
+        from .base import forget_made_packages
+        from .move import MvDef
+
+        checks: dict[Path, Checker] = {}
+        for path in [*sources, *[self.into] * self.into.exists()]:
+            try:
+                checks[path] = parse_file(path, ensure_exists=True, cache=cache)
+            except Exception as exc:
+                self.fail(f"Failed to parse {path}", exc_info=exc)
+                return []
+            if checks[path] is None:
+                self.fail(f"Failed to parse {path}")
+                return []
+        moving = {path: top_level_defs(checks[path]) for path in sources}
+        if (failure := self.check_conflicts(moving, checks.get(self.into))) is not None:
+            return failure
+        movers = [
+            MvDef(
+                path,
+                dst=self.into,
+                mv=list(map(symbol_name, nodes)),
+                jobs=self.jobs,
+                escalate=self.escalate,
+                verbose=self.verbose,
+            )
+            for path, nodes in moving.items()
+            if nodes
+        ]
+        if not movers:
+            self.fail("Nothing to merge: the sources define nothing")
+            return []
+        if any(mover.check_blocker is not None for mover in movers):
+            return []
+        into = checks.get(self.into)
+        before = {self.into: "" if into is None else into.code}
+        after = {}
+        target = module_name(self.into)
+        merged = before[self.into]
+        for mover in movers:
+            before[mover.src] = checks[mover.src].code
+            after[mover.src] = mover.src_diff.simulate()
+            merged = mover.dst_diff.simulate(input_text=merged)
+        after[self.into] = merged
+        # The sources' imports from each other now come from (or are) the destination
+        for path in after:
+            for mover in movers:
+                after[path] = rewrite_imports(
+                    after[path],
+                    package=importer_package(path),
+                    src_module=module_name(mover.src),
+                    dst_module=target,
+                    names=mover.mv,
+                    own_module=module_name(path),
+                )
+        for mover in movers:
+            src = mover.src
+            if used := sorted(reference_graph(checks[src])[MODULE], key=mover.mv.index):
+                module, level = relative_module(target, package_parts(src))
+                after[src] = add_imports(after[src], [import_line(module, level, used)])
+        emptied = [src for src in sources if src in after and is_empty(after[src])]
+        removing = emptied if self.remove_empty else []
+        if (rewrites := self.importer_rewrites(movers)) is None:
+            return []
+        for rewrite in rewrites:
+            path = Path(rewrite["file"])
+            before[path], after[path] = rewrite["before"], rewrite["after"]
+        changed = {path: text for path, text in after.items() if path not in removing}
+        for cycle in new_cycles(changed, jobs=self.jobs):
+            msg = f"import cycle: {' -> '.join(cycle)}"
+            if self.dry_run or self.allow_cycles:
+                verb = "would create" if self.dry_run else "creates"
+                self.err(f"Warning: this {verb} an {msg}")
+            else:
+                self.fail(f"Refusing to create an {msg} (see --allow-cycles)")
+                return []
+        if self.dry_run:
+            for path, text in after.items():
+                a = before[path].splitlines(True)
+                b = [] if path in removing else text.splitlines(True)
+                print(get_unidiff_text(a=a, b=b, filename=os.path.relpath(path)))
+            return []
+        recover()
+        with Transaction(backups=BackupStore()) as txn:
+            txn.stage_all([(p, changed[p], before[p]) for p in changed], jobs=self.jobs)
+            for path in removing:
+                txn.delete(path, before=before[path])
+        if emptied and not removing:
+            self.log(f"Left empty (see --remove-empty): {emptied}")
+        forget_made_packages(txn.touched)
+        self.logger.info(f"Touched {len(txn.touched)} file(s): {txn.touched}")
+        return txn.touched
+
+    def check_conflicts(self, moving: dict, into: Checker | None) -> list[Path] | None:
+        """
+        Refuse the merge if two of the sources define the same name, or one defines a
+        name already bound at the top level of the destination (returning `[]`).
+        """
+        from ..core.check import symbol_name
+        from ..core.placement import bound_names
+
+        defined_by: dict[str, list[str]] = {}
+        if into is not None:
+            for node in into.root.body:
+                for name in bound_names(node):
+                    defined_by.setdefault(name, [str(self.into)])
+        for path, nodes in moving.items():
+            for name in map(symbol_name, nodes):
+                defined_by.setdefault(name, []).append(str(path))
+        conflicts = {name: fs for name, fs in defined_by.items() if len(fs) > 1}
+        if conflicts:
+            listed = "; ".join(f"{n} ({', '.join(fs)})" for n, fs in conflicts.items())
+            self.fail(f"Can't merge names defined more than once: {listed}")
+            return []
+        return None
+
+    def importer_rewrites(self, movers: list) -> list[dict] | None:
+        """
+        With `update_importers`, the rewritten text of each other module in the project
+        which imports any of the names merged from the sources, to import them from
+        the destination instead (see `MvDef.importer_rewrites`), or `None` if any of
+        them couldn't be rewritten.
+        """
+        from ..core.importers import (
+            find_importers,
+            module_name,
+            project_root,
+            rewrite_importer,
+        )
+        from ..core.listing import list_files
+
+        if not self.update_importers:
+            return []
+        target = module_name(self.into)
+        moves = {module_name(mover.src): {target: mover.mv} for mover in movers}
+        paths = find_importers(
+            {module: names[target] for module, names in moves.items()},
+            root=project_root(self.into),
+            exclude=[*(mover.src for mover in movers), self.into],
+            jobs=self.jobs,
+        )
+        records = list(
+            list_files(
+                paths,
+                jobs=self.jobs,
+                ordered=True,
+                lister=rewrite_importer,
+                moves=moves,
+            ),
+        )
+        if failed := [r for r in records if "error" in r]:
+            listed = "; ".join(f"{r['file']}: {r['error']}" for r in failed)
+            self.fail(f"Not merging, as importers can't be rewritten: {listed}")
+            return None
+        rewrites = [r for r in records if r["after"] != r["before"]]
+        self.log(f"Rewrote imports in {len(rewrites)} of {len(paths)} importer(s)")
+        return rewrites
+
+    def log(self, msg):
+        self.logger.info(msg)
+
+
+def is_empty(text: str) -> bool:
+    """Whether a module has no code left (beyond perhaps its docstring)."""
+    import ast
+
+    body = ast.parse(text).body
+    return not body or (len(body) == 1 and isinstance(body[0], ast.Expr))
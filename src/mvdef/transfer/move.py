@@ -1,10 +1,14 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
+from typing import Literal
 
-from ..core.diff import Differ
-from ..core.parse import parse, parse_file
 from ..error_handling.exceptions import CheckFailure
-from .base import MvDefBase
+from .base import MvDefBase, forget_made_packages
+
+# Note: the `core` modules are imported where used, so that `mvdef -h` (which only
+# needs this dataclass) doesn't have to import pyflakes, difflib, etc.
 
 __all__ = ["MvDef"]
 
@@ -14,13 +18,20 @@ class MvDef(MvDefBase):
     """
     Move function definitions from one file to another, moving/copying
     any necessary associated import statements along with them.
+    Either file can be - to read it from stdin and write its result to stdout.
 
     Option     Description                                Type        Default
     —————————— —————————————————————————————————————————— ——————————— ———————
     • src        source file to take definitions from       Path        -
     • dst        destination file (may not exist)           Path        -
-    • mv         names to move from the source file         list[str]   -
+    • mv         names to move (or name:path to route one)  list[str]   -
     • dry_run    whether to only preview the change diffs   bool        False
+    • with_deps  whether to also move the helpers they use  bool        False
+    • update_importers whether to fix other files' imports  bool        False
+    • retain     whether src imports the names moved back   bool        False
+    • import_style style of those imports (., a or p)       str         .
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • allow_cycles whether to allow new import cycles       bool        False
     • escalate   whether to raise an error upon failure     bool        False
     • cls_defs   whether to use only class definitions      bool        False
     • func_defs  whether to use only function definitions   bool        False
@@ -31,61 +42,199 @@ class MvDef(MvDefBase):
     dst: Path
     mv: list[str]
     dry_run: bool = False
+    with_deps: bool = False
+    update_importers: bool = False
+    retain: bool = False
+    import_style: Literal[".", "a", "p"] = "."
+    jobs: int = 1
+    allow_cycles: bool = False
     escalate: bool = False
     cls_defs: bool = False
     func_defs: bool = False
     verbose: bool = False
     _copy_mode: bool = False
+    touched: list[Path] = field(default_factory=list, init=False, repr=False)
 
     diff_kw = ["mv"]
 
-    @property
-    def dst_diff_kwargs(self) -> dict:
-        return {**self.src_diff_kwargs, "dst": self.dst, "dest_ref": self.dst_check}
+    def dst_diff_kwargs(self, dst: Path) -> dict:
+        return {
+            **self.src_diff_kwargs,
+            "mv": self.routes[dst],
+            "dst": dst,
+            "dest_ref": self.dst_checks[dst],
+        }
 
     def __post_init__(self):
+        from ..core.diff import Differ
+
         super().__post_init__()
         self.src_diff = Differ(self.src, **self.src_diff_kwargs)
-        self.dst_diff = Differ(self.src, **self.dst_diff_kwargs)
+        self.dst_diffs = {
+            dst: Differ(self.src, **self.dst_diff_kwargs(dst))
+            for dst in self.dst_checks
+        }
+        self.dst_diff = self.dst_diffs.get(self.dst)
+        if self.retain and self.check_blocker is None:
+            from ..core.importers import retained_imports
+
+            routes, style = self.routes, self.import_style
+            self.src_diff.agenda.retained = retained_imports(self.src, routes, style)
 
     def check(self) -> CheckFailure | None:
+        from ..core.importers import IMPORT_STYLES
+        from ..core.parse import STDIN, parse_file
+
         kwargs = {
             k: getattr(self, k)
             for k in ["escalate", "verbose", "cls_defs", "func_defs"]
         }
+        self.src_check = self.dst_check = None
+        self.dst_checks = {}
+        if self.src == self.dst == STDIN:
+            return self.fail("Only one of src and dst can be read from stdin ('-')")
+        if self.update_importers and (self._copy_mode or STDIN in (self.src, self.dst)):
+            return self.fail("Only moves between files can update importers")
+        if self.retain and (self._copy_mode or STDIN in (self.src, self.dst)):
+            return self.fail("Only moves between files can retain imports")
+        if self.import_style not in IMPORT_STYLES:
+            styles = ", ".join(IMPORT_STYLES)
+            return self.fail(f"Unknown import style {self.import_style!r} ({styles})")
+        if (failure := self.route()) is not None:
+            return failure
         try:
-            self.src_check = parse_file(self.src, ensure_exists=True, **kwargs)
+            self.src_check = parse_file(
+                self.src,
+                ensure_exists=True,
+                cache=self.parse_cache,
+                **kwargs,
+            )
         except Exception as exc:
-            self.src_check = None
             return self.fail("Failed to parse the src file", exc_info=exc)
         else:
             if self.src_check is None:
-                self.dst_check = None
                 return self.fail("Failed to parse the src file")
-        if absent := (set(self.mv) - {f.name for f in self.src_check.target_defs}):
+        symbols = self.src_check.symbols
+        if absent := {name for name in self.mv if not symbols.resolve(name)}:
             msg = f"Definition{'s'[: len(absent) - 1]} not in {self.src}: {absent}"
-            self.dst_check = None
             return self.src_check.fail(msg)
-        elif self.dst.exists():
+        within = [p for p in self.mv if any(p.startswith(f"{n}.") for n in self.mv)]
+        if within:
+            msg = f"Can't move {within} along with the definitions they are in"
+            return self.src_check.fail(msg)
+        if self.with_deps:
+            self.add_deps()
+        for dst in self.routes:
+            if (failure := self.check_dst(dst, **kwargs)) is not None:
+                self.dst_checks.clear()
+                return failure
+        self.dst_check = self.dst_checks.get(self.dst)
+        return None
+
+    def route(self) -> CheckFailure | None:
+        """
+        Split off the destination of each name in `mv` given as `name:dst` (the rest
+        go to `dst`) into `routes`, the names going to each destination (in order),
+        leaving just the names in `mv`. Only a copy can send a name to several.
+        """
+        from ..core.parse import STDIN
+
+        routes: dict[Path, list[str]] = {}
+        for item in self.mv:
+            name, _, path = item.partition(":")
+            routed = routes.setdefault(Path(path) if path else self.dst, [])
+            if name not in routed:
+                routed.append(name)
+        names = [name for routed in routes.values() for name in routed]
+        if len(routes) > 1 and STDIN in (self.src, *routes):
+            return self.fail("Only moves between files can go to several destinations")
+        if self.src in routes:
+            return self.fail(f"Can't move definitions from {self.src} into itself")
+        twice = sorted({name for name in names if names.count(name) > 1})
+        if twice and not self._copy_mode:
+            return self.fail(f"Can't send {twice} to more than one destination")
+        self.routes = routes
+        self.mv = list(dict.fromkeys(names))
+        return None
+
+    def check_dst(self, dst: Path, **kwargs) -> CheckFailure | None:
+        """Parse a destination (as if empty if it doesn't exist) into `dst_checks`."""
+        from ..core.parse import STDIN, parse, parse_file
+
+        if dst == STDIN or dst.exists():
             try:
-                self.dst_check = parse_file(self.dst, **kwargs)
+                check = parse_file(dst, cache=self.parse_cache, **kwargs)
             except Exception as exc:
-                self.dst_check = None
                 return self.fail("Failed to parse the dst file", exc_info=exc)
             else:
-                if self.dst_check is None:
+                if check is None:
                     return self.fail("Failed to parse the dst file")
         else:
             try:
-                self.dst_check = parse("", file=self.dst, **kwargs)
+                check = parse("", file=dst, **kwargs)
             except Exception as exc:
-                self.dst_check = None
                 return self.fail(
                     "Failed to parse the dst file (which was mocked)",
                     exc_info=exc,
                 )
+        self.dst_checks[dst] = check
         return None
 
+    def add_deps(self) -> None:
+        """
+        Add the helpers that the definitions use (transitively) to those to move, as
+        long as the code that stays in src doesn't use them (if copying, all of them).
+        """
+        from ..core.deps import dependency_closure
+
+        closure = dependency_closure(
+            self.src_check,
+            self.mv,
+            keep_used=not self._copy_mode,
+        )
+        if closure.left:
+            left = ", ".join(closure.left)
+            msg = f"the moved code uses {left}, which must stay in {self.src}"
+            self.err(f"Warning: {msg} (as still used there)")
+        if deps := [name for name in closure.names if name not in self.mv]:
+            self.log(f"Also moving {len(deps)} helper(s): {deps}")
+            self.route_deps(deps)
+        order = {name: i for i, name in enumerate(closure.names)}
+        for names in self.routes.values():
+            names.sort(key=order.__getitem__)
+        self.mv = closure.names
+
+    def route_deps(self, deps: list[str]) -> None:
+        """
+        Route each helper to the first destination (in `routes` order) whose
+        definitions use it, warning if those going elsewhere use it too (if copying,
+        route it to all of them).
+        """
+        from ..core.deps import dependency_closure
+
+        if len(self.routes) == 1:
+            (routed,) = self.routes.values()
+            routed.extend(deps)
+            return
+        uses = {
+            name: dependency_closure(self.src_check, [name], keep_used=False).names
+            for name in self.mv
+        }
+        for dep in deps:
+            dsts = [
+                dst
+                for dst, names in self.routes.items()
+                if any(dep in uses.get(name, []) for name in names)
+            ]
+            if self._copy_mode:
+                for dst in dsts:
+                    self.routes[dst].append(dep)
+                continue
+            if len(dsts) > 1:
+                going_to = ", ".join(map(str, dsts))
+                self.err(f"Warning: {dep} is used by the code going to {going_to}")
+            self.routes[dsts[0]].append(dep)
+
     def diffs(self, print_out: bool = False) -> tuple[str, str]:
         """
         Calls `Agenda.populate_agenda()` implicitly by `Agenda.unidiff()` and returns 2
@@ -98,15 +247,155 @@ class MvDef(MvDefBase):
             src_unidiff = ""
         else:
             src_unidiff = self.src_diff.unidiff()
-        dst_unidiff = self.dst_diff.unidiff()
+        dst_unidiffs = {dst: diff.unidiff() for dst, diff in self.dst_diffs.items()}
+        dst_unidiff = dst_unidiffs.get(self.dst, "")
+        self.check_importers()
+        self.check_cycles()
         if print_out:
-            for diff in filter(None, [src_unidiff, dst_unidiff]):
+            diffs = [src_unidiff, *dst_unidiffs.values(), *self.importer_diffs]
+            for diff in filter(None, diffs):
                 print(diff)
         return dst_unidiff if self._copy_mode else src_unidiff, dst_unidiff
 
-    def move(self) -> None:
-        """Execute diffs"""
+    def check_cycles(self) -> CheckFailure | None:
+        """
+        Check the imports that the change would add against the project's import
+        graph, failing if they would create an import cycle (or if `allow_cycles`, or
+        only previewing the change, just reporting it).
+        """
+        from ..core.cycles import new_cycles
+        from ..core.parse import STDIN
+
+        if STDIN in (self.src, self.dst):
+            return None
+        changed = {dst: diff.simulate() for dst, diff in self.dst_diffs.items()}
+        if not self._copy_mode:
+            changed[self.src] = self.src_diff.simulate()
+        for rewrite in self.importer_rewrites:
+            changed[Path(rewrite["file"])] = rewrite["after"]
+        for cycle in new_cycles(changed, jobs=self.jobs):
+            msg = f"import cycle: {' -> '.join(cycle)}"
+            if self.dry_run or self.allow_cycles:
+                verb = "would create" if self.dry_run else "creates"
+                self.err(f"Warning: this {verb} an {msg}")
+            else:
+                return self.fail(f"Refusing to create an {msg} (see --allow-cycles)")
+        return None
+
+    @cached_property
+    def importer_records(self) -> list[dict]:
+        """
+        With `update_importers`, the rewritten text of each other module in the project
+        which imports any of the `mv` names from src, to import them from where they go
+        instead (see `rewrite_importer`), or the error met rewriting it. The modules are
+        found via the symbol index (updated first), and rewritten in a pool of `jobs`
+        processes.
+        """
+        from ..core.importers import (
+            find_importers,
+            module_name,
+            project_root,
+            rewrite_importer,
+        )
+        from ..core.listing import list_files
+
+        if not self.update_importers:
+            return []
+        src_module = module_name(self.src)
+        routes = {module_name(dst): names for dst, names in self.routes.items()}
+        paths = find_importers(
+            {src_module: self.mv},
+            root=project_root(self.src),
+            exclude=[self.src, *self.routes],
+            jobs=self.jobs,
+        )
+        records = list(
+            list_files(
+                paths,
+                jobs=self.jobs,
+                ordered=True,
+                lister=rewrite_importer,
+                moves={src_module: routes},
+            ),
+        )
+        changed = len(self.importer_rewrites_of(records))
+        self.log(f"Rewrote imports in {changed} of {len(paths)} importer(s)")
+        return records
+
+    @staticmethod
+    def importer_rewrites_of(records: list[dict]) -> list[dict]:
+        return [r for r in records if "error" not in r and r["after"] != r["before"]]
+
+    @property
+    def importer_rewrites(self) -> list[dict]:
+        """The `importer_records` of the importers whose text changes."""
+        return self.importer_rewrites_of(self.importer_records)
+
+    def check_importers(self) -> CheckFailure | None:
+        """Fail if any of the importers to update couldn't be rewritten."""
+        if failed := [r for r in self.importer_records if "error" in r]:
+            listed = "; ".join(f"{r['file']}: {r['error']}" for r in failed)
+            return self.fail(f"Not moving, as importers can't be rewritten: {listed}")
+        return None
+
+    @property
+    def importer_diffs(self) -> list[str]:
+        import os
+
+        from ..core.text_diff import get_unidiff_text
+
+        return [
+            get_unidiff_text(
+                a=record["before"].splitlines(keepends=True),
+                b=record["after"].splitlines(keepends=True),
+                filename=os.path.relpath(record["file"]),
+            )
+            for record in self.importer_rewrites
+        ]
+
+    def move(self) -> list[Path]:
+        """
+        Execute diffs, committing src and dst in a single transaction (after first
+        recovering any transaction left incomplete by a previous run). Files whose
+        contents would not change are not rewritten. Returns the files rewritten.
+
+        The files' prior contents are kept in the backup store, so `mvdef undo` can
+        restore them.
+
+        If src or dst was read from stdin, its new text is written to stdout instead
+        (once the other file is committed), so it can be used as an editor filter.
+
+        The new texts are all computed before any is staged, then the staged files are
+        written in a pool of `jobs` threads.
+
+        With `update_importers`, the modules importing the moved names are rewritten in
+        the same transaction. Nothing is written if any of them can't be rewritten, or
+        if it would create an import cycle (unless `allow_cycles`).
+        """
+        from ..core.backup import BackupStore
+        from ..core.parse import STDIN
+        from ..core.transaction import Transaction, recover
+
         if not self.dry_run:
-            if not self._copy_mode:
-                self.src_diff.execute()
-            self.dst_diff.execute()
+            if self.check_importers() is not None or self.check_cycles() is not None:
+                return self.touched
+            recover()
+            filtered = None
+            changes = []
+            for diff in [self.src_diff, *self.dst_diffs.values()]:
+                if diff.target_file == STDIN:
+                    keep = diff.is_src and self._copy_mode
+                    filtered = diff.old_code if keep else diff.simulate()
+                elif not (diff.is_src and self._copy_mode):
+                    changes.append((diff.target_file, diff.simulate(), diff.old_code))
+            for rewrite in self.importer_rewrites:
+                target, after = Path(rewrite["file"]), rewrite["after"]
+                changes.append((target, after, rewrite["before"]))
+            with Transaction(backups=BackupStore()) as txn:
+                txn.stage_all(changes, jobs=self.jobs)
+            if filtered is not None:
+                sys.stdout.write(filtered)
+            self.touched = txn.touched
+            forget_made_packages(self.touched)
+            self.log(f"Touched {len(self.touched)} file(s): {self.touched}")
+        return self.touched
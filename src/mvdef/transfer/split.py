@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..error_handling.failure import FailableMixIn
+from ..log_utils import set_up_logging
+
+if TYPE_CHECKING:
+    from ..core.parse_cache import ParseCache
+
+# Note: the `core` modules are imported where used (see `move.py`)
+
+__all__ = ["Split"]
+
+
+@dataclass
+class Split(FailableMixIn):
+    """
+    Split a module's top-level definitions out into new modules beside it, grouped so
+    that few references (and third-party imports) cross between them: into a number
+    of modules, by the first word of their names, or around each class. Each module
+    gets the imports its code uses, and imports what it uses from the others.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • src        module to split                            Path        -
+    • into       number of modules to split it into         int         0
+    • by_prefix  whether to group by their names' prefix    bool        False
+    • by_class   whether to split out each class            bool        False
+    • dry_run    whether to only preview the change diffs   bool        False
+    • update_importers whether to fix other files' imports  bool        False
+    • jobs       worker processes (0 for one per CPU)       int         1
+    • allow_cycles whether to allow new import cycles       bool        False
+    • escalate   whether to raise an error upon failure     bool        False
+    • verbose    whether to log anything                    bool        False
+    """
+
+    src: Path
+    into: int = 0
+    by_prefix: bool = False
+    by_class: bool = False
+    dry_run: bool = False
+    update_importers: bool = False
+    jobs: int = 1
+    allow_cycles: bool = False
+    escalate: bool = False
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+
+    def run(self) -> list[Path]:
+        """
+        Plan the split (see `plan_split`), then route each definition to its module
+        as `mvdef` would (each file parsed once), add the imports between the modules
+        and print the diffs if `dry_run`, else write them all in one transaction (as
+        one operation for `mvdef undo`). Returns the files written.
+        """
+        from .base import shared_parses
+
+        if [bool(self.into), self.by_prefix, self.by_class].count(True) != 1:
+            self.fail("Pass one of --into N, --by-prefix or --by-class")
+            return []
+        with shared_parses() as cache:  # The move reuses the parse planned from
+            return self.split(cache=cache)
+
+    def split(self, cache: ParseCache) -> list[Path]:
+        """Run the split, parsing each file (once) via the `cache`."""
+        from ..core.backup import BackupStore
+        from ..core.cycles import new_cycles
+        from ..core.importers import (
+            add_imports,
+            import_line,
+            module_name,
+            package_parts,
+            relative_module,
+        )
+        from ..core.parse import STDIN, parse_file
+        from ..core.split import STAY, plan_split
+        from ..core.text_diff import get_unidiff_text
+        from ..core.transaction import Transaction, recover
+        from .base import forget_made_packages
+        from .move import MvDef
+
+        if self.src == STDIN:
+            self.fail("Can't split a module read from stdin")
+            return []
+        try:
+            check = parse_file(self.src, ensure_exists=True, cache=cache)
+        except Exception as exc:
+            self.fail("Failed to parse the src file", exc_info=exc)
+            return []
+        if check is None:
+            self.fail("Failed to parse the src file")
+            return []
+        by = "prefix" if self.by_prefix else "class" if self.by_class else None
+        plan = plan_split(check, into=self.into, by=by)
+        for cycle in plan.merged:
+            stems = [f"{self.src.stem}_{k}" if k else self.src.stem for k in cycle]
+            msg = f"merged {', '.join(stems)}, as they would import each other"
+            self.err(f"Warning: {msg}")
+        paths = {
+            key: self.src.with_name(f"{self.src.stem}_{key}.py")
+            for key in plan.groups
+            if key != STAY
+        }
+        if not paths:
+            self.fail(f"Nothing to split out of {self.src}")
+            return []
+        if existing := [str(path) for path in paths.values() if path.exists()]:
+            self.fail(f"Won't split into existing files: {existing}")
+            return []
+        self.logger.info(
+            f"Splitting {len(paths)} module(s) out of {self.src}, with {plan.cut} "
+            f"reference(s) between them and {plan.spread} repeated import(s)",
+        )
+        routed = [(name, paths[k]) for k in paths for name in plan.groups[k]]
+        mover = MvDef(
+            self.src,
+            dst=next(iter(paths.values())),
+            mv=[f"{name}:{path}" for name, path in routed],
+            update_importers=self.update_importers,
+            jobs=self.jobs,
+            escalate=self.escalate,
+            verbose=self.verbose,
+        )
+        if mover.check_blocker is not None:
+            return []
+        before = {self.src: check.code, **{path: "" for path in paths.values()}}
+        after = {self.src: mover.src_diff.simulate()}
+        after.update({dst: diff.simulate() for dst, diff in mover.dst_diffs.items()})
+        modules = {key: module_name(path) for key, path in paths.items()}
+        modules[STAY] = module_name(self.src)
+        for key, imported in plan.imports.items():
+            path = paths.get(key, self.src)
+            package = package_parts(path)
+            lines = [
+                import_line(*relative_module(modules[k], package), names)
+                for k, names in imported.items()
+            ]
+            after[path] = add_imports(after[path], lines)
+        for rewrite in mover.importer_rewrites:
+            path = Path(rewrite["file"])
+            before[path], after[path] = rewrite["before"], rewrite["after"]
+        for cycle in new_cycles(after, jobs=self.jobs):
+            msg = f"import cycle: {' -> '.join(cycle)}"
+            if self.dry_run or self.allow_cycles:
+                verb = "would create" if self.dry_run else "creates"
+                self.err(f"Warning: this {verb} an {msg}")
+            else:
+                self.fail(f"Refusing to create an {msg} (see --allow-cycles)")
+                return []
+        if self.dry_run:
+            for path, text in after.items():
+                a, b = before[path].splitlines(True), text.splitlines(True)
+                print(get_unidiff_text(a=a, b=b, filename=os.path.relpath(path)))
+            return []
+        recover()
+        changes = [(path, text, before[path]) for path, text in after.items()]
+        with Transaction(backups=BackupStore()) as txn:
+            txn.stage_all(changes, jobs=self.jobs)
+        forget_made_packages(txn.touched)
+        self.logger.info(f"Touched {len(txn.touched)} file(s): {txn.touched}")
+        return txn.touched
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from ..core.backup import BackupStore
+from ..core.transaction import Transaction, recover
+from ..error_handling.exceptions import WriteConflict
+from ..error_handling.failure import FailableMixIn
+from ..log_utils import set_up_logging
+from .base import forget_made_packages
+
+__all__ = ["Undo"]
+
+
+@dataclass
+class Undo(FailableMixIn):
+    """
+    Undo the most recent moves/copies, restoring the files they changed.
+
+    Option     Description                                Type        Default
+    —————————— —————————————————————————————————————————— ——————————— ———————
+    • n          number of operations to undo               int         1
+    • dry_run    whether to only list what would be undone  bool        False
+    • escalate   whether to raise an error upon failure     bool        False
+    • verbose    whether to log anything                    bool        False
+    """
+
+    n: int = 1
+    dry_run: bool = False
+    escalate: bool = False
+    verbose: bool = False
+
+    def __post_init__(self):
+        self.logger = set_up_logging(__name__, verbose=self.verbose)
+        self.store = BackupStore()
+
+    def run(self) -> list[Path]:
+        """
+        Restore the files changed by the last `n` operations (most recent first) in a
+        single transaction, then forget those operations. Returns the files restored.
+        """
+        recover()
+        try:
+            plan = self.store.restore_plan(self.n)
+        except WriteConflict as exc:
+            self.fail(f"Cannot undo: {exc}", exc_info=exc)
+            return []
+        if self.dry_run:
+            for _, op in plan:
+                when = datetime.fromtimestamp(op.time).isoformat(" ", "seconds")
+                print(f"{op.id[:12]}  {when}  {', '.join(map(str, op.paths))}")
+            return []
+        with Transaction() as txn:
+            for _, op in plan:
+                for change in op.changes:
+                    path = Path(change.path)
+                    current = path.read_text() if path.exists() else None
+                    if change.before is None:
+                        txn.delete(path, before=current)
+                    else:
+                        restored = self.store.load(change.before)
+                        txn.stage(path, restored, before=current)
+        forget_made_packages(txn.touched)
+        for op_path, _ in plan:
+            self.store.forget(op_path)
+        self.logger.info(f"Restored {len(txn.touched)} file(s): {txn.touched}")
+        return txn.touched
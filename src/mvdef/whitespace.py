@@ -84,8 +84,8 @@ def normalise_whitespace(lines: list[str | None], spacing: int = 2) -> str:
             elif nl_deficit < 0:
                 # Squeeze as many newlines as needed by replacing with (scalar) None
                 easing_idxs = island_nl_idx[:-nl_deficit]
-                for nl_idx in easing_idxs:
-                    pruned_lines[nl_idx] = None
+                for easing_idx in easing_idxs:
+                    pruned_lines[easing_idx] = None
         prev_text_idx = next_text_idx
     result = [
         ln
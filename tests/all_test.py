@@ -2,7 +2,7 @@
 Tests for the diffs created in 'dry run' mode by :meth:`Agenda.simulate()`.
 """
 
-from pytest import mark, raises
+from pytest import mark
 
 from .helpers.cli_util import get_manif
 from .helpers.io import Write
@@ -55,23 +55,22 @@ def test_ls_all(
     expected = all_names_in_order if all_defs else (cls_ls if cls_defs else def_ls)
     src_p, *_ = Write.from_enums(src, path=tmp_path).file_paths
     ls_kwargs = dict(cls_defs=cls_defs, func_defs=func_defs, dry_run=dry_run, list=lst)
-    if lst or dry_run:
-        manif = get_manif(src_p, match=["*"], **ls_kwargs)
-    else:
-        with raises(NotImplementedError):
-            manif = get_manif(src_p, match=["*"], **ls_kwargs)
-        return
+    # Simple version of the `format_all()` function, for short one-liners only
+    all_pre = "__all__ = ["
+    all_mid = ", ".join([f'"{name}"' for name in expected])
+    all_together = all_pre + all_mid + "]"
+    if len(all_together) > (88):
+        all_pre += "\n"
+        all_mid = ",\n".join([f'    "{name}"' for name in expected])
+        all_together = all_pre + all_mid + ",\n]"
+    expected_all = all_together
+    manif = get_manif(src_p, match=["*"], **ls_kwargs)
     if lst:
         assert manif.splitlines() == expected
     elif dry_run:
-        # Simple version of the `format_all()` function, for short one-liners only
-        manif = get_manif(src_p, match=["*"], **ls_kwargs)
-        all_pre = "__all__ = ["
-        all_mid = ", ".join([f'"{name}"' for name in expected])
-        all_together = all_pre + all_mid + "]"
-        if len(all_together) > (88):
-            all_pre += "\n"
-            all_mid = ",\n".join([f'    "{name}"' for name in expected])
-            all_together = all_pre + all_mid + ",\n]"
-        expected_all = all_together
         assert manif == expected_all
+    else:
+        # Fixes `__all__` in the file (idempotently)
+        assert src_p.read_text() == manif
+        assert f"{expected_all}\n" in manif
+        assert get_manif(src_p, match=["*"], **ls_kwargs) == manif
@@ -0,0 +1,104 @@
+"""
+Tests for moving module-level assignments (constants, type aliases, etc.) like defs.
+"""
+
+from mvdef.cli import cli
+from mvdef.core.check import symbol_name
+from mvdef.core.parse import parse
+
+__all__ = [
+    "test_constant_spacing",
+    "test_movable_defs",
+    "test_move_constants",
+    "test_with_deps_constants",
+]
+
+CODE = """\
+import re
+from typing import TypeVar
+
+__all__ = ["f"]
+
+T = TypeVar("T")
+PATTERN = re.compile(r"[a-z]+")
+LIMIT: int = 10
+Unset: int
+a = b = 1
+x, y = 2, 3
+counter = 0
+counter = 1
+
+
+def f(text: T) -> T:
+    return PATTERN.match(text)
+
+
+f = staticmethod(f)
+
+if LIMIT:
+    NESTED = 1
+"""
+
+
+def test_movable_defs():
+    """
+    Test that only the assignments to one name which is bound just once (and isn't
+    special, nor a def's) at the top level of the module can be moved, after defs.
+    """
+    check = parse(CODE)
+    assert [symbol_name(node) for node in check.movable_defs] == [
+        "f",
+        "T",
+        "PATTERN",
+        "LIMIT",
+    ]
+    funcs_only = parse(CODE, func_defs=True)
+    assert funcs_only.movable_defs == funcs_only.funcdefs
+
+
+def test_move_constants(tmp_path):
+    """
+    Test that constants are moved along with the imports they use, and placed before
+    the code in dst that uses them (if any, else at the end).
+    """
+    (src := tmp_path / "a.py").write_text(CODE)
+    (dst := tmp_path / "b.py").write_text("MAX = LIMIT * 2\n")
+    argv = [str(src), str(dst), "-m", "PATTERN", "LIMIT"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert dst.read_text() == (
+        "import re\n"
+        "\n"
+        "LIMIT: int = 10\n"
+        "\n"
+        "\n"
+        "MAX = LIMIT * 2\n"
+        "\n"
+        "\n"
+        'PATTERN = re.compile(r"[a-z]+")\n'
+    )
+    assert "PATTERN = " not in src.read_text()
+    assert src.read_text().startswith("from typing import TypeVar\n")
+
+
+def test_with_deps_constants(tmp_path):
+    """Test that `--with-deps` moves the constants only the targets use."""
+    (src := tmp_path / "a.py").write_text(
+        "BASE = 2\nSCALE = BASE * 10\nLEFT = BASE\n\n\ndef f():\n    return SCALE\n",
+    )
+    dst = tmp_path / "b.py"
+    cli(MvCls="MvDef", defopt_argv=[str(src), str(dst), "-m", "f", "-w"])
+    assert src.read_text() == "BASE = 2\nLEFT = BASE\n"
+    moved = parse(dst.read_text())
+    assert [symbol_name(node) for node in moved.movable_defs] == ["f", "SCALE"]
+
+
+def test_constant_spacing(tmp_path):
+    """
+    Test that moving a constant set apart by blank lines leaves the standard two
+    between what was around it, as moving a def does.
+    """
+    (src := tmp_path / "a.py").write_text(
+        "import os\n\nX = 1\n\n\nclass Outer:\n    sep = os.sep\n",
+    )
+    cli(MvCls="MvDef", defopt_argv=[str(src), str(tmp_path / "b.py"), "-m", "X"])
+    assert src.read_text() == "import os\n\n\nclass Outer:\n    sep = os.sep\n"
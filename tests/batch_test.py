@@ -0,0 +1,174 @@
+"""
+Tests for running a plan of moves/copies with `mvdef batch`.
+"""
+
+from pytest import mark, raises
+
+from mvdef.cli import cli_subcommand
+from mvdef.core.backup import BackupStore
+from mvdef.core.batch import BatchOp, file_groups, load_plan, schedule
+from mvdef.error_handling.exceptions import PlanFailure
+
+from .helpers.cli_util import run_cmd
+from .helpers.io import Write
+
+__all__ = [
+    "test_batch_dry_run",
+    "test_batch_matches_sequential",
+    "test_batch_missing_name",
+    "test_batch_order",
+    "test_batch_parallel",
+    "test_batch_parallel_failure",
+    "test_file_groups",
+]
+
+
+def write_plan(path, *ops: str) -> None:
+    path.write_text("".join(f"[[ops]]\n{op}\n" for op in ops))
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_batch_matches_sequential(tmp_path, src, dst):
+    """
+    Test that a plan gives the same files as running its moves one at a time, merging
+    ops on the same files into one and committing both files as one operation.
+    """
+    seq_dir, batch_dir = tmp_path / "seq", tmp_path / "batch"
+    seq_dir.mkdir()
+    batch_dir.mkdir()
+    seq_src, seq_dst = Write.from_enums(src, dst, path=seq_dir).file_paths
+    run_cmd(seq_src, seq_dst, mv=["foo"])
+    run_cmd(seq_src, seq_dst, mv=["A"])
+    src_p, dst_p = Write.from_enums(src, dst, path=batch_dir).file_paths
+    plan_p = tmp_path / "plan.toml"
+    op_spec = 'src = "batch/fooA.py"\ndst = "batch/bar.py"\nmv = ["{}"]'
+    write_plan(plan_p, op_spec.format("foo"), op_spec.format("A"))
+    assert [op.mv for op in schedule(load_plan(plan_p))] == [["foo", "A"]]
+    result = cli_subcommand("batch", defopt_argv=[str(plan_p)], return_state=True)
+    assert result.touched == [src_p, dst_p]
+    assert src_p.read_text() == seq_src.read_text()
+    assert dst_p.read_text() == seq_dst.read_text()
+    (_, op), *_ = BackupStore().history()
+    assert op.paths == [src_p, dst_p]
+
+
+def test_batch_order(tmp_path):
+    """
+    Test that an op moving on a name brought in by a later op in the plan runs after
+    it (as do the ops which must follow that op), and that ops on the same files
+    otherwise keep their plan order.
+    """
+    a, b, c = (tmp_path / f"{name}.py" for name in "abc")
+    ops = [
+        BatchOp(src=b, dst=c, mv=["foo"]),
+        BatchOp(src=a, dst=b, mv=["foo"]),
+        BatchOp(src=a, dst=c, mv=["bar"]),
+    ]
+    assert schedule(ops) == [ops[1], ops[0], ops[2]]
+    d = tmp_path / "d.py"
+    ops = [
+        BatchOp(src=b, dst=c, mv=["foo"]),
+        BatchOp(src=b, dst=d, mv=["bar"]),
+        BatchOp(src=a, dst=b, mv=["foo"]),
+    ]
+    assert schedule(ops) == [ops[2], ops[0], ops[1]]
+    a.write_text("def foo():\n    pass\n\n\ndef bar():\n    pass\n")
+    plan_p = tmp_path / "plan.toml"
+    write_plan(
+        plan_p,
+        'src = "b.py"\ndst = "c.py"\nmv = "foo"',
+        'src = "a.py"\ndst = "b.py"\nmv = "foo"',
+    )
+    cli_subcommand("batch", defopt_argv=[str(plan_p)])
+    assert a.read_text() == "def bar():\n    pass\n"
+    assert b.read_text().strip() == ""
+    assert c.read_text() == "def foo():\n    pass\n"
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_batch_dry_run(tmp_path, capsys, src, dst):
+    """
+    Test that a dry run prints the diff of each file, and changes nothing.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path, len_check=False).file_paths
+    plan_p = tmp_path / "plan.toml"
+    write_plan(plan_p, 'src = "fooA.py"\ndst = "bar.py"\nmv = ["foo"]\ncopy = true')
+    cli_subcommand("batch", defopt_argv=[str(plan_p), "--dry-run"])
+    out = capsys.readouterr().out
+    assert "+++ fixed/bar.py" in out and "fooA.py" not in out
+    assert dst_p.read_text() == dst.value
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_batch_missing_name(tmp_path, src, dst):
+    """
+    Test that a plan fails (writing nothing) if an op names a missing definition.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path, len_check=False).file_paths
+    plan_p = tmp_path / "plan.toml"
+    write_plan(
+        plan_p,
+        'src = "fooA.py"\ndst = "bar.py"\nmv = ["foo"]',
+        'src = "fooA.py"\ndst = "new.py"\nmv = ["nope"]',
+    )
+    with raises(PlanFailure):
+        cli_subcommand("batch", defopt_argv=[str(plan_p), "--escalate"])
+    assert src_p.read_text() == src.value
+    assert not (tmp_path / "new.py").exists()
+
+
+def test_file_groups(tmp_path):
+    """
+    Test that ops sharing a file (even indirectly) are grouped, in order.
+    """
+    a, b, c, d, e = (tmp_path / f"{name}.py" for name in "abcde")
+    ops = [
+        BatchOp(src=a, dst=b, mv=["x"]),
+        BatchOp(src=d, dst=e, mv=["x"]),
+        BatchOp(src=c, dst=b, mv=["y"]),
+        BatchOp(src=c, dst=a, mv=["z"]),
+    ]
+    assert file_groups(ops) == [[ops[0], ops[2], ops[3]], [ops[1]]]
+
+
+def write_pairs(path, n: int) -> list[str]:
+    """Write `n` src/dst pairs of files (the dst not existing), returning plan ops."""
+    path.mkdir()
+    for i in range(n):
+        (path / f"src{i}.py").write_text(f"import os\n\n\ndef f{i}():\n    os.sep\n")
+    op = 'src = "{0}/src{1}.py"\ndst = "{0}/dst{1}.py"\nmv = ["f{1}"]'
+    return [op.format(path.name, i) for i in range(n)]
+
+
+def test_batch_parallel(tmp_path, capsys):
+    """
+    Test that running independent groups in a process pool gives the same files as
+    running them in turn, reporting progress per group and committing them as one.
+    """
+    results = {}
+    for jobs in ["1", "2"]:
+        pairs = write_pairs(tmp_path / jobs, n=4)
+        write_plan(plan_p := tmp_path / f"plan{jobs}.toml", *pairs)
+        argv = [str(plan_p), "--jobs", jobs, "--progress"]
+        cli_subcommand("batch", defopt_argv=argv)
+        results[jobs] = {p.name: p.read_text() for p in (tmp_path / jobs).iterdir()}
+        assert capsys.readouterr().err.count("] Ran 1 op(s)") == 4
+    assert results["1"] == results["2"]
+    assert results["2"]["dst3.py"].startswith("import os\n")
+    assert "def f3" not in results["2"]["src3.py"]
+    assert len(BackupStore().history()) == 2
+
+
+def test_batch_parallel_failure(tmp_path):
+    """
+    Test that if any group fails, no file is changed (and no staged file is left).
+    """
+    ops = write_pairs(tmp_path / "pkg", n=4)
+    ops[2] = ops[2].replace("f2", "nope")
+    plan_p = tmp_path / "plan.toml"
+    write_plan(plan_p, *ops)
+    with raises(PlanFailure):
+        cli_subcommand("batch", defopt_argv=[str(plan_p), "-j", "2", "--escalate"])
+    assert sorted(p.name for p in (tmp_path / "pkg").iterdir()) == [
+        f"src{i}.py" for i in range(4)
+    ]
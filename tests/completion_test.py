@@ -0,0 +1,89 @@
+"""
+Tests for shell completion of definition names (without parsing the `src` file).
+"""
+
+import os
+import sys
+from subprocess import run
+
+from pytest import mark
+
+from mvdef.completion import definition_names, scan_names
+
+__all__ = ["test_complete", "test_name_cache", "test_scan_names"]
+
+SOURCE = '''\
+"""
+def not_a_def(): ...
+"""
+import os
+
+@decorate
+def foo(x):
+    def inner(): ...
+    return x  # def nor_this(): ...
+
+class Foo:
+    def method(self): ...
+
+async def fab():
+    s = """
+class Fake:
+"""
+'''
+
+
+def test_scan_names():
+    """
+    Test that only top-level definitions are found (not those nested in definitions,
+    nor `def` lines in strings or comments).
+    """
+    assert scan_names(SOURCE) == [("def", "foo"), ("class", "Foo"), ("def", "fab")]
+
+
+def test_name_cache(tmp_path):
+    """
+    Test that names are rescanned once the file changes.
+    """
+    src_p = tmp_path / "src.py"
+    src_p.write_text(SOURCE)
+    assert len(definition_names(src_p)) == 3
+    src_p.write_text(SOURCE + "\ndef bar(): ...\n")
+    assert definition_names(src_p)[-1] == ("def", "bar")
+    assert definition_names(tmp_path / "missing.py") == []
+
+
+@mark.parametrize(
+    "entry_point,line,expected",
+    [
+        ("cli_move", "mvdef src.py dst.py -m f", ["foo", "fab"]),
+        ("cli_copy", "cpdef src.py dst.py --cls-defs --mv F", ["Foo"]),
+        ("cli_list", "lsdef src.py -f --match ", ["foo", "fab"]),
+    ],
+)
+def test_complete(tmp_path, entry_point, line, expected):
+    """
+    Test that the entry points complete names (filtered by kind), without importing
+    defopt or pyflakes to do so.
+    """
+    (tmp_path / "src.py").write_text(SOURCE)
+    out_p = tmp_path / "completions"
+    env = {
+        **os.environ,
+        "_ARGCOMPLETE": "1",
+        "_ARGCOMPLETE_STDOUT_FILENAME": str(out_p),
+        "COMP_LINE": line,
+        "COMP_POINT": str(len(line)),
+    }
+    statement = f"from mvdef.cli import {entry_point}; {entry_point}()"
+    proc = run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "defopt" not in proc.stderr and "pyflakes" not in proc.stderr
+    completions = out_p.read_text().rstrip().split("\v")
+    assert [c for c in completions if not c.startswith("-")] == expected
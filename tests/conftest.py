@@ -7,7 +7,25 @@ from pytest import fixture
 from .helpers.def_descriptor import DefDesc
 from .helpers.expected import DstDiffs, SrcDiffs, StoredStdErr, StoredStdOut
 
-__all__ = ["dst", "src", "stored_diffs", "stored_error", "stored_output"]
+__all__ = [
+    "cache_dir",
+    "dst",
+    "src",
+    "stored_diffs",
+    "stored_error",
+    "stored_output",
+]
+
+
+@fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """
+    Keep journals (and any other cached state) out of the user's cache directory, and
+    out of `tmp_path` (where tests check the exact number of files written).
+    """
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("MVDEF_CACHE_DIR", str(path))
+    return path
 
 
 @fixture(scope="function")
@@ -0,0 +1,103 @@
+"""
+Tests for refusing moves that would create an import cycle.
+"""
+
+from pytest import raises
+
+from mvdef.cli import cli
+from mvdef.core.cycles import ImportGraph, new_cycles, runtime_imports
+from mvdef.core.index import SymbolIndex
+from mvdef.core.parse import parse
+from mvdef.error_handling.exceptions import CheckFailure
+
+__all__ = [
+    "test_graph_path",
+    "test_move_cycle",
+    "test_new_cycles",
+    "test_runtime_imports",
+]
+
+
+def write_project(path) -> dict:
+    """Write a package where `a` imports `b`, and `c` imports `a`."""
+    (pkg := path / "pkg").mkdir(parents=True)
+    (path / "pyproject.toml").write_text("")
+    (pkg / "__init__.py").write_text("")
+    files = {name: pkg / f"{name}.py" for name in "abc"}
+    files["a"].write_text("from pkg.b import h\n\n\ndef f():\n    return h()\n")
+    files["b"].write_text("def h():\n    return 1\n")
+    files["c"].write_text("from .a import f\n\n\ndef g():\n    return f()\n")
+    return files
+
+
+def test_runtime_imports():
+    """
+    Test that imports in functions or under `if TYPE_CHECKING:` are not counted as
+    run when the module is imported (but those in classes and other blocks are).
+    """
+    check = parse(
+        "import a\n"
+        "from typing import TYPE_CHECKING\n"
+        "if TYPE_CHECKING:\n"
+        "    import b\n"
+        "else:\n"
+        "    import c\n"
+        "class K:\n"
+        "    import d\n"
+        "def f():\n"
+        "    import e\n"
+        "try:\n"
+        "    import g\n"
+        "except ImportError:\n"
+        "    pass\n",
+    )
+    names = [imp.name for imp in runtime_imports(check)]
+    assert names == ["a", "TYPE_CHECKING", "c", "d", "g"]
+
+
+def test_graph_path():
+    """Test that the shortest chain of imports between two modules is found."""
+    graph = ImportGraph({"a": {"b", "c"}, "b": {"d"}, "c": {"d"}, "d": {"a", "e"}})
+    assert graph.path("a", "e") in (["a", "b", "d", "e"], ["a", "c", "d", "e"])
+    assert graph.path("e", "a") is None
+    assert graph.path("a", "a") == ["a"]
+
+
+def test_new_cycles(tmp_path):
+    """
+    Test that only the imports added by a change are checked for cycles (looking only
+    in the packages involved), and that adding an import of a module which doesn't
+    import back is fine.
+    """
+    files = write_project(tmp_path / "proj")
+    (scripts := tmp_path / "proj" / "scripts").mkdir()
+    (scripts / "s.py").write_text("import pkg.b\n")
+    cycle = {files["b"]: "from pkg.c import g\n"}
+    assert new_cycles(cycle) == [["pkg.b", "pkg.c", "pkg.a", "pkg.b"]]
+    with SymbolIndex() as index:
+        assert not index.paths([scripts.absolute()])
+    deferred = {files["b"]: "def h():\n    from pkg.c import g\n"}
+    assert new_cycles(deferred) == []
+    assert new_cycles({files["c"]: "import pkg.b\n"}) == []
+
+
+def test_move_cycle(tmp_path, capsys):
+    """
+    Test that a move which would make dst import a module importing it is refused
+    (with nothing written) unless cycles are allowed, and only warned of in a dry run.
+    """
+    files = write_project(tmp_path / "proj")
+    before = {name: path.read_text() for name, path in files.items()}
+    argv = [str(files["c"]), str(files["b"]), "-m", "g"]
+    result = cli(MvCls="MvDef", defopt_argv=argv, return_state=True)
+    assert result.touched == []
+    cycle = "import cycle: pkg.b -> pkg.a -> pkg.b"
+    assert f"Refusing to create an {cycle}" in capsys.readouterr().err
+    assert {name: path.read_text() for name, path in files.items()} == before
+    with raises(CheckFailure):
+        cli(MvCls="MvDef", defopt_argv=[*argv, "--escalate"])
+    cli(MvCls="MvDef", defopt_argv=[*argv, "--dry-run"])
+    assert f"Warning: this would create an {cycle}" in capsys.readouterr().err
+    cli(MvCls="MvDef", defopt_argv=[*argv, "--allow-cycles"])
+    assert f"Warning: this creates an {cycle}" in capsys.readouterr().err
+    assert files["b"].read_text().startswith("from .a import f\n")
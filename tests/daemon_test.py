@@ -0,0 +1,108 @@
+"""
+Tests for running the CLIs on the `mvdefd` daemon.
+"""
+
+import subprocess
+import sys
+import time
+from io import StringIO
+
+from pytest import fixture, mark
+
+from mvdef.daemon.client import forward, request
+
+from .helpers.io import Write
+
+__all__ = [
+    "mvdefd",
+    "test_daemon_filter",
+    "test_daemon_lsdef",
+    "test_daemon_move",
+    "test_daemon_parse_cache",
+    "test_daemon_route",
+]
+
+
+@fixture
+def mvdefd(cache_dir, monkeypatch):
+    """Run the daemon on a socket in the test's cache dir, stopping it afterwards."""
+    sock = cache_dir / "mvdefd.sock"
+    monkeypatch.setenv("MVDEF_SOCKET", str(sock))
+    proc = subprocess.Popen([sys.executable, "-m", "mvdef.daemon.server"])
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            request("ping", path=sock)
+        except OSError:
+            assert time.monotonic() < deadline, "mvdefd did not start"
+            time.sleep(0.05)
+        else:
+            break
+    yield sock
+    request("shutdown", path=sock)
+    assert proc.wait(timeout=10) == 0
+    assert not sock.exists()
+
+
+@mark.parametrize("src", ["fooA"], indirect=True)
+def test_daemon_lsdef(mvdefd, tmp_path, monkeypatch, capsys, src):
+    """
+    Test that a command forwarded to the daemon prints the same output as when run
+    locally, with relative paths resolved against the client's working directory.
+    """
+    (src_p,) = Write.from_enums(src, path=tmp_path).file_paths
+    monkeypatch.chdir(tmp_path)
+    assert forward("lsdef", [src_p.name, "--list"]) == 0
+    assert capsys.readouterr().out == "foo\nA\n"
+    forward("lsdef", ["missing.py", "--list"])
+    assert capsys.readouterr().err == "Failed to parse the src file\n"
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_daemon_move(mvdefd, tmp_path, src, dst):
+    """
+    Test that a move run on the daemon changes the files.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    assert forward("mvdef", [str(src_p), str(dst_p), "--mv", "A"]) == 0
+    assert "class A" not in src_p.read_text()
+    assert "class A" in dst_p.read_text()
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_daemon_route(mvdefd, tmp_path, monkeypatch, src, dst):
+    """
+    Test that the path of a `name:path` route is resolved against the client's
+    working directory too.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    monkeypatch.chdir(tmp_path)
+    assert forward("mvdef", [src_p.name, dst_p.name, "--mv", "foo", "A:c.py"]) == 0
+    assert "def foo" in dst_p.read_text()
+    assert "class A" in (tmp_path / "c.py").read_text()
+
+
+@mark.parametrize("src", ["fooA"], indirect=True)
+def test_daemon_parse_cache(mvdefd, tmp_path, capsys, src):
+    """
+    Test that the daemon reuses a file's parse until the file changes.
+    """
+    (src_p,) = Write.from_enums(src, path=tmp_path).file_paths
+    argv = [str(src_p), "--list"]
+    forward("lsdef", argv)
+    forward("lsdef", argv)
+    assert request("ping", path=mvdefd)["result"]["hits"] == 1
+    src_p.write_text(src_p.read_text() + "\ndef baz():\n    pass\n")
+    forward("lsdef", argv)
+    assert capsys.readouterr().out.splitlines()[-3:] == ["foo", "A", "baz"]
+    assert request("ping", path=mvdefd)["result"]["misses"] == 2
+
+
+@mark.parametrize("src", ["fooA"], indirect=True)
+def test_daemon_filter(mvdefd, monkeypatch, capsys, src):
+    """
+    Test that stdin is sent to the daemon in filter mode (when a file is `-`).
+    """
+    monkeypatch.setattr("sys.stdin", StringIO(src.value))
+    assert forward("lsdef", ["-"]) == 0
+    assert capsys.readouterr().out == f'__all__ = ["foo", "A"]\n\n{src.value}'
@@ -0,0 +1,100 @@
+"""
+Tests for moving definitions along with the helpers they use, with `--with-deps`.
+"""
+
+from mvdef.cli import cli
+from mvdef.core.deps import MODULE, dependency_closure, reference_graph
+from mvdef.core.parse import parse
+
+__all__ = [
+    "test_dependency_closure",
+    "test_reference_graph",
+    "test_with_deps",
+]
+
+CODE = """\
+import os
+
+__all__ = ["f", "g", "_exported"]
+
+
+def _join(*parts):
+    return os.sep.join(parts)
+
+
+def _shared():
+    return 1
+
+
+class _Cfg:
+    root = _join("x")
+
+
+def _exported():
+    return _Cfg
+
+
+def f():
+    return _join(_Cfg.root, str(_shared()))
+
+
+def g():
+    return _shared()
+
+
+DEFAULT = _shared()
+"""
+
+
+def test_reference_graph():
+    """
+    Test that each top-level definition (or constant) is linked to those it uses, and
+    the module code to those it uses outside of them.
+    """
+    graph = reference_graph(parse(CODE))
+    assert graph == {
+        MODULE: set(),
+        "_join": set(),
+        "_shared": set(),
+        "_Cfg": {"_join"},
+        "_exported": {"_Cfg"},
+        "f": {"_join", "_Cfg", "_shared"},
+        "g": {"_shared"},
+        "DEFAULT": {"_shared"},
+    }
+
+
+def test_dependency_closure():
+    """
+    Test that the helpers are moved (in the module's order) unless the code staying
+    uses them (even via `__all__`, or via other helpers that stay), or when copying.
+    """
+    check = parse(CODE)
+    closure = dependency_closure(check, ["f"])
+    assert (closure.names, closure.left) == (["f"], ["_join", "_shared", "_Cfg"])
+    closure = dependency_closure(check, ["_exported", "f"])
+    assert closure.names == ["_join", "_Cfg", "_exported", "f"]
+    assert closure.left == ["_shared"]
+    closure = dependency_closure(check, ["f"], keep_used=False)
+    assert closure.names == ["_join", "_shared", "_Cfg", "f"]
+
+
+def test_with_deps(tmp_path, capsys):
+    """
+    Test that moving with `--with-deps` moves the helpers only the targets use (in
+    one pass), and warns of those which have to stay.
+    """
+    (src := tmp_path / "a.py").write_text(CODE)
+    dst = tmp_path / "b.py"
+    argv = [str(src), str(dst), "-m", "f", "_exported", "--with-deps"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert "uses _shared, which must stay in" in capsys.readouterr().err
+    moved = parse(dst.read_text())
+    assert [node.name for node in moved.alldefs if node.depth == 1] == [
+        "_join",
+        "_Cfg",
+        "_exported",
+        "f",
+    ]
+    remaining = parse(src.read_text())
+    assert [node.name for node in remaining.alldefs] == ["_shared", "g"]
@@ -0,0 +1,95 @@
+"""
+Tests for copying definitions to several destinations at once, and staging several
+files' writes in parallel.
+"""
+
+from mvdef.cli import cli
+from mvdef.core import agenda
+from mvdef.core.parse import parse
+from mvdef.core.transaction import Transaction
+
+__all__ = ["test_fan_out", "test_import_needs_once", "test_stage_all"]
+
+CODE = """\
+import os
+import re
+
+
+def _helper():
+    return os.sep
+
+
+def a():
+    return _helper() + re.escape("a")
+
+
+def b():
+    return 2
+"""
+
+
+def test_fan_out(tmp_path):
+    """
+    Test that the names are copied to every destination (the helpers too, with `-w`),
+    that each gets only the imports it lacks, that a routed name goes to its route
+    alone, and that src is left as it was.
+    """
+    (src := tmp_path / "s.py").write_text(CODE)
+    (y := tmp_path / "y.py").write_text("import os\n\n\ndef z():\n    pass\n")
+    x, w = tmp_path / "x.py", tmp_path / "w.py"
+    argv = [str(src), str(x), str(y), "-m", "a", f"b:{w}", "-w", "-j", "2"]
+    copier = cli(MvCls="CpDef", defopt_argv=argv, return_state=True).mover
+    assert copier.dst == x
+    assert copier.routes == {x: ["_helper", "a"], w: ["b"], y: ["_helper", "a"]}
+    assert src.read_text() == CODE
+    assert [n.name for n in parse(x.read_text()).alldefs] == ["_helper", "a"]
+    assert x.read_text().startswith("import os\nimport re\n")
+    assert [n.name for n in parse(y.read_text()).alldefs] == ["z", "_helper", "a"]
+    assert y.read_text().count("import os\n") == 1
+    assert "import re\n" in y.read_text()
+    assert [n.name for n in parse(w.read_text()).alldefs] == ["b"]
+
+
+def test_import_needs_once(tmp_path, monkeypatch):
+    """
+    Test that the import needs of the copied code are mapped out once, and shared by
+    all the destinations.
+    """
+    (src := tmp_path / "s.py").write_text(CODE)
+    dsts = [tmp_path / f"{name}.py" for name in "xyz"]
+    made = []
+    sourced_use = agenda.SourcedUse
+    monkeypatch.setattr(
+        agenda,
+        "SourcedUse",
+        lambda **kwargs: made.append(kwargs["name"]) or sourced_use(**kwargs),
+    )
+    argv = [str(src), *map(str, dsts), "-m", "a"]
+    copier = cli(MvCls="CpDef", defopt_argv=argv, return_state=True).mover
+    assert made == ["re"]
+    assert list(copier.src_check.sourced_uses) == [("a",)]
+    x, y, z = (copier.dst_diffs[dst].agenda.map_import_usage() for dst in dsts)
+    assert x is y is z
+
+
+def test_stage_all(tmp_path):
+    """
+    Test that writes staged together (in threads) commit like those staged in turn,
+    skipping the unchanged and keeping the last text for a target given twice.
+    """
+    files = [tmp_path / f"{i}.py" for i in range(4)]
+    for i, path in enumerate(files):
+        path.write_text(f"x = {i}\n")
+    changes = [(path, f"x = {i + 1}\n", f"x = {i}\n") for i, path in enumerate(files)]
+    changes[0] = (files[0], "x = 0\n", "x = 0\n")
+    changes.append((files[1], "y = 1\n", "x = 1\n"))
+    with Transaction(journal_dir=tmp_path) as txn:
+        writes = txn.stage_all(changes, jobs=3)
+    assert [write.target for write in writes] == files[1:]
+    assert [path.read_text() for path in files] == [
+        "x = 0\n",
+        "y = 1\n",
+        "x = 3\n",
+        "x = 4\n",
+    ]
+    assert not list(tmp_path.glob(".*.mvdef"))
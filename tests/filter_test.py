@@ -0,0 +1,70 @@
+"""
+Tests for filter mode, i.e. passing `-` as a file to read it from stdin (and write the
+result to stdout instead of to a file).
+"""
+
+from io import StringIO
+
+from pytest import mark
+
+from mvdef.core.parse import STDIN
+
+from .helpers.cli_util import get_manif, run_cmd
+from .helpers.io import Write
+
+__all__ = [
+    "test_filter_both_stdin",
+    "test_filter_copy_dst",
+    "test_filter_fix_all",
+    "test_filter_move_src",
+]
+
+
+@mark.parametrize("src", ["fooA"], indirect=True)
+def test_filter_fix_all(tmp_path, monkeypatch, capsys, src):
+    """
+    Test that `lsdef -` prints the code from stdin with its `__all__` fixed.
+    """
+    monkeypatch.setattr("sys.stdin", StringIO(src.value))
+    fixed = get_manif(STDIN, match=["*"], dry_run=False)
+    assert capsys.readouterr().out == fixed
+    assert fixed == f'__all__ = ["foo", "A"]\n\n{src.value}'
+    assert list(tmp_path.iterdir()) == []
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_filter_move_src(tmp_path, monkeypatch, capsys, src, dst):
+    """
+    Test that moving from stdin prints the new src, and writes dst as usual.
+    """
+    (dst_p,) = Write.from_enums(dst, path=tmp_path).file_paths
+    monkeypatch.setattr("sys.stdin", StringIO(src.value))
+    result = run_cmd(STDIN, dst_p, mv=["A"])
+    assert result.touched == [dst_p]
+    out = capsys.readouterr().out
+    assert "def foo" in out and "class A" not in out
+    assert "class A" in dst_p.read_text()
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_filter_copy_dst(tmp_path, monkeypatch, capsys, src, dst):
+    """
+    Test that copying to stdin prints the new dst, and leaves src alone.
+    """
+    (src_p,) = Write.from_enums(src, path=tmp_path).file_paths
+    monkeypatch.setattr("sys.stdin", StringIO(dst.value))
+    result = run_cmd(src_p, STDIN, mv=["foo"], cp_=True)
+    assert result.touched == []
+    out = capsys.readouterr().out
+    assert out.startswith(dst.value) and "def foo" in out
+    assert src_p.read_text() == src.value
+
+
+def test_filter_both_stdin(monkeypatch, capsys):
+    """
+    Test that src and dst can't both be read from stdin.
+    """
+    monkeypatch.setattr("sys.stdin", StringIO(""))
+    result = run_cmd(STDIN, STDIN, mv=["foo"], escalate=False)
+    assert result.mover.check_blocker is not None
+    assert "Only one of src and dst" in capsys.readouterr().err
@@ -196,10 +196,13 @@ class DstDiffs(Enum):
 
 class StoredStdOut(Enum):
     MVDEF_HELP = (
-        "usage: mvdef [-h] -m [MV ...] [-d] [-e] [-c] [-f] [-v] [--version] src dst\n"
+        "usage: mvdef [-h] -m [MV ...] [-d] [-w] [-u] [-r] [-i {.,a,p}] [-j JOBS] [-a]\n"
+        "             [-e] [-c] [-f] [-v] [--version]\n"
+        "             src dst\n"
         "\n"
         "\xa0\xa0Move function definitions from one file to another, moving/copying\n"
         "\xa0\xa0any necessary associated import statements along with them.\n"
+        "\xa0\xa0Either file can be - to read it from stdin and write its result to stdout.\n"
         "\n"
         "\xa0 Option     Description                                Type        "
         "Default\n"
@@ -207,9 +210,19 @@ class StoredStdOut(Enum):
         "———————\n"
         "•\xa0src        source file to take definitions from       Path        -\n"
         "•\xa0dst        destination file (may not exist)           Path        -\n"
-        "•\xa0mv         names to move from the source file         list[str]   -\n"
+        "•\xa0mv         names to move (or name:path to route one)  list[str]   -\n"
         "•\xa0dry_run    whether to only preview the change diffs   bool        "
         "False\n"
+        "•\xa0with_deps  whether to also move the helpers they use  bool        "
+        "False\n"
+        "•\xa0update_importers whether to fix other files' imports  bool        "
+        "False\n"
+        "•\xa0retain     whether src imports the names moved back   bool        "
+        "False\n"
+        "•\xa0import_style style of those imports (., a or p)       str         .\n"
+        "•\xa0jobs       worker processes (0 for one per CPU)       int         1\n"
+        "•\xa0allow_cycles whether to allow new import cycles       bool        "
+        "False\n"
         "•\xa0escalate   whether to raise an error upon failure     bool        "
         "False\n"
         "•\xa0cls_defs   whether to use only class definitions      bool        "
@@ -227,6 +240,12 @@ class StoredStdOut(Enum):
         "  -h, --help            show this help message and exit\n"
         "  -m [MV ...], --mv [MV ...]\n"
         "  -d, --dry-run\n"
+        "  -w, --with-deps\n"
+        "  -u, --update-importers\n"
+        "  -r, --retain\n"
+        "  -i {.,a,p}, --import-style {.,a,p}\n"
+        "  -j JOBS, --jobs JOBS\n"
+        "  -a, --allow-cycles\n"
         "  -e, --escalate\n"
         "  -c, --cls-defs\n"
         "  -f, --func-defs\n"
@@ -234,21 +253,30 @@ class StoredStdOut(Enum):
         "  --version             show program's version number and exit\n"
     )
     CPDEF_HELP = (
-        "usage: cpdef [-h] -m [MV ...] [-d] [-e] [-c] [-f] [-v] [--version] src dst\n"
+        "usage: cpdef [-h] -m [MV ...] [-d] [-w] [-j JOBS] [-a] [-e] [-c] [-f] [-v]\n"
+        "             [--version]\n"
+        "             src [dst ...]\n"
         "\n"
         "\xa0\xa0Copy function definitions from one file to another, and any "
         "necessary\n"
         "\xa0\xa0associated import statements along with them.\n"
+        "\xa0\xa0Either file can be - to read it from stdin and write its result to stdout.\n"
+        "\xa0\xa0Given several destinations, the definitions are copied to each of them.\n"
         "\n"
         "\xa0 Option     Description                                Type        "
         "Default\n"
         "\xa0 —————————— —————————————————————————————————————————— ——————————— "
         "———————\n"
         "•\xa0src        source file to copy definitions from       Path        -\n"
-        "•\xa0dst        destination file (may not exist)           Path        -\n"
-        "•\xa0mv         names to copy from the source file         list[str]   -\n"
+        "•\xa0dst        destination files (may not exist)          Path ...    -\n"
+        "•\xa0mv         names to copy (or name:path to route one)  list[str]   -\n"
         "•\xa0dry_run    whether to only preview the change diffs   bool        "
         "False\n"
+        "•\xa0with_deps  whether to also copy the helpers they use  bool        "
+        "False\n"
+        "•\xa0jobs       worker processes (0 for one per CPU)       int         1\n"
+        "•\xa0allow_cycles whether to allow new import cycles       bool        "
+        "False\n"
         "•\xa0escalate   whether to raise an error upon failure     bool        "
         "False\n"
         "•\xa0cls_defs   whether to use only class definitions      bool        "
@@ -266,6 +294,9 @@ class StoredStdOut(Enum):
         "  -h, --help            show this help message and exit\n"
         "  -m [MV ...], --mv [MV ...]\n"
         "  -d, --dry-run\n"
+        "  -w, --with-deps\n"
+        "  -j JOBS, --jobs JOBS\n"
+        "  -a, --allow-cycles\n"
         "  -e, --escalate\n"
         "  -c, --cls-defs\n"
         "  -f, --func-defs\n"
@@ -273,22 +304,34 @@ class StoredStdOut(Enum):
         "  --version             show program's version number and exit\n"
     )
     LSDEF_HELP = (
-        "usage: lsdef [-h] [-m [MATCH ...]] [-d] [-l] [-e] [-c] [-f] [-v] [--version]\n"
-        "             src\n"
+        "usage: lsdef [-h] [-m [MATCH ...]] [-d] [-l] [--jsonl] [-p] [-s] [--jobs JOBS]\n"
+        "             [-e] [-c] [-f] [-v] [--version]\n"
+        "             [src ...]\n"
         "\n"
-        "\xa0\xa0List function definitions in a given file.\n"
+        "\xa0\xa0List function definitions in the given files, or (without --dry-run or --list)\n"
+        "\xa0\xa0fix a file's __all__ to list them. The file can be - to read it from stdin and\n"
+        "\xa0\xa0write the fixed file to stdout. Directories (for their .py files) and glob\n"
+        "\xa0\xa0patterns can also be given, and many files listed with --list or --jsonl.\n"
         "\n"
         "\xa0 Option     Description                                Type        "
         "Default\n"
         "\xa0 —————————— —————————————————————————————————————————— ——————————— "
         "———————\n"
-        "•\xa0src        source file to list definitions from       Path        -\n"
+        "•\xa0src        source files, directories or globs         Path ...    -\n"
         "•\xa0match      name regex to list from the source file    list[str]   "
         "['*']\n"
         "•\xa0dry_run    whether to print the __all__ diff          bool        "
         "False\n"
         "•\xa0list       whether to print the list of names         bool        "
         "False\n"
+        "•\xa0jsonl      whether to print a JSON object per file    bool        "
+        "False\n"
+        "•\xa0per_def    whether to print one per definition        bool        "
+        "False\n"
+        "•\xa0sort       whether to list files in sorted order      bool        "
+        "False\n"
+        "•\xa0jobs       worker processes (0 for one per CPU)       int         "
+        "1\n"
         "•\xa0escalate   whether to raise an error upon failure     bool        "
         "False\n"
         "•\xa0cls_defs   whether to use only class definitions      bool        "
@@ -306,6 +349,10 @@ class StoredStdOut(Enum):
         "  -m [MATCH ...], --match [MATCH ...]\n"
         "  -d, --dry-run\n"
         "  -l, --list\n"
+        "  --jsonl\n"
+        "  -p, --per-def\n"
+        "  -s, --sort\n"
+        "  --jobs JOBS\n"
         "  -e, --escalate\n"
         "  -c, --cls-defs\n"
         "  -f, --func-defs\n"
@@ -316,7 +363,9 @@ class StoredStdOut(Enum):
 
 class StoredStdErr(Enum):
     USAGE = (
-        "usage: mvdef [-h] -m [MV ...] [-d] [-e] [-c] [-f] [-v] [--version] src dst\n"
+        "usage: mvdef [-h] -m [MV ...] [-d] [-w] [-u] [-r] [-i {.,a,p}] [-j JOBS] [-a]\n"
+        "             [-e] [-c] [-f] [-v] [--version]\n"
+        "             src dst\n"
         "mvdef: error: the following arguments are required: src, dst, -m/--mv\n"
     )
     REJECT_0_EQ_1 = "1:1: cannot assign to literal here. Maybe you meant '==' instead of '='?\n0 = 1\n^\n"
@@ -0,0 +1,154 @@
+"""
+Tests for rewriting the imports of the modules importing the definitions moved, with
+`mvdef --update-importers`.
+"""
+
+from pytest import raises
+
+import mvdef.core.importers
+from mvdef.cli import cli, cli_subcommand
+from mvdef.core.importers import (
+    forget_packages,
+    module_name,
+    project_root,
+    rewrite_imports,
+)
+from mvdef.error_handling.exceptions import CheckFailure
+
+__all__ = [
+    "test_importer_failure",
+    "test_module_name",
+    "test_rewrite_imports",
+    "test_update_importers",
+    "test_update_importers_refused",
+]
+
+
+def write_project(path) -> dict:
+    """Write a project with a package whose modules import from one another."""
+    (pkg := path / "pkg").mkdir(parents=True)
+    (path / "tests").mkdir()
+    (path / "pyproject.toml").write_text("")
+    (pkg / "__init__.py").write_text("from .a import f\n")
+    files = {
+        "a": pkg / "a.py",
+        "c": pkg / "c.py",
+        "t": path / "tests" / "t.py",
+    }
+    files["a"].write_text("def f():\n    return 1\n\n\ndef g():\n    return 2\n")
+    files["c"].write_text("from .a import f, g  # both\n\nf(), g()\n")
+    files["t"].write_text("from pkg.a import f as ff\nfrom pkg import a\n")
+    return {**files, "init": pkg / "__init__.py", "b": pkg / "b.py"}
+
+
+def test_module_name(tmp_path):
+    """
+    Test that files are named by the packages that contain them, in the project found
+    by its pyproject.toml (or else by the top package).
+    """
+    files = write_project(tmp_path / "proj")
+    assert module_name(files["a"]) == "pkg.a"
+    assert module_name(files["init"]) == "pkg"
+    assert module_name(files["t"]) == "t"
+    assert project_root(files["a"]) == tmp_path / "proj"
+    (tmp_path / "proj" / "pyproject.toml").unlink()
+    forget_packages()  # The layout is memoised per directory
+    assert project_root(files["a"]) == tmp_path / "proj"
+    assert project_root(files["t"]) == tmp_path / "proj" / "tests"
+
+
+def test_rewrite_imports():
+    """
+    Test that only the moved names are imported from their new module (relatively if
+    they were before), leaving other names, modules and comments as they were.
+    """
+    kwargs = {"src_module": "pkg.a", "dst_module": "pkg.sub.b", "names": ["f"]}
+    code = (
+        "from .a import f, g  # both\n"
+        "from pkg.a import f as h\n"
+        "from pkg import a\n"
+        "def k():\n"
+        "    x = 1; from ..a import f\n"
+    )
+    assert rewrite_imports(code, package=["pkg", "sub"], **kwargs) == (
+        "from .a import f, g  # both\n"
+        "from pkg.sub.b import f as h\n"
+        "from pkg import a\n"
+        "def k():\n"
+        "    x = 1; from .b import f\n"
+    )
+    assert rewrite_imports(code, package=["pkg"], **kwargs) == (
+        "from .a import g\n"
+        "from .sub.b import f  # both\n"
+        "from pkg.sub.b import f as h\n"
+        "from pkg import a\n"
+        "def k():\n"
+        "    x = 1; from ..a import f\n"
+    )
+
+
+def test_update_importers(tmp_path, monkeypatch):
+    """
+    Test that moving with `--update-importers` rewrites every importer in the project
+    in the same operation (undone together), and previews them in a dry run.
+    """
+    files = write_project(tmp_path / "proj")
+    monkeypatch.chdir(tmp_path / "proj")
+    before = {name: path.read_text() for name, path in files.items() if path.exists()}
+    argv = [str(files["a"]), str(files["b"]), "-m", "f", "-u"]
+    result = cli(MvCls="MvDef", defopt_argv=[*argv, "-d"], return_state=True)
+    assert "+from .b import f  # both\n" in result.mover.importer_diffs[1]
+    assert files["c"].read_text() == before["c"]
+    result = cli(MvCls="MvDef", defopt_argv=[*argv, "-j", "2"], return_state=True)
+    assert set(result.touched) == {files[k] for k in ["a", "b", "c", "t", "init"]}
+    assert files["init"].read_text() == "from .b import f\n"
+    assert files["c"].read_text() == (
+        "from .a import g\nfrom .b import f  # both\n\nf(), g()\n"
+    )
+    assert files["t"].read_text() == "from pkg.b import f as ff\nfrom pkg import a\n"
+    cli_subcommand("undo", defopt_argv=[])
+    assert {k: p.read_text() for k, p in files.items() if p.exists()} == before
+
+
+def test_update_importers_refused(tmp_path):
+    """Test that copying, or moving from stdin, can't update importers."""
+    files = write_project(tmp_path / "proj")
+    argv = ["-m", "f", "-u", "-e"]
+    with raises(SystemExit):
+        cli(MvCls="CpDef", defopt_argv=[str(files["a"]), str(files["b"]), *argv])
+    with raises(CheckFailure):
+        cli(MvCls="MvDef", defopt_argv=["-", str(files["b"]), *argv])
+
+
+def test_importer_failure(tmp_path, monkeypatch, capsys):
+    """
+    Test that the move is abandoned (with nothing written) if any importer can't be
+    rewritten, and that importers in hidden or virtual environment dirs are skipped.
+    """
+    files = write_project(tmp_path / "proj")
+    (venv := tmp_path / "proj" / "venv").mkdir()
+    (venv / "pyvenv.cfg").write_text("")
+    (venv / "v.py").write_text("from pkg.a import f\n")
+    (hidden := tmp_path / "proj" / ".tox").mkdir()
+    (hidden / "h.py").write_text("from pkg.a import f\n")
+    before = {name: path.read_text() for name, path in files.items() if path.exists()}
+    rewrite_importer = mvdef.core.importers.rewrite_importer
+
+    def failing(path, **kwargs):
+        if path.name == "t.py":
+            return {"file": str(path), "error": "OSError: unreadable"}
+        return rewrite_importer(path, **kwargs)
+
+    monkeypatch.setattr(mvdef.core.importers, "rewrite_importer", failing)
+    argv = [str(files["a"]), str(files["b"]), "-m", "f", "-u"]
+    result = cli(MvCls="MvDef", defopt_argv=argv, return_state=True)
+    assert result.touched == []
+    err = capsys.readouterr().err
+    assert "Not moving, as importers can't be rewritten" in err
+    assert f"{files['t']}: OSError: unreadable" in err
+    assert {k: p.read_text() for k, p in files.items() if p.exists()} == before
+    monkeypatch.undo()
+    result = cli(MvCls="MvDef", defopt_argv=argv, return_state=True)
+    assert files["t"] in result.touched
+    for skipped in [venv / "v.py", hidden / "h.py"]:
+        assert skipped.read_text() == "from pkg.a import f\n"
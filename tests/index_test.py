@@ -0,0 +1,106 @@
+"""
+Tests for the project-wide symbol index built by `mvdef index`.
+"""
+
+import json
+import os
+
+from mvdef.cli import cli, cli_subcommand
+from mvdef.core.index import SymbolIndex
+from mvdef.core.listing import list_files
+
+__all__ = [
+    "test_index_incremental",
+    "test_index_lsdef",
+    "test_index_queries",
+]
+
+
+def write_package(path) -> list:
+    """Write a package of modules that import from one another, returning the paths."""
+    path.mkdir()
+    (a := path / "a.py").write_text("import os\n\n\ndef f():\n    return os.sep\n")
+    (b := path / "b.py").write_text(
+        "from pkg.a import f\nfrom os import path\n\n\nclass C:\n"
+        "    def g(self):\n        return f(), path\n",
+    )
+    (c := path / "c.py").write_text(
+        "import pkg.a as alias\n\n\nasync def f():\n    ...\n",
+    )
+    return [a, b, c]
+
+
+def index(*argv: str, capsys) -> list[str]:
+    cli_subcommand("index", defopt_argv=[*map(str, argv)])
+    return capsys.readouterr().out.splitlines()
+
+
+def test_index_incremental(tmp_path, capsys):
+    """
+    Test that indexing again re-analyses only the files changed since (by contents,
+    not just by modification time), and drops the files deleted since.
+    """
+    a, b, c = write_package(tmp_path / "pkg")
+    assert index(tmp_path, capsys=capsys) == [
+        "Indexed 3 file(s): 3 re-analysed, 0 removed",
+    ]
+    assert index(tmp_path, capsys=capsys) == [
+        "Indexed 3 file(s): 0 re-analysed, 0 removed",
+    ]
+    os.utime(a, ns=(0, 0))  # Touched but unchanged
+    c.write_text(c.read_text() + "\n\nclass D:\n    pass\n")
+    b.unlink()
+    assert index(tmp_path, capsys=capsys) == [
+        "Indexed 2 file(s): 1 re-analysed, 1 removed",
+    ]
+    with SymbolIndex() as db:
+        records = db.records([a, c])
+    assert [d["name"] for d in records[c]["defs"]] == ["f", "D"]
+    assert db.path.exists()
+
+
+def test_index_queries(tmp_path, capsys):
+    """
+    Test that the index lists the imports of a module (including imports of names
+    from it and of its submodules) and the definitions of a name, only in the files
+    under the paths given.
+    """
+    a, b, c = write_package(tmp_path / "pkg")
+    index(tmp_path, capsys=capsys)
+    assert index(tmp_path, "--importers", "os", "--cached", capsys=capsys) == [
+        f"{a}:1:os",
+        f"{b}:2:os.path",
+    ]
+    assert index(tmp_path, "-i", "pkg", "-c", capsys=capsys) == [
+        f"{b}:1:pkg.a.f",
+        f"{c}:1:pkg.a",
+    ]
+    assert index(tmp_path, "--defines", "f", "-c", capsys=capsys) == [
+        f"{a}:4:function",
+        f"{c}:4:async",
+    ]
+    assert index(a, "--defines", "f", "-c", capsys=capsys) == [f"{a}:4:function"]
+
+
+def test_index_lsdef(tmp_path, capsys, monkeypatch):
+    """
+    Test that lsdef lists the same records from the index as by parsing the files,
+    and parses only those changed since they were indexed.
+    """
+    paths = write_package(tmp_path / "pkg")
+    expected = list(list_files(paths))
+    index(tmp_path, capsys=capsys)
+    paths[0].write_text("def (:\n")
+    error = "SyntaxError: invalid syntax (line 1)"
+    expected[0] = {"file": str(paths[0]), "error": error}
+
+    def ls(*argv):
+        cli(MvCls="LsDef", defopt_argv=[*map(str, argv)])
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert ls(*paths, "--jsonl", "--sort") == expected
+    index(tmp_path, capsys=capsys)
+    monkeypatch.setattr("mvdef.core.listing.parse", None)  # Parsing would now fail
+    assert ls(*paths, "--jsonl", "--sort") == expected
+    classes = ls(*paths, "--jsonl", "--sort", "--cls-defs", "--match", "C")
+    assert [[d["name"] for d in r.get("defs", [])] for r in classes] == [[], ["C"], []]
@@ -0,0 +1,103 @@
+"""
+Tests for listing the definitions in many files at once with `lsdef`.
+"""
+
+import json
+from pathlib import Path
+
+from pytest import raises
+
+from mvdef.cli import cli
+from mvdef.core.listing import expand_paths, list_files
+from mvdef.error_handling.exceptions import CheckFailure
+
+__all__ = [
+    "test_expand_paths",
+    "test_list_many",
+    "test_list_many_error",
+    "test_list_many_parallel",
+]
+
+
+def write_package(path, n: int = 3) -> list:
+    """Write a package of `n` modules (plus a non-Python file), returning the paths."""
+    (path / "sub").mkdir(parents=True)
+    (path / "README.md").write_text("# Not listed\n")
+    paths = []
+    for i in range(n):
+        module = path / ("sub" if i % 2 else "") / f"mod{i}.py"
+        module.write_text(f"def f{i}():\n    pass\n\n\nclass C{i}:\n    pass\n")
+        paths.append(module)
+    return paths
+
+
+def ls(*argv: str) -> list[str]:
+    result = cli(MvCls="LsDef", defopt_argv=[*map(str, argv)], return_state=True)
+    return result.manif.splitlines()
+
+
+def test_expand_paths(tmp_path, monkeypatch):
+    """
+    Test that directories and globs expand to their files in sorted order, each file
+    listed once however many times it is named.
+    """
+    mod0, mod1, mod2 = write_package(tmp_path / "pkg")
+    assert expand_paths((tmp_path / "pkg",)) == [mod0, mod2, mod1]
+    assert expand_paths((mod1, tmp_path / "pkg" / "*.py")) == [mod1, mod0, mod2]
+    assert expand_paths((tmp_path / "pkg/**/mod1.py", mod1)) == [mod1]
+    monkeypatch.chdir(tmp_path)
+    assert expand_paths((Path("pkg/*/*.py"),)) == [mod1.relative_to(tmp_path)]
+
+
+def test_list_many(tmp_path):
+    """
+    Test that lsdef lists the definitions of each file given, as JSON objects per file
+    or per definition, or as lines of text.
+    """
+    mod0, mod1, mod2 = write_package(tmp_path / "pkg")
+    records = [json.loads(line) for line in ls(tmp_path / "pkg", "--jsonl", "-s")]
+    assert [r["file"] for r in records] == [str(mod0), str(mod2), str(mod1)]
+    assert [(d["name"], d["kind"], d["line"]) for d in records[0]["defs"]] == [
+        ("f0", "function", 1),
+        ("C0", "class", 5),
+    ]
+    per_def = [json.loads(line) for line in ls(mod2, mod1, "--jsonl", "-p", "-c")]
+    assert [(r["file"], r["name"]) for r in per_def] == [
+        (str(mod2), "C2"),
+        (str(mod1), "C1"),
+    ]
+    assert ls(mod0, mod1, "--list", "-f") == [f"{mod0}:1:f0", f"{mod1}:1:f1"]
+
+
+def test_list_many_error(tmp_path, capsys):
+    """
+    Test that a file which fails to parse is reported (and listed with its error),
+    and that listing many files is refused unless printing a list.
+    """
+    (bad := tmp_path / "bad.py").write_text("def (:\n")
+    (good := tmp_path / "good.py").write_text("def f():\n    pass\n")
+    first, second = map(json.loads, ls(bad, good, "--jsonl"))
+    assert first == {"file": str(bad), "error": "SyntaxError: invalid syntax (line 1)"}
+    assert second["defs"][0]["name"] == "f"
+    assert f"Failed to list {bad}" in capsys.readouterr().err
+    with raises(CheckFailure):
+        cli(MvCls="LsDef", defopt_argv=[str(bad), str(good), "--list", "--escalate"])
+    with raises(CheckFailure):
+        cli(MvCls="LsDef", defopt_argv=[str(tmp_path), "--escalate"])
+    assert good.read_text() == "def f():\n    pass\n"
+
+
+def test_list_many_parallel(tmp_path):
+    """
+    Test that listing files in a pool of processes gives the same records as listing
+    them in turn, and in the same order if `ordered`.
+    """
+    paths = write_package(tmp_path / "pkg", n=20)
+    expected = list(list_files(paths))
+    kwargs = {"jobs": 2, "chunk_size": 3}
+    assert list(list_files(paths, ordered=True, **kwargs)) == expected
+    unordered = list(list_files(paths, **kwargs))
+    assert sorted(unordered, key=expected.index) == expected
+    assert ls(tmp_path / "pkg", "--jsonl", "--sort", "--jobs", "2") == [
+        json.dumps(record) for record in sorted(expected, key=lambda r: r["file"])
+    ]
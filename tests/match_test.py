@@ -0,0 +1,104 @@
+"""
+Tests for matching definition names against `lsdef --match` regexes.
+"""
+
+import json
+import re
+
+from pytest import mark, raises
+
+from mvdef.cli import cli
+from mvdef.core.manifest.match import NameMatcher, literal_prefix
+from mvdef.error_handling.exceptions import CheckFailure
+
+from .helpers.cli_util import get_manif
+
+__all__ = [
+    "test_invalid_match",
+    "test_literal_prefix",
+    "test_ls_match",
+    "test_name_matcher",
+]
+
+SOURCE = """\
+def test_a():
+    pass
+
+
+def test_b():
+    pass
+
+
+class TestC:
+    pass
+
+
+def helper():
+    pass
+"""
+
+
+@mark.parametrize(
+    "pattern,prefix",
+    [
+        ("test_.*", "test_"),
+        ("tests?", "test"),
+        (r"a\.b", "a"),
+        ("(?i)foo", ""),
+        ("foo|bar", ""),
+        ("[ab]c", ""),
+        ("foo", "foo"),
+    ],
+)
+def test_literal_prefix(pattern, prefix):
+    """Test the literal prefix that all names matched by a regex must start with."""
+    assert literal_prefix(pattern) == prefix
+
+
+def test_name_matcher():
+    """
+    Test that names are matched in full against any of the patterns, whether plain
+    names, regexes with literal prefixes, or regexes without (or with inline flags).
+    """
+    names = ["foo", "food", "bar", "baz", "test_x", "Test"]
+    assert NameMatcher(["*"]).filter(names) == names
+    assert NameMatcher(["foo", "ba."]).filter(names) == ["foo", "bar", "baz"]
+    matcher = NameMatcher(["fo+d?", "test_.*"])
+    assert matcher.prefixes == ("fo", "test_")
+    assert matcher.filter(names) == ["foo", "food", "test_x"]
+    matcher = NameMatcher(["[Tt]est.*", "bar"])
+    assert matcher.prefixes is None
+    assert matcher.filter(names) == ["bar", "test_x", "Test"]
+    matcher = NameMatcher(["(?i)test_.*", "(?i:BA)z", "fo{2}"])
+    assert matcher.filter(names) == ["foo", "baz", "test_x"]
+
+
+def test_ls_match(tmp_path):
+    """
+    Test that lsdef lists (or fixes `__all__` with) only the names matched, from one
+    file or many.
+    """
+    (src_p := tmp_path / "src.py").write_text(SOURCE)
+    assert get_manif(src_p, match=["test_.*"], list=True) == "test_a\ntest_b"
+    manif = get_manif(src_p, match=["Test.*", "helper"], cls_defs=True, list=True)
+    assert manif == "TestC"
+    assert get_manif(src_p, match=["[Tt]est_?[bC]"]) == '__all__ = ["test_b", "TestC"]'
+    (tmp_path / "other.py").write_text("def test_z():\n    pass\n")
+    argv = [str(tmp_path), "--jsonl", "-p", "-s", "-m", "test_[az]"]
+    result = cli(MvCls="LsDef", defopt_argv=argv, return_state=True)
+    records = [json.loads(line) for line in result.manif.splitlines()]
+    assert [r["name"] for r in records] == ["test_z", "test_a"]
+
+
+@mark.parametrize(
+    "match,exc",
+    [(["foo("], re.error), (["*", "foo"], CheckFailure), ([], CheckFailure)],
+)
+def test_invalid_match(tmp_path, match, exc):
+    """
+    Test that an invalid regex (or a wildcard among others, or no pattern at all)
+    fails the check.
+    """
+    (src_p := tmp_path / "src.py").write_text(SOURCE)
+    with raises(exc):
+        get_manif(src_p, match=match)
@@ -0,0 +1,134 @@
+"""
+Tests for merging several modules into one.
+"""
+
+from mvdef.cli import cli_subcommand
+from mvdef.core.importers import rewrite_imports
+from mvdef.core.index import SymbolIndex
+from mvdef.core.parse import parse
+
+__all__ = [
+    "test_drop_own_imports",
+    "test_merge",
+    "test_merge_conflicts",
+    "test_merge_index_once",
+]
+
+A = """\
+\"\"\"Module a.\"\"\"
+
+import os
+import re
+
+
+def f():
+    return os.sep + re.escape("x")
+
+
+X = 1
+"""
+
+B = """\
+import os
+
+from .a import f
+
+
+def g():
+    return os.getcwd(), f()
+
+
+if __name__ == "__main__":
+    print(g())
+"""
+
+
+def make_package(tmp_path):
+    (pkg := tmp_path / "pkg").mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "a.py").write_text(A)
+    (pkg / "b.py").write_text(B)
+    (pkg / "user.py").write_text("from .a import X\nfrom .b import g\n")
+    return pkg
+
+
+def test_merge(tmp_path, capsys):
+    """
+    Test that a dry run only prints the diffs, and that the merge brings each import
+    once, points the sources' imports of each other (and, with `-u`, other modules')
+    at the destination, and deletes the emptied sources in one undoable operation.
+    """
+    pkg = make_package(tmp_path)
+    a, b, core = (pkg / f"{stem}.py" for stem in ["a", "b", "core"])
+    argv = [str(a), str(b), "--into", str(core)]
+    cli_subcommand("merge", defopt_argv=[*argv, "-d"])
+    assert "+++ fixed/" in capsys.readouterr().out
+    assert a.read_text() == A and not core.exists()
+    result = cli_subcommand(
+        "merge",
+        defopt_argv=[*argv, "--remove-empty", "-u"],
+        return_state=True,
+    )
+    assert sorted(path.name for path in result.touched) == [
+        "a.py",
+        "b.py",
+        "core.py",
+        "user.py",
+    ]
+    assert not a.exists()
+    merged = core.read_text()
+    assert [node.name for node in parse(merged).alldefs] == ["f", "g"]
+    assert "\n\nX = 1\n" in merged
+    assert merged.count("import os\n") == 1 and "from ." not in merged
+    assert b.read_text().startswith("from .core import g\n")
+    assert (pkg / "user.py").read_text() == "from .core import X\nfrom .core import g\n"
+    cli_subcommand("undo", defopt_argv=[])
+    assert (a.read_text(), b.read_text()) == (A, B) and not core.exists()
+
+
+def test_merge_conflicts(tmp_path, capsys):
+    """
+    Test that the names defined by more than one source, or already bound in the
+    destination, are reported before anything is moved.
+    """
+    pkg = make_package(tmp_path)
+    (c := pkg / "c.py").write_text("def g():\n    pass\n")
+    (core := pkg / "core.py").write_text("from .x import X\n")
+    argv = [str(pkg / "a.py"), str(pkg / "b.py"), str(c), "--into", str(core)]
+    cli_subcommand("merge", defopt_argv=argv)
+    err = capsys.readouterr().err
+    assert "Can't merge names defined more than once" in err
+    assert f"X ({core}, {pkg / 'a.py'})" in err and f"g ({pkg / 'b.py'}, {c})" in err
+    assert (pkg / "a.py").read_text() == A
+    cli_subcommand("merge", defopt_argv=[str(core), "--into", str(core)])
+    assert "into itself" in capsys.readouterr().err
+
+
+def test_drop_own_imports():
+    """Test that a module's imports of names from itself are dropped, not rewritten."""
+    code = "from .a import f, h\nfrom .a import f as k\nx = 1; from .a import f\n"
+    kwargs = dict(package=["pkg"], src_module="pkg.a", dst_module="pkg.core")
+    assert rewrite_imports(code, names=["f"], own_module="pkg.core", **kwargs) == (
+        "from .a import h\nfrom .core import f as k\nx = 1; pass\n"
+    )
+    assert rewrite_imports(code, names=["f"], **kwargs).count("from .core import f\n")
+
+
+def test_merge_index_once(tmp_path, monkeypatch):
+    """
+    Test that the importers of all the sources are found with one update of the
+    project's index.
+    """
+    pkg = make_package(tmp_path)
+    updates = []
+    update = SymbolIndex.update
+
+    def counted(self, roots, paths, **kwargs):
+        updates.append(roots)
+        return update(self, roots, paths, **kwargs)
+
+    monkeypatch.setattr(SymbolIndex, "update", counted)
+    argv = [str(pkg / "a.py"), str(pkg / "b.py"), "--into", str(pkg / "core.py")]
+    cli_subcommand("merge", defopt_argv=[*argv, "-u"])
+    assert updates.count([tmp_path]) == 1  # The rest are the import cycle check's
+    assert (pkg / "user.py").read_text() == "from .core import X\nfrom .core import g\n"
@@ -2,14 +2,23 @@
 Tests for the files created by running mvdef with `dry_run=False`.
 """
 
-from pytest import mark
+import stat
+
+from pytest import mark, raises
 
 from mvdef.core.text_diff import get_unidiff_text
+from mvdef.error_handling.exceptions import WriteConflict
+from mvdef.transfer import MvDef
 
 from .helpers.cli_util import run_cmd
 from .helpers.io import Write
 
-__all__ = ["test_move"]
+__all__ = [
+    "test_copy_touches_dst_only",
+    "test_move",
+    "test_move_conflict",
+    "test_move_keeps_mode",
+]
 
 
 @mark.parametrize(
@@ -43,3 +52,45 @@ def test_move(tmp_path, src, dst, mv, cls_defs, stored_diffs):
         ]
     )
     assert (src_diff, dst_diff) == stored_diffs
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_move_keeps_mode(tmp_path, src, dst):
+    """
+    Test that rewriting src and dst keeps their permission bits (rather than taking
+    those of the temporary file renamed over them), and that both are reported.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    src_p.chmod(0o755)
+    dst_p.chmod(0o640)
+    result = run_cmd(src_p, dst_p, mv=["foo"])
+    assert result.touched == [src_p, dst_p]
+    assert stat.S_IMODE(src_p.stat().st_mode) == 0o755
+    assert stat.S_IMODE(dst_p.stat().st_mode) == 0o640
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_copy_touches_dst_only(tmp_path, src, dst):
+    """
+    Test that copying leaves src alone (keeping its mtime) and only reports dst.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    src_mtime = src_p.stat().st_mtime_ns
+    result = run_cmd(src_p, dst_p, mv=["foo"], cp_=True)
+    assert result.touched == [dst_p]
+    assert src_p.stat().st_mtime_ns == src_mtime
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_move_conflict(tmp_path, src, dst):
+    """
+    Test that a move is refused if dst was edited after being parsed (as by a
+    concurrent mvdef process), leaving src and dst as they were.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    mover = MvDef(src_p, dst_p, mv=["foo"], escalate=True)
+    dst_p.write_text(dst.value + "b = 2\n")
+    with raises(WriteConflict):
+        mover.move()
+    assert src_p.read_text() == src.value
+    assert dst_p.read_text() == dst.value + "b = 2\n"
@@ -0,0 +1,114 @@
+"""
+Tests for placing the definitions arriving in dst in dependency order.
+"""
+
+import ast
+
+from mvdef.cli import cli
+from mvdef.core.placement import (
+    Statement,
+    arrival_order,
+    import_time_names,
+    placements,
+)
+
+__all__ = [
+    "test_arrival_order",
+    "test_import_time_names",
+    "test_move_placement",
+    "test_placements",
+]
+
+
+def test_import_time_names():
+    """
+    Test that only the names used when a definition is run are found: not those in a
+    function body, nor in annotations when their evaluation is postponed.
+    """
+    (node,) = ast.parse(
+        "@deco(a)\n"
+        "class K(Base, metaclass=Meta):\n"
+        "    x: Ann = value\n"
+        "    def f(self, y: Arg = default) -> Ret:\n"
+        "        return body\n"
+        "    g = lambda z=lam: inner\n",
+    ).body
+    names = {"deco", "a", "Base", "Meta", "value", "default", "lam"}
+    assert import_time_names(node, postponed=True) == names
+    assert import_time_names(node) == names | {"Ann", "Arg", "Ret"}
+
+
+def test_arrival_order():
+    """Test that arrivals follow those they use, otherwise keeping their order."""
+    assert arrival_order({"B": {"A"}, "C": set(), "A": set()}) == ["C", "A", "B"]
+    assert arrival_order({"a": {"b"}, "b": {"a"}}) == ["a", "b"]
+
+
+def test_placements():
+    """
+    Test that arrivals go before the first statement using them (directly, or via
+    another arrival), after those binding the names they use, or else at the end.
+    """
+    statements = Statement.from_module(
+        "from base import Base\n"
+        "\n"
+        "\n"
+        "# A comment\n"
+        "@register\n"
+        "class Model(Mixin):\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "def helper():\n"
+        "    return Mixin\n",
+    )
+    assert [stmt.lineno for stmt in statements] == [1, 4, 10]
+    arrivals = {"Mixin": {"Base"}, "register": set(), "late": {"helper"}}
+    assert placements(arrivals, statements) == [
+        ("Mixin", 1),
+        ("register", 1),
+        ("late", 3),
+    ]
+
+
+def test_move_placement(tmp_path):
+    """
+    Test that the definitions moved to dst are inserted before the existing code that
+    uses them at import time (in the order they use one another), not appended.
+    """
+    (src := tmp_path / "a.py").write_text(
+        "class Child(Parent):\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "class Parent:\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "def unused():\n"
+        "    pass\n",
+    )
+    (dst := tmp_path / "b.py").write_text(
+        "import os\n\n\nclass GrandChild(Child):\n    pass\n",
+    )
+    argv = [str(src), str(dst), "-m", "Child", "Parent", "unused"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert dst.read_text() == (
+        "import os\n"
+        "\n"
+        "\n"
+        "class Parent:\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "class Child(Parent):\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "class GrandChild(Child):\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "def unused():\n"
+        "    pass\n"
+    )
@@ -0,0 +1,84 @@
+"""
+Tests for the JSON records describing each definition (from `lsdef --jsonl`).
+"""
+
+import json
+
+from mvdef.cli import cli
+from mvdef.core.parse import parse
+from mvdef.core.records import definition_records
+
+__all__ = ["test_definition_records", "test_jsonl_records"]
+
+SOURCE = """\
+import os
+from functools import cache
+
+ÉTÉ = "été"
+
+
+@cache
+def first():
+    return os.sep
+
+
+class Second:
+    def method(self):
+        return first()
+
+
+async def third():
+    return os.getcwd(), third
+"""
+
+
+def test_definition_records():
+    """
+    Test that each definition (nested ones included) is described with its kind, line
+    range and byte offsets (including decorators), depth, imports and references.
+    """
+    records = definition_records(parse(SOURCE))
+    encoded = SOURCE.encode()
+    summary = [
+        (r["name"], r["kind"], r["line"], r["end_line"], r["depth"]) for r in records
+    ]
+    assert summary == [
+        ("first", "function", 7, 9, 1),
+        ("Second", "class", 12, 14, 1),
+        ("method", "function", 13, 14, 2),
+        ("third", "async", 17, 18, 1),
+    ]
+    first, second, method, third = records
+    assert encoded[first["start"] : first["end"]].decode().startswith("@cache\ndef")
+    assert encoded[method["start"] : method["end"]].decode() == (
+        "def method(self):\n        return first()"
+    )
+    assert encoded[third["end"] - 5 : third["end"]] == b"third"
+    assert (first["imports"], second["imports"], third["imports"]) == (
+        ["cache", "os"],
+        [],
+        ["os"],
+    )
+    referenced = {r["name"]: r["referenced"] for r in records}
+    assert referenced == {
+        "first": True,
+        "Second": False,
+        "method": False,
+        "third": False,
+    }
+
+
+def test_jsonl_records(tmp_path):
+    """
+    Test that lsdef --jsonl streams the records of each definition, naming the file.
+    """
+    (src_p := tmp_path / "src.py").write_text(SOURCE)
+    argv = [str(src_p), "--jsonl", "--per-def", "--func-defs"]
+    result = cli(MvCls="LsDef", defopt_argv=argv, return_state=True)
+    records = [json.loads(line) for line in result.manif.splitlines()]
+    assert [(r["file"], r["name"]) for r in records] == [
+        (str(src_p), "first"),
+        (str(src_p), "method"),
+        (str(src_p), "third"),
+    ]
+    assert records[0] == {"file": str(src_p), **definition_records(parse(SOURCE))[0]}
@@ -0,0 +1,108 @@
+"""
+Tests for keeping a re-export of the moved names in src (`mvdef --retain`), in each
+import style, and for the memoised package layout that the imports are worked out by.
+"""
+
+from pytest import raises
+
+from mvdef.cli import cli
+from mvdef.core.batch import BatchOp, Workspace, run_ops
+from mvdef.core.importers import directory_packages, forget_packages, import_from
+from mvdef.error_handling.exceptions import CheckFailure
+
+__all__ = [
+    "test_batch_retain",
+    "test_import_from",
+    "test_package_memo",
+    "test_retain",
+    "test_retain_refused",
+]
+
+SRC = "import os\n\n\ndef f():\n    return os.sep\n\n\ndef g():\n    return f()\n"
+
+
+def write_package(path):
+    """Write a package (with a subpackage) and a loose script beside it."""
+    (sub := path / "pkg" / "sub").mkdir(parents=True)
+    for init in [path / "pkg" / "__init__.py", sub / "__init__.py"]:
+        init.write_text("")
+    (path / "pkg" / "a.py").write_text(SRC)
+    (path / "script.py").write_text(SRC)
+    return path / "pkg"
+
+
+def test_import_from(tmp_path):
+    """
+    Test each import style, and that the package styles fall back to absolute
+    imports from the importer's directory where no package is found.
+    """
+    pkg = write_package(tmp_path)
+    a, script = pkg / "a.py", tmp_path / "script.py"
+    assert import_from(pkg / "sub" / "b.py", a, ".") == ("sub.b", 1)
+    assert import_from(pkg / "sub" / "b.py", a, "p") == ("pkg.sub.b", 0)
+    assert import_from(pkg / "sub" / "b.py", a, "a") == ("sub.b", 0)
+    assert import_from(pkg / "sub" / "__init__.py", a, "a") == ("sub", 0)
+    assert import_from(tmp_path / "other.py", script, ".") == ("other", 0)
+    assert import_from(tmp_path / "other.py", script, "p") == ("other", 0)
+    assert import_from(pkg / "b.py", script, ".") == ("pkg.b", 0)
+    assert import_from(tmp_path / "b.py", pkg / "sub" / "c.py", "a") == ("b", 0)
+    with raises(ValueError):
+        import_from(pkg / "b.py", a, "x")
+
+
+def test_package_memo(tmp_path):
+    """Test that each directory's packages are looked up once, until forgotten."""
+    pkg = write_package(tmp_path)
+    forget_packages()
+    for name in "bcde":
+        import_from(pkg / "sub" / f"{name}.py", pkg / "sub" / "a.py", "p")
+    info = directory_packages.cache_info()
+    assert info.misses == 3  # pkg/sub, pkg and the directory they are in, once each
+    assert info.hits > info.misses
+    forget_packages()
+    assert directory_packages.cache_info().currsize == 0
+
+
+def test_retain(tmp_path):
+    """
+    Test that src imports the names moved back from where they went (so the code
+    left there can still use them), in the style asked for.
+    """
+    pkg = write_package(tmp_path)
+    a = pkg / "a.py"
+    cli(a, pkg / "sub" / "b.py", mv=["f"], retain=True, MvCls="MvDef")
+    assert a.read_text() == "from .sub.b import f\n\n\ndef g():\n    return f()\n"
+    cli(a, tmp_path / "c.py", mv=["g"], retain=True, import_style="p", MvCls="MvDef")
+    assert a.read_text() == "from c import g\n"  # f's import went with its only user
+    script = tmp_path / "script.py"
+    cli(script, pkg / "d.py", mv=["f", "g"], retain=True, MvCls="MvDef")
+    assert script.read_text() == "from pkg.d import f, g\n"
+
+
+def test_retain_refused(tmp_path):
+    """
+    Test that copies and moves from stdin (and unknown import styles) can't retain
+    imports.
+    """
+    pkg = write_package(tmp_path)
+    kwargs = {"mv": ["f"], "retain": True, "escalate": True}
+    argv = [str(pkg / "a.py"), str(pkg / "b.py"), "-m", "f", "-r"]
+    with raises(SystemExit):  # Not an option of cpdef
+        cli(MvCls="CpDef", defopt_argv=argv)
+    with raises(CheckFailure, match="Only moves between files"):
+        cli(MvCls="MvDef", defopt_argv=["-", *argv[1:], "-e"])
+    with raises(CheckFailure, match="Unknown import style"):
+        cli(pkg / "a.py", pkg / "b.py", **kwargs, import_style="x", MvCls="MvDef")
+    with raises(SystemExit) as exc_info:
+        cli(MvCls="MvDef", defopt_argv=[*argv, "-i", "x"])
+    assert exc_info.value.code == 2
+    assert (pkg / "a.py").read_text() == SRC
+
+
+def test_batch_retain(tmp_path):
+    """Test that a batch op can retain imports too."""
+    pkg = write_package(tmp_path)
+    a, b = pkg / "a.py", pkg / "b.py"
+    workspace = Workspace()
+    run_ops([BatchOp(a, b, ["f"], retain=True, import_style="p")], workspace)
+    assert workspace.texts[a].startswith("from pkg.b import f\n\n\ndef g():")
@@ -0,0 +1,79 @@
+"""
+Tests for routing the definitions moved from one file to several destinations.
+"""
+
+from mvdef.cli import cli
+from mvdef.core import parse as parse_module
+from mvdef.core.parse import parse
+
+__all__ = ["test_route_move", "test_route_refused", "test_routes"]
+
+CODE = """\
+import os
+import re
+
+
+def _helper():
+    return os.sep
+
+
+def a():
+    return _helper()
+
+
+def b():
+    return re.compile("x")
+
+
+def c():
+    return _helper() + "c"
+"""
+
+
+def test_routes(tmp_path):
+    """Test that `name:path` names are split off to their own destination."""
+    (src := tmp_path / "s.py").write_text(CODE)
+    dst = tmp_path / "x.py"
+    argv = [str(src), str(dst), "-m", "a", f"b:{tmp_path / 'y.py'}", "c", "-d"]
+    mover = cli(MvCls="MvDef", defopt_argv=argv, return_state=True).mover
+    assert mover.mv == ["a", "c", "b"]
+    assert mover.routes == {dst: ["a", "c"], tmp_path / "y.py": ["b"]}
+    assert mover.dst_diff is mover.dst_diffs[dst]
+
+
+def test_route_move(tmp_path, monkeypatch, capsys):
+    """
+    Test that one run moves each definition to its destination (with the imports and
+    helpers it needs), parsing src and each destination once.
+    """
+    (src := tmp_path / "s.py").write_text(CODE)
+    (y := tmp_path / "y.py").write_text("def z():\n    pass\n")
+    x = tmp_path / "x.py"
+    parsed = []
+    parse_file = parse_module.parse_file
+    monkeypatch.setattr(
+        parse_module,
+        "parse_file",
+        lambda file, **kwargs: parsed.append(file) or parse_file(file, **kwargs),
+    )
+    argv = [str(src), str(x), "-m", "a", f"b:{y}", f"c:{y}", "-w"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert parsed == [src, y]
+    assert "_helper is used by the code going to" in capsys.readouterr().err
+    assert src.read_text() == "\n"
+    assert [n.name for n in parse(x.read_text()).alldefs] == ["_helper", "a"]
+    assert x.read_text().startswith("import os\n")
+    assert [n.name for n in parse(y.read_text()).alldefs] == ["z", "b", "c"]
+    assert y.read_text().startswith("import re\n")
+
+
+def test_route_refused(tmp_path, capsys):
+    """Test that a name can't go to two destinations, nor back into src."""
+    (src := tmp_path / "s.py").write_text(CODE)
+    x, y = tmp_path / "x.py", tmp_path / "y.py"
+    cli(MvCls="MvDef", defopt_argv=[str(src), str(x), "-m", "a", f"a:{y}"])
+    assert "Can't send ['a'] to more than one destination" in capsys.readouterr().err
+    cli(MvCls="MvDef", defopt_argv=[str(src), str(x), "-m", f"a:{src}"])
+    assert "into itself" in capsys.readouterr().err
+    assert src.read_text() == CODE
+    assert not x.exists() and not y.exists()
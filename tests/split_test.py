@@ -0,0 +1,156 @@
+"""
+Tests for planning the split of a module into several, and running it.
+"""
+
+from mvdef.cli import cli_subcommand
+from mvdef.core.importers import add_imports, import_line
+from mvdef.core.parse import parse
+from mvdef.core.split import STAY, plan_split
+
+__all__ = [
+    "test_add_imports",
+    "test_plan_by_name",
+    "test_plan_into",
+    "test_split",
+]
+
+CODE = """\
+\"\"\"A big module.\"\"\"
+
+import os
+import re
+
+import numpy as np
+
+
+def _sep():
+    return os.sep
+
+
+def join(*parts):
+    return _sep().join(parts) + str(np.pi)
+
+
+def rejoin(path):
+    return join(*path.split(_sep()))
+
+
+def mean(xs):
+    return np.mean(xs)
+
+
+class Parser:
+    def parse(self, text):
+        return _pattern().findall(text)
+
+
+def _pattern():
+    return re.compile("x")
+
+
+def parse_all(text):
+    return Parser().parse(text)
+
+
+DEFAULT = parse_all
+
+if __name__ == "__main__":
+    print(rejoin("a"), DEFAULT("x"))
+"""
+
+
+def test_plan_into():
+    """
+    Test that clustering keeps together the definitions that use each other (and
+    those sharing a third-party import), and that mutually recursive ones are never
+    separated.
+    """
+    plan = plan_split(parse(CODE), into=2)
+    assert plan.groups == {
+        "1": ["_sep", "join", "rejoin", "mean"],
+        "2": ["Parser", "_pattern", "parse_all", "DEFAULT"],
+    }
+    assert (plan.cut, plan.spread) == (2, 0)  # Both from the module-level code
+    assert plan.imports == {STAY: {"1": ["rejoin"], "2": ["DEFAULT"]}}
+    code = (
+        "def f():\n    return g()\n\n\n"
+        "def g():\n    return f()\n\n\n"
+        "def h():\n    pass\n"
+    )
+    assert plan_split(parse(code), into=3).groups == {"1": ["f", "g"], "2": ["h"]}
+
+
+def test_plan_by_name():
+    """
+    Test grouping by the first word of the names (private helpers going with their
+    only users) and around each class, and that groups which would import each other
+    are merged.
+    """
+    by_prefix = plan_split(parse(CODE), by="prefix")
+    assert by_prefix.groups["sep"] == ["_sep"]  # Used by two groups
+    assert by_prefix.imports["rejoin"] == {"sep": ["_sep"], "join": ["join"]}
+    assert by_prefix.groups["parser"] == ["Parser", "_pattern"]
+    by_class = plan_split(parse(CODE), by="class")
+    assert by_class.groups == {
+        STAY: ["_sep", "join", "rejoin", "mean", "parse_all", "DEFAULT"],
+        "parser": ["Parser", "_pattern"],
+    }
+    assert by_class.imports == {STAY: {"parser": ["Parser"]}}
+    code = (
+        "def alpha_x():\n    return beta_y()\n\n\ndef beta_y():\n    return 1\n\n\n"
+        "def beta_z():\n    return alpha_w()\n\n\ndef alpha_w():\n    return 2\n"
+    )
+    looped = plan_split(parse(code), by="prefix")
+    assert looped.merged == [["alpha", "beta"]]
+    assert looped.groups == {"alpha": ["alpha_x", "beta_y", "beta_z", "alpha_w"]}
+
+
+def test_add_imports():
+    """Test that imports go after those a module starts with, else at the top."""
+    line = "from .a import b"
+    assert add_imports("import os\n\nx = 1\n", [line]) == (
+        f"import os\n{line}\n\nx = 1\n"
+    )
+    assert add_imports("def f():\n    pass\n", [line]) == (
+        f"{line}\n\n\ndef f():\n    pass\n"
+    )
+    docs = '"""Doc."""\n'
+    assert add_imports(f"{docs}x = 1\n", [line]) == f"{docs}\n{line}\n\nx = 1\n"
+    assert import_line("m", 0, ["x" * 40, "y" * 40]) == (
+        f"from m import (\n    {'x' * 40},\n    {'y' * 40},\n)"
+    )
+
+
+def test_split(tmp_path, capsys):
+    """
+    Test that a dry run only prints the diffs, and that the split writes the new
+    modules (with their imports, and those between them) in one undoable operation.
+    """
+    (pkg := tmp_path / "pkg").mkdir()
+    (pkg / "__init__.py").write_text("")
+    (big := pkg / "big.py").write_text(CODE)
+    cli_subcommand("split", defopt_argv=[str(big), "--by-prefix", "-d"])
+    out = capsys.readouterr().out
+    assert "+++ fixed/" in out and "big_rejoin.py" in out
+    assert big.read_text() == CODE and not (pkg / "big_join.py").exists()
+    cli_subcommand("split", defopt_argv=[str(big), "--into", "2", "-d"])
+    assert "-import numpy as np\n" in capsys.readouterr().out  # An aliased import
+    argv = [str(big), "--by-class"]
+    result = cli_subcommand("split", defopt_argv=argv, return_state=True)
+    assert sorted(path.name for path in result.touched) == ["big.py", "big_parser.py"]
+    assert (pkg / "big_parser.py").read_text().startswith("import re\n")
+    assert "from .big_parser import Parser\n" in big.read_text()
+    assert [node.name for node in parse(big.read_text()).alldefs] == [
+        "_sep",
+        "join",
+        "rejoin",
+        "mean",
+        "parse_all",
+    ]
+    cli_subcommand("undo", defopt_argv=[])
+    assert big.read_text() == CODE and not (pkg / "big_parser.py").exists()
+    (pkg / "big_parser.py").write_text("")
+    cli_subcommand("split", defopt_argv=[str(big), "--by-class"])
+    assert "Won't split into existing files" in capsys.readouterr().err
+    cli_subcommand("split", defopt_argv=[str(big), "--into", "2", "--by-class"])
+    assert "Pass one of --into N" in capsys.readouterr().err
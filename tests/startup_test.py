@@ -0,0 +1,49 @@
+"""
+Tests for the import cost of the CLI entry points (measured by `python -X importtime`).
+"""
+
+import sys
+from subprocess import run
+
+from pytest import mark
+
+__all__ = ["test_entry_point_import_time", "test_parser_imports"]
+
+IMPORT_BUDGET_US = 100_000  # Cumulative import time allowed for `mvdef.cli`
+HEAVY_MODULES = {"defopt", "pyflakes", "difflib", "tempfile", "mvdef.core.agenda"}
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """Map each module imported by `statement` to its cumulative import time (us)."""
+    proc = run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+    )
+    assert proc.returncode == 0, proc.stderr.decode()
+    times = {}
+    for line in proc.stderr.decode().splitlines():
+        if line.startswith("import time:") and "imported package" not in line:
+            _, cumulative, module = line.removeprefix("import time:").split("|")
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+@mark.parametrize("entry_point", ["cli_move", "cli_copy", "cli_list"])
+def test_entry_point_import_time(entry_point):
+    """
+    Test that importing an entry point (as its console script does before parsing any
+    arguments) is within budget, and doesn't import the heavy modules.
+    """
+    times = import_times(f"from mvdef.cli import {entry_point}")
+    assert not HEAVY_MODULES.intersection(times)
+    assert times["mvdef.cli"] < IMPORT_BUDGET_US
+
+
+@mark.parametrize("cls_name", ["MvDef", "CpDef", "LsDef", "Undo"])
+def test_parser_imports(cls_name):
+    """
+    Test that the classes defopt builds the CLI parsers from (all that `--help` needs)
+    don't import the modules that are only needed to parse and edit files.
+    """
+    times = import_times(f"from mvdef.transfer import {cls_name}")
+    assert not (HEAVY_MODULES - {"defopt"}).intersection(times)
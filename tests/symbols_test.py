@@ -0,0 +1,113 @@
+"""
+Tests for looking up definitions by dotted path, and moving nested definitions.
+"""
+
+from mvdef.cli import cli
+from mvdef.core.parse import parse
+
+__all__ = [
+    "test_move_nested",
+    "test_move_nested_refused",
+    "test_move_shadowing",
+    "test_resolve",
+]
+
+CODE = """\
+import os
+
+
+class Outer:
+    \"\"\"Docs.\"\"\"
+
+    class Inner:
+        @staticmethod
+        def method(a):
+            return os.sep + a
+
+        def other(self):
+            return 2
+
+    def last(self):
+        return 3
+
+
+class Solo:
+    def only(self):
+        return os.getcwd()
+
+
+def last():
+    return 4
+"""
+
+
+def test_resolve():
+    """
+    Test that dotted paths resolve one level at a time, bare names at any depth, and
+    that only the kinds of definitions targeted are found.
+    """
+    symbols = parse(CODE).symbols
+    (method,) = symbols.resolve("Outer.Inner.method")
+    assert (method.name, method.path, method.node.lineno) == (
+        "method",
+        "Outer.Inner.method",
+        9,
+    )
+    assert symbols.resolve("Inner.method") == []
+    assert [sym.path for sym in symbols.resolve("last")] == ["Outer.last", "last"]
+    assert symbols.resolve("Outer.last")[0].parent.name == "Outer"
+    functions = parse(CODE, func_defs=True).symbols
+    assert functions.resolve("Outer") == []
+    assert [sym.path for sym in functions.resolve("Outer.Inner.other")] == [
+        "Outer.Inner.other",
+    ]
+
+
+def test_move_nested(tmp_path):
+    """
+    Test that nested definitions are moved to the top level of dst (dedented), taking
+    the blank lines between them and their siblings, or leaving a `pass` in a block
+    they would leave empty.
+    """
+    (src := tmp_path / "a.py").write_text(CODE)
+    dst = tmp_path / "b.py"
+    argv = [str(src), str(dst), "-m", "Outer.Inner.method", "Solo.only", "Outer.last"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert src.read_text() == (
+        "class Outer:\n"
+        '    """Docs."""\n'
+        "\n"
+        "    class Inner:\n"
+        "        def other(self):\n"
+        "            return 2\n"
+        "\n"
+        "\n"
+        "class Solo:\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "def last():\n"
+        "    return 4\n"
+    )
+    moved = parse(dst.read_text())
+    assert [node.name for node in moved.alldefs] == ["method", "only", "last"]
+    assert all(node.col_offset == 0 for node in moved.alldefs)
+    assert dst.read_text().startswith("import os\n")
+
+
+def test_move_nested_refused(tmp_path, capsys):
+    """Test that a definition can't be moved along with one it is nested in."""
+    (src := tmp_path / "a.py").write_text(CODE)
+    argv = [str(src), str(tmp_path / "b.py"), "-m", "Outer", "Outer.Inner.method"]
+    cli(MvCls="MvDef", defopt_argv=argv)
+    assert "along with the definitions they are in" in capsys.readouterr().err
+    assert src.read_text() == CODE
+
+
+def test_move_shadowing(tmp_path):
+    """Test that a bare name shared with a nested definition moves the top-level one."""
+    (src := tmp_path / "a.py").write_text(CODE)
+    dst = tmp_path / "b.py"
+    cli(MvCls="MvDef", defopt_argv=[str(src), str(dst), "-m", "last"])
+    assert dst.read_text() == "def last():\n    return 4\n"
+    assert "    def last(self):\n" in src.read_text()
@@ -0,0 +1,167 @@
+"""
+Tests for committing file writes together (and recovering interrupted transactions).
+"""
+
+import json
+
+from pytest import raises
+
+from mvdef.core.lock import FileLocks
+from mvdef.core.transaction import Transaction, recover, staged_path
+from mvdef.error_handling.exceptions import LockTimeout, WriteConflict
+
+__all__ = [
+    "test_commit_conflict",
+    "test_commit_lock_timeout",
+    "test_commit_together",
+    "test_recover_reserved",
+    "test_recover_roll_back",
+    "test_recover_roll_forward",
+    "test_rollback_on_error",
+    "test_skip_unchanged",
+]
+
+
+def test_commit_together(tmp_path, cache_dir):
+    """
+    Test that staged writes only replace their targets on commit, leaving no staged
+    files or journal behind.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    with Transaction() as txn:
+        txn.stage(a, "a = 2\n")
+        txn.stage(b, "b = 2\n")
+        assert a.read_text() == "a = 1\n" and not b.exists()
+    assert txn.committed
+    assert (a.read_text(), b.read_text()) == ("a = 2\n", "b = 2\n")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.py", "b.py"]
+    assert not list((cache_dir / "journal").iterdir())
+
+
+def test_skip_unchanged(tmp_path):
+    """
+    Test that staging a file's known contents unchanged leaves it (and its mtime) alone.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    b.write_text("b = 1\n")
+    a_mtime = a.stat().st_mtime_ns
+    with Transaction() as txn:
+        assert txn.stage(a, "a = 1\n", before="a = 1\n") is None
+        txn.stage(b, "b = 2\n", before="b = 1\n")
+    assert txn.touched == [b]
+    assert a.stat().st_mtime_ns == a_mtime
+
+
+def test_rollback_on_error(tmp_path, cache_dir):
+    """
+    Test that an error raised while staging leaves every target untouched.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    with raises(ValueError), Transaction() as txn:
+        txn.stage(a, "a = 2\n")
+        raise ValueError("Failed before staging b")
+    assert not txn.committed
+    assert a.read_text() == "a = 1\n" and not b.exists()
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
+    assert not list((cache_dir / "journal").iterdir())
+
+
+def interrupt(txn: Transaction, commit_point: bool) -> None:
+    """Simulate the process dying before renaming (after the commit point or not)."""
+    if commit_point:
+        txn.log({"op": "commit"})
+    txn.close(unlink=False)
+
+
+def test_recover_roll_forward(tmp_path, cache_dir):
+    """
+    Test that a transaction interrupted after its commit point is finished on recovery.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    txn = Transaction()
+    txn.stage(a, "a = 2\n")
+    txn.stage(b, "b = 2\n")
+    # Pretend the first rename went through before the process died
+    txn.writes[0].staged.replace(a)
+    interrupt(txn, commit_point=True)
+    assert recover() == {txn.journal_path: True}
+    assert (a.read_text(), b.read_text()) == ("a = 2\n", "b = 2\n")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.py", "b.py"]
+
+
+def test_recover_roll_back(tmp_path, cache_dir):
+    """
+    Test that a transaction interrupted before its commit point is undone on recovery,
+    including with a partially written final journal record.
+    """
+    a = tmp_path / "a.py"
+    a.write_text("a = 1\n")
+    txn = Transaction()
+    txn.stage(a, "a = 2\n")
+    interrupt(txn, commit_point=False)
+    with open(txn.journal_path, "a") as journal:
+        journal.write(json.dumps({"op": "commit"})[:5])
+    assert recover() == {txn.journal_path: False}
+    assert a.read_text() == "a = 1\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
+
+
+def test_recover_reserved(tmp_path, cache_dir):
+    """
+    Test that files staged by another process at reserved paths are committed once
+    adopted, and that those never adopted are removed on recovery.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    txn = Transaction()
+    txn.reserve([a, b])
+    staged_path(a, txn.id).write_text("a = 2\n")
+    txn.adopt(a, expected=None)
+    staged_path(b, txn.id).write_text("b = 2\n")  # Written but not yet adopted
+    interrupt(txn, commit_point=False)
+    recover()
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
+    txn = Transaction()
+    txn.reserve([a, b])
+    staged_path(a, txn.id).write_text("a = 2\n")
+    txn.adopt(a, expected=None)
+    txn.commit()
+    assert txn.touched == [a]
+    assert a.read_text() == "a = 2\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
+
+
+def test_commit_conflict(tmp_path):
+    """
+    Test that if any target changed since it was read, nothing is committed.
+    """
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a = 1\n")
+    b.write_text("b = 1\n")
+    txn = Transaction()
+    txn.stage(a, "a = 2\n", before="a = 1\n")
+    txn.stage(b, "b = 2\n", before="b = 1\n")
+    b.write_text("b = 3\n")  # Another process got there first
+    with raises(WriteConflict) as exc_info:
+        txn.commit()
+    assert exc_info.value.retryable
+    assert (a.read_text(), b.read_text()) == ("a = 1\n", "b = 3\n")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.py", "b.py"]
+
+
+def test_commit_lock_timeout(tmp_path):
+    """
+    Test that a commit waits for (then gives up on) a lock held by another writer.
+    """
+    a = tmp_path / "a.py"
+    a.write_text("a = 1\n")
+    txn = Transaction(lock_timeout=0.1)
+    txn.stage(a, "a = 2\n", before="a = 1\n")
+    with FileLocks([a]), raises(LockTimeout):
+        txn.commit()
+    assert a.read_text() == "a = 1\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
@@ -0,0 +1,107 @@
+"""
+Tests for restoring files from the backup store with `mvdef undo`.
+"""
+
+import time
+
+from pytest import mark, raises
+
+from mvdef.cli import EX_TEMPFAIL, cli_subcommand
+from mvdef.core.backup import BackupStore, FileChange, Operation
+from mvdef.error_handling.exceptions import LockTimeout, WriteConflict
+from mvdef.transfer.undo import Undo
+
+from .helpers.cli_util import run_cmd
+from .helpers.io import Write
+
+__all__ = [
+    "test_backup_dedupe",
+    "test_backup_prune_due",
+    "test_undo_conflict",
+    "test_undo_last_n",
+    "test_undo_locked",
+]
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_undo_last_n(tmp_path, src, dst):
+    """
+    Test that undoing 1 then 2 operations restores src and dst to how they were before
+    each (including deleting a dst that didn't exist before the first move).
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    dst_p.unlink()
+    run_cmd(src_p, dst_p, mv=["foo"])
+    after_first = src_p.read_text(), dst_p.read_text()
+    run_cmd(src_p, dst_p, mv=["A"])
+    assert len(BackupStore().history()) == 2
+    undone = cli_subcommand("undo", defopt_argv=[], return_state=True)
+    assert undone.touched == [src_p, dst_p]
+    assert (src_p.read_text(), dst_p.read_text()) == after_first
+    run_cmd(src_p, dst_p, mv=["A"])
+    cli_subcommand("undo", defopt_argv=["-n", "2"])
+    assert src_p.read_text() == src.value
+    assert not dst_p.exists()
+    assert BackupStore().history() == []
+
+
+@mark.parametrize("src,dst", [("fooA", "bar")], indirect=True)
+def test_undo_conflict(tmp_path, src, dst):
+    """
+    Test that undo refuses to discard changes made to a file after the operation.
+    """
+    src_p, dst_p = Write.from_enums(src, dst, path=tmp_path).file_paths
+    run_cmd(src_p, dst_p, mv=["foo"])
+    dst_p.write_text("edited = True\n")
+    with raises(WriteConflict):
+        cli_subcommand("undo", defopt_argv=["--escalate"])
+    assert dst_p.read_text() == "edited = True\n"
+
+
+def test_undo_locked(monkeypatch, capsys):
+    """
+    Test that a subcommand meeting a locked file exits with the status to retry,
+    rather than a traceback (unless escalating).
+    """
+
+    def locked(self):
+        raise LockTimeout("Timed out waiting for the lock on x.py")
+
+    monkeypatch.setattr(Undo, "run", locked)
+    with raises(SystemExit) as exc_info:
+        cli_subcommand("undo", defopt_argv=[])
+    assert exc_info.value.code == EX_TEMPFAIL
+    assert "safe to retry" in capsys.readouterr().err
+    with raises(LockTimeout):
+        cli_subcommand("undo", defopt_argv=["--escalate"])
+
+
+def test_backup_dedupe(tmp_path):
+    """
+    Test that identical contents are stored once, and unreferenced ones are pruned.
+    """
+    store = BackupStore(root=tmp_path)
+    digest = store.save("x = 1\n")
+    assert store.save("x = 1\n") == digest
+    assert store.load(digest) == "x = 1\n"
+    assert len(list(store.objects.glob("*/*"))) == 1
+    store.prune()
+    assert not list(store.objects.glob("*/*"))
+
+
+def test_backup_prune_due(tmp_path, monkeypatch):
+    """
+    Test that recording an operation only prunes the store (reading its history)
+    once a while has passed, or enough new contents were stored, since the last prune.
+    """
+    store = BackupStore(root=tmp_path)
+    pruned = []
+    monkeypatch.setattr(store, "prune", lambda: pruned.append(len(pruned)))
+    change = FileChange(path="x.py", before=store.save("x = 1\n"), after=None)
+    for i in range(3):
+        store.record(Operation(id=str(i), time=time.time(), changes=[change]))
+    assert pruned == [0]  # Only the first (never pruned before)
+    store.prune_bytes = 4
+    store.save("y = 22\n")
+    store.record(Operation(id="3", time=time.time(), changes=[change]))
+    assert pruned == [0, 1]